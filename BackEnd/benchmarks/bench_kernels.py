@@ -0,0 +1,288 @@
+"""
+Microbenchmarks for the survey_analyzer compute kernels.
+
+Every kernel is called directly, the way the analysis pool calls it, on the
+synthetic survey export seed_benchmark writes (numeric, rating, categorical and
+yes/no columns after a respondent id and timestamp). Nothing goes through
+HTTP, the cache or the pool. Each size is every combination of --rows and
+--columns. Sizes where rows x columns is above --max-cells are skipped, since
+the frame alone takes several bytes per cell.
+
+Kernels:
+    csv_load      read_csv_file of the frame written as CSV
+    column_load   the plot columns read back from the column store
+    pie           value counts of a categorical column
+    heatmap       mean pivot of a numeric column by two categorical ones
+    groupby       group_counts of a categorical, a rating and a yes/no column, as records
+    box           box plot of a numeric and a rating column
+    histogram     binned histogram of a numeric column
+    downsample    build_time_series of a numeric column, bucket chosen automatically
+    pdf           build_analysis_pdf of the pie, heatmap, box, histogram and downsample charts
+
+The plot kernels and groupby include rendering the result with
+NumpyJSONRenderer, the API's default, because that is where a plot that ships
+raw values (box) spends its time.
+
+For each kernel and size the script reports:
+- The best of --repeat wall times.
+- The peak memory of one more, traced run. tracemalloc sees Python and NumPy
+  allocations, not the buffers of pandas' C parser.
+
+Each run is appended to the --history JSON file with its commit, host and
+library versions. The table compares each result with the latest earlier
+result for the same kernel and size on this host.
+
+Usage (from BackEnd/):
+    python benchmarks/bench_kernels.py
+    python benchmarks/bench_kernels.py --rows 10000000 --columns 10 --kernels groupby downsample
+"""
+import argparse
+import datetime
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+from functools import cached_property
+from io import BytesIO
+
+BACKEND = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND)
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'jigyasa_backend.settings')
+
+import django  # noqa: E402
+
+django.setup()
+
+import numpy as np  # noqa: E402
+import pandas as pd  # noqa: E402
+from django.test import override_settings  # noqa: E402
+
+from jigyasa.management.commands.seed_benchmark import synthetic_frame  # noqa: E402
+from survey_analyzer import column_store  # noqa: E402
+from survey_analyzer.column_profile import read_csv_file  # noqa: E402
+from survey_analyzer.models import Analysis  # noqa: E402
+from survey_analyzer.plot_engine import build_plot, build_time_series, group_counts, plot_columns  # noqa: E402
+from survey_analyzer.publish import DEFAULT_DPI, DEFAULT_QUALITY, build_analysis_pdf  # noqa: E402
+from survey_analyzer.renderers import NumpyJSONRenderer  # noqa: E402
+
+DEFAULT_HISTORY = os.path.join(BACKEND, 'benchmarks', 'results', 'kernels.json')
+
+# Columns of synthetic_frame; all exist from 6 columns up.
+TIMESTAMP = 'submitted_at'
+NUMERIC = 'score_0'
+RATING = 'rating_1'
+CATEGORY = 'segment_2'
+YES_NO = 'agrees_3'
+MIN_COLUMNS = 6
+
+PLOTS = {
+    'pie': ('pie', CATEGORY, []),
+    'heatmap': ('heatmap', CATEGORY, [NUMERIC, YES_NO]),
+    'box': ('box', None, [NUMERIC, RATING]),
+    'histogram': ('histogram', NUMERIC, []),
+}
+RENDERER = NumpyJSONRenderer()
+PDF_OPTIONS = {'mode': 'vector', 'dpi': DEFAULT_DPI, 'image_format': 'png', 'quality': DEFAULT_QUALITY}
+
+
+class Workload:
+    """One frame size, and the files kernels read it from, made on first use."""
+
+    def __init__(self, rows, columns, directory, seed=0):
+        self.rows = rows
+        self.columns = columns
+        self.directory = directory
+        self.seed = seed
+
+    @cached_property
+    def frame(self):
+        return synthetic_frame(np, pd, self.rows, self.columns, self.seed)
+
+    @cached_property
+    def csv_path(self):
+        path = os.path.join(self.directory, f'{self.rows}x{self.columns}.csv')
+        self.frame.to_csv(path, index=False)
+        return path
+
+    @cached_property
+    def dataset_key(self):
+        key = f'bench-{self.rows}x{self.columns}'
+        column_store.build(key, self.frame)
+        return key
+
+    def plot_frame(self, name):
+        """The frame load_frame would give the plot: only its columns."""
+        plot_type, x_axis, y_axes = PLOTS[name]
+        return self.frame[plot_columns(plot_type, x_axis, y_axes)].copy()
+
+
+def plot_kernel(name):
+    plot_type, x_axis, y_axes = PLOTS[name]
+    return (lambda w: (w.plot_frame(name),), lambda df: RENDERER.render(build_plot(df, plot_type, x_axis, y_axes)))
+
+
+def time_series_frame(w):
+    return w.frame[[TIMESTAMP, NUMERIC]].copy()
+
+
+def grouped_records(df):
+    """GroupByView's default response body."""
+    return {column: group_counts(df, column).reset_index(name='count').to_dict(orient='records') for column in df.columns}
+
+
+def pdf_plots(w):
+    figures = [(name, build_plot(w.plot_frame(name), *PLOTS[name])) for name in PLOTS]
+    figures.append(('downsample', build_time_series(time_series_frame(w), 'line', TIMESTAMP, [NUMERIC], 'auto')))
+    analysis = Analysis(title='Kernel benchmark', author_name='bench_kernels', date=datetime.date.today())
+    return analysis, [{'title': name, 'data': figure} for name, figure in figures]
+
+
+# name: (prepare, run). prepare(workload) is untimed and returns run's arguments.
+KERNELS = {
+    'csv_load': (lambda w: (w.csv_path,), read_csv_file),
+    'column_load': (
+        lambda w: (w.dataset_key, [TIMESTAMP, NUMERIC, RATING, CATEGORY, YES_NO]),
+        lambda key, columns: column_store.open_dataset(key).frame(columns),
+    ),
+    'pie': plot_kernel('pie'),
+    'heatmap': plot_kernel('heatmap'),
+    'groupby': (
+        lambda w: (w.frame[[CATEGORY, RATING, YES_NO]].copy(),),
+        lambda df: RENDERER.render(grouped_records(df)),
+    ),
+    'box': plot_kernel('box'),
+    'histogram': plot_kernel('histogram'),
+    'downsample': (
+        lambda w: (time_series_frame(w),),
+        lambda df: RENDERER.render(build_time_series(df, 'line', TIMESTAMP, [NUMERIC], 'auto')),
+    ),
+    'pdf': (pdf_plots, lambda analysis, plots: build_analysis_pdf(BytesIO(), analysis, plots, PDF_OPTIONS)),
+}
+
+
+def measure(run, args, repeat):
+    """Best wall time of ``repeat`` runs and the peak traced memory of one more."""
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        run(*args)
+        timings.append(time.perf_counter() - start)
+
+    # Separate pass: tracemalloc slows down allocation-heavy code too much to time it.
+    tracemalloc.start()
+    run(*args)
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return min(timings), peak
+
+
+def git_state():
+    """The checked-out commit and whether the tree has changes, or (None, None) outside git."""
+    try:
+        commit = subprocess.run(
+            ['git', 'rev-parse', '--short', 'HEAD'], cwd=BACKEND, capture_output=True, text=True, check=True,
+        ).stdout.strip()
+        status = subprocess.run(
+            ['git', 'status', '--porcelain', '--untracked-files=no'], cwd=BACKEND, capture_output=True, text=True, check=True,
+        ).stdout
+    except (OSError, subprocess.CalledProcessError):
+        return None, None
+    return commit, bool(status.strip())
+
+
+def load_history(path):
+    if not os.path.exists(path):
+        return []
+    with open(path) as fh:
+        return json.load(fh)
+
+
+def previous_results(history, host):
+    """The latest earlier result per (kernel, rows, columns) on ``host``."""
+    latest = {}
+    for run in history:
+        if run.get('host') != host:
+            continue
+        for result in run['results']:
+            latest[(result['kernel'], result['rows'], result['columns'])] = result
+    return latest
+
+
+def change(seconds, previous):
+    if previous is None:
+        return '-'
+    return f"{(seconds / previous['seconds'] - 1) * 100:+.0f}%"
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--rows', type=int, nargs='+', default=[10_000, 1_000_000, 10_000_000])
+    parser.add_argument('--columns', type=int, nargs='+', default=[10, 100, 1000])
+    parser.add_argument('--kernels', nargs='+', choices=list(KERNELS), default=list(KERNELS))
+    parser.add_argument('--max-cells', type=float, default=1e8, help='Skip sizes with more rows x columns')
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--history', default=DEFAULT_HISTORY, help='JSON file the run is appended to')
+    parser.add_argument('--no-save', action='store_true', help='Compare with the history without adding to it')
+    args = parser.parse_args()
+    if min(args.columns) < MIN_COLUMNS:
+        parser.error(f'--columns must be at least {MIN_COLUMNS}')
+
+    host = platform.node()
+    history = load_history(args.history)
+    previous = previous_results(history, host)
+    commit, dirty = git_state()
+    results = []
+
+    print(f"best of {args.repeat}; change against the last run on {host} in {os.path.relpath(args.history)}")
+    print(f"{'kernel':<12}{'rows':>12}{'columns':>9}{'time (s)':>11}{'peak MiB':>10}{'change':>8}")
+    with tempfile.TemporaryDirectory() as directory, override_settings(
+        COLUMN_STORE={'DIR': os.path.join(directory, 'column_store'), 'MAX_BYTES': 2 ** 62},
+    ):
+        for rows in args.rows:
+            for columns in args.columns:
+                if rows * columns > args.max_cells:
+                    print(f"{'(skipped)':<12}{rows:>12,}{columns:>9}")
+                    continue
+                workload = Workload(rows, columns, directory, args.seed)
+                for name in args.kernels:
+                    prepare, run = KERNELS[name]
+                    seconds, peak = measure(run, prepare(workload), args.repeat)
+                    result = {
+                        'kernel': name, 'rows': rows, 'columns': columns,
+                        'seconds': round(seconds, 6), 'peak_bytes': peak,
+                    }
+                    print(
+                        f"{name:<12}{rows:>12,}{columns:>9}{seconds:>11.4f}{peak / 2**20:>10.1f}"
+                        f"{change(seconds, previous.get((name, rows, columns))):>8}"
+                    )
+                    results.append(result)
+                # Frames of the largest sizes take gigabytes; drop each before the next.
+                del workload
+
+    if args.no_save or not results:
+        return
+    history.append({
+        'timestamp': datetime.datetime.now(datetime.timezone.utc).isoformat(timespec='seconds'),
+        'commit': commit,
+        'dirty': dirty,
+        'host': host,
+        'python': platform.python_version(),
+        'numpy': np.__version__,
+        'pandas': pd.__version__,
+        'repeat': args.repeat,
+        'seed': args.seed,
+        'results': results,
+    })
+    os.makedirs(os.path.dirname(os.path.abspath(args.history)), exist_ok=True)
+    with open(args.history, 'w') as fh:
+        json.dump(history, fh, indent=1)
+    print(f"Appended {len(results)} results to {os.path.relpath(args.history)}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,122 @@
+"""
+PDF publishing benchmark: native ReportLab charts against kaleido PNGs.
+
+Builds the same report twice from plot-engine output (one plot of each
+supported type, over a synthetic frame), once with pdf_charts' vector drawings
+and with every chart rasterised by kaleido (PNG, and JPEG at --quality), the
+publish view's 'raster' mode. Reports build time and PDF size.
+
+Usage (from BackEnd/):
+    python benchmarks/bench_pdf.py --rows 200000 --dpi 200 --repeat 3
+"""
+import argparse
+import os
+import sys
+import time
+from functools import partial
+from io import BytesIO
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'jigyasa_backend.settings')
+
+import django  # noqa: E402
+
+django.setup()
+
+import numpy as np  # noqa: E402
+import pandas as pd  # noqa: E402
+from reportlab.lib.pagesizes import letter  # noqa: E402
+from reportlab.lib.styles import getSampleStyleSheet  # noqa: E402
+from reportlab.lib.units import inch  # noqa: E402
+from reportlab.platypus import Paragraph, SimpleDocTemplate, Spacer  # noqa: E402
+
+from survey_analyzer.pdf_charts import DEFAULT_DPI, DEFAULT_QUALITY, chart_flowable, kaleido_image  # noqa: E402
+from survey_analyzer.plot_engine import build_plot, build_time_series, correlation_heatmap  # noqa: E402
+
+
+def make_frame(rows, seed=0):
+    rng = np.random.default_rng(seed)
+    frame = pd.DataFrame({
+        'ts': pd.date_range('2024-01-01', periods=rows, freq='min'),
+        'group': rng.choice(['north', 'south', 'east', 'west', 'central'], size=rows),
+        'segment': rng.choice(['a', 'b', 'c', 'd'], size=rows),
+        'x': rng.normal(size=rows),
+    })
+    frame['y'] = frame['x'] * 2 + rng.normal(size=rows)
+    frame['z'] = rng.gamma(2.0, size=rows)
+    return frame
+
+
+def make_figures(frame, scatter_points):
+    means = frame.groupby('group', as_index=False)[['y', 'z']].mean()
+    return [
+        ('bar', build_plot(means, 'bar', 'group', ['y', 'z'])),
+        ('line', build_time_series(frame, 'line', 'ts', ['y', 'z'], 'auto')),
+        ('area', build_time_series(frame, 'area', 'ts', ['z'], 'day')),
+        ('scatter', build_plot(frame.head(scatter_points), 'scatter', 'x', ['y'])),
+        ('pie', build_plot(frame, 'pie', 'group', [])),
+        ('box', build_plot(frame, 'box', None, ['x', 'y', 'z'])),
+        ('heatmap', build_plot(frame, 'heatmap', 'group', ['z', 'segment'])),
+        ('correlation', correlation_heatmap(['x', 'y', 'z'], frame[['x', 'y', 'z']].corr().to_numpy(), 'pearson')),
+    ]
+
+
+def build_pdf(figures, chart):
+    buffer = BytesIO()
+    doc = SimpleDocTemplate(buffer, pagesize=letter, rightMargin=72, leftMargin=72, topMargin=72, bottomMargin=72)
+    styles = getSampleStyleSheet()
+    story = []
+    for name, figure in figures:
+        story.append(Paragraph(name, styles['Heading3']))
+        story.append(chart(figure, 6 * inch, 4 * inch))
+        story.append(Spacer(1, 24))
+    doc.build(story)
+    return buffer.getvalue()
+
+
+def measure(figures, chart, repeat):
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        pdf = build_pdf(figures, chart)
+        timings.append(time.perf_counter() - start)
+    return min(timings), len(pdf)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--rows', type=int, default=200_000)
+    parser.add_argument('--scatter-points', type=int, default=5_000)
+    parser.add_argument('--dpi', type=int, default=DEFAULT_DPI)
+    parser.add_argument('--quality', type=int, default=DEFAULT_QUALITY)
+    parser.add_argument('--repeat', type=int, default=3)
+    args = parser.parse_args()
+
+    figures = make_figures(make_frame(args.rows), args.scatter_points)
+    png = partial(kaleido_image, dpi=args.dpi)
+    jpeg = partial(kaleido_image, dpi=args.dpi, image_format='jpeg', quality=args.quality)
+    cases = [
+        ('native (pdf_charts)', chart_flowable),
+        ('kaleido PNG', png),
+        ('kaleido JPEG', jpeg),
+    ]
+
+    # Kaleido starts its Chromium process on first use; keep that out of the timings.
+    kaleido_image(figures[0][1], 6 * inch, 4 * inch)
+
+    print(f"{len(figures)} charts over {args.rows:,} rows, rasters at {args.dpi} dpi, best of {args.repeat}")
+    print(f"{'case':<24}{'time (s)':>12}{'PDF KiB':>12}")
+    for name, chart in cases:
+        seconds, size = measure(figures, chart, args.repeat)
+        print(f"{name:<24}{seconds:>12.3f}{size / 2**10:>12.1f}")
+
+    print()
+    print(f"{'chart':<16}{'native (s)':>12}{'native KiB':>12}{'kaleido (s)':>13}{'kaleido KiB':>13}")
+    for name, figure in figures:
+        native_seconds, native_size = measure([(name, figure)], chart_flowable, args.repeat)
+        kaleido_seconds, kaleido_size = measure([(name, figure)], png, args.repeat)
+        print(f"{name:<16}{native_seconds:>12.3f}{native_size / 2**10:>12.1f}{kaleido_seconds:>13.3f}{kaleido_size / 2**10:>13.1f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,107 @@
+"""
+Serialisation benchmark for plot payloads.
+
+Compares DRF's stock JSONRenderer fed ``tolist()`` output (what PlotDataView used
+to do) against NumpyJSONRenderer fed the NumPy arrays directly, and against the
+opt-in base64 typed-array encoding.
+
+Usage (from BackEnd/):
+    python benchmarks/bench_renderer.py --points 1000000 --traces 2
+"""
+import argparse
+import os
+import sys
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'jigyasa_backend.settings')
+
+import django  # noqa: E402
+
+django.setup()
+
+import numpy as np  # noqa: E402
+import pandas as pd  # noqa: E402
+from rest_framework.renderers import JSONRenderer  # noqa: E402
+
+from survey_analyzer.renderers import NumpyJSONRenderer, TypedArrayJSONRenderer  # noqa: E402
+
+
+def make_frame(points, traces, seed=0):
+    rng = np.random.default_rng(seed)
+    frame = pd.DataFrame({
+        'x': np.arange(points, dtype='float64'),
+        'ts': pd.date_range('2024-01-01', periods=points, freq='s'),
+    })
+    for i in range(traces):
+        y = rng.normal(size=points)
+        y[rng.integers(0, points, size=points // 100)] = np.nan
+        frame[f'y{i}'] = y
+    return frame
+
+
+def tolist_payload(frame, traces):
+    # The stdlib encoder cannot serialise Timestamps, so they go through str first.
+    return {
+        'data': [
+            {'x': frame['x'].tolist(), 'y': frame[f'y{i}'].tolist(), 'type': 'scatter'}
+            for i in range(traces)
+        ] + [{'x': frame['ts'].astype(str).tolist(), 'y': frame['y0'].tolist(), 'type': 'scatter'}],
+        'layout': {},
+    }
+
+
+def array_payload(frame, traces):
+    return {
+        'data': [
+            {'x': frame['x'].to_numpy(), 'y': frame[f'y{i}'].to_numpy(), 'type': 'scatter'}
+            for i in range(traces)
+        ] + [{'x': frame['ts'].to_numpy(), 'y': frame['y0'].to_numpy(), 'type': 'scatter'}],
+        'layout': {},
+    }
+
+
+def measure(build, renderer, repeat):
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        body = renderer.render(build())
+        timings.append(time.perf_counter() - start)
+        size = len(body)
+        del body
+
+    # Separate pass: tracemalloc slows down allocation-heavy code too much to time it.
+    tracemalloc.start()
+    renderer.render(build())
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return min(timings), peak, size
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--points', type=int, default=1_000_000)
+    parser.add_argument('--traces', type=int, default=2)
+    parser.add_argument('--repeat', type=int, default=3)
+    args = parser.parse_args()
+
+    frame = make_frame(args.points, args.traces)
+
+    # The stock encoder rejects NaN (allow_nan=False), so it gets a NaN-free copy.
+    clean = frame.fillna(0)
+    cases = [
+        ('JSONRenderer + tolist()', lambda: tolist_payload(clean, args.traces), JSONRenderer()),
+        ('NumpyJSONRenderer + arrays', lambda: array_payload(frame, args.traces), NumpyJSONRenderer()),
+        ('TypedArrayJSONRenderer', lambda: array_payload(frame, args.traces), TypedArrayJSONRenderer()),
+    ]
+
+    print(f"{args.points:,} points x {args.traces + 1} traces, best of {args.repeat}")
+    print(f"{'case':<30}{'time (s)':>12}{'peak MiB':>12}{'body MiB':>12}")
+    for name, build, renderer in cases:
+        seconds, peak, size = measure(build, renderer, args.repeat)
+        print(f"{name:<30}{seconds:>12.3f}{peak / 2**20:>12.1f}{size / 2**20:>12.1f}")
+
+
+if __name__ == '__main__':
+    main()
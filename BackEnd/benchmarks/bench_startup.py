@@ -0,0 +1,86 @@
+"""
+Startup benchmark: wall time and peak RSS of ``manage.py check`` and of worker
+boot, each measured in a fresh interpreter.
+
+Scenarios:
+    check           python manage.py check
+    boot            a full worker: WSGI application plus URLconf, before any request
+    boot+analysis   the same after its first analysis request (survey_analyzer.urls)
+    boot-survey     a survey-only worker (jigyasa_backend.settings_survey)
+
+The boot scenarios also list the heavy modules the interpreter ended up with;
+survey-only workers should list none.
+
+Usage (from BackEnd/):
+    python benchmarks/bench_startup.py --repeat 5
+
+For a per-module breakdown of any scenario, run its code under
+``python -X importtime``.
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+BACKEND = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+HEAVY_MODULES = ['numpy', 'pandas', 'scipy', 'reportlab', 'PIL', 'plotly', 'kaleido']
+
+BOOT = """
+import json, sys
+from django.core.wsgi import get_wsgi_application
+from django.urls import get_resolver
+get_wsgi_application()
+get_resolver().url_patterns
+{extra}
+print(json.dumps([m for m in {heavy!r} if m in sys.modules]))
+"""
+
+SCENARIOS = [
+    ('check', [sys.executable, 'manage.py', 'check'], 'jigyasa_backend.settings'),
+    ('boot', [sys.executable, '-c', BOOT.format(extra='', heavy=HEAVY_MODULES)], 'jigyasa_backend.settings'),
+    ('boot+analysis', [sys.executable, '-c', BOOT.format(extra='import survey_analyzer.urls', heavy=HEAVY_MODULES)],
+     'jigyasa_backend.settings'),
+    ('boot-survey', [sys.executable, '-c', BOOT.format(extra='', heavy=HEAVY_MODULES)], 'jigyasa_backend.settings_survey'),
+]
+
+
+def measure(command, settings_module):
+    """Wall seconds, peak RSS in MB and stdout of one run of ``command``."""
+    env = dict(os.environ, DJANGO_SETTINGS_MODULE=settings_module)
+    start = time.perf_counter()
+    process = subprocess.Popen(command, cwd=BACKEND, env=env, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL)
+    output = process.stdout.read()
+    # wait4 gives the resource usage of this child alone.
+    _, status, usage = os.wait4(process.pid, 0)
+    elapsed = time.perf_counter() - start
+    process.returncode = os.waitstatus_to_exitcode(status)
+    if process.returncode:
+        raise RuntimeError(f"{' '.join(command[:2])} exited with {process.returncode}")
+    # ru_maxrss is in kilobytes on Linux and in bytes on macOS.
+    rss = usage.ru_maxrss / (1024 * 1024 if sys.platform == 'darwin' else 1024)
+    return elapsed, rss, output.decode()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--only', nargs='*', choices=[name for name, _, _ in SCENARIOS])
+    args = parser.parse_args()
+
+    print(f"{'scenario':<15} {'median s':>9} {'min s':>7} {'RSS MB':>7}  heavy modules")
+    for name, command, settings_module in SCENARIOS:
+        if args.only and name not in args.only:
+            continue
+        runs = [measure(command, settings_module) for _ in range(args.repeat)]
+        times = [elapsed for elapsed, _, _ in runs]
+        rss = statistics.median(rss for _, rss, _ in runs)
+        output = runs[-1][2].strip().splitlines()
+        heavy = ', '.join(json.loads(output[-1])) if name != 'check' and output else ''
+        print(f"{name:<15} {statistics.median(times):>9.3f} {min(times):>7.3f} {rss:>7.1f}  {heavy or '-'}")
+
+
+if __name__ == '__main__':
+    main()
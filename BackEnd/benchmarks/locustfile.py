@@ -0,0 +1,71 @@
+"""
+Survey blast load test: respondents open a survey, then submit a response.
+
+Run the same settings and database under the sync WSGI workers and under
+uvicorn's ASGI workers, and drive each with the same number of concurrent
+users (from BackEnd/):
+
+    gunicorn jigyasa_backend.wsgi:application -w 4 -b 127.0.0.1:8000
+    gunicorn jigyasa_backend.asgi:application -w 4 -k uvicorn.workers.UvicornWorker -b 127.0.0.1:8000
+
+    BENCH_SURVEY_ID=1 BENCH_EMAIL=respondent@example.com BENCH_PASSWORD=... \\
+        locust -f benchmarks/locustfile.py --headless -H http://127.0.0.1:8000 \\
+        -u 500 -r 50 -t 2m --csv benchmarks/results/asgi
+
+Compare requests/s and the latency percentiles locust reports per endpoint
+(``<prefix>_stats.csv``), and the failure counts: sync workers start timing
+out once every worker is blocked on a request. BENCH_SURVEY_ID must be an
+open survey (no organization requirement) with choice or text questions;
+every user logs in with the BENCH_EMAIL account. On an empty database,
+``python manage.py seed_benchmark`` makes survey 1 such a survey and
+bench-user-0@example.com such an account (BENCH_PASSWORD as for the seed).
+"""
+import os
+import random
+
+from locust import HttpUser, between, task
+
+SURVEY_ID = int(os.environ.get('BENCH_SURVEY_ID', '1'))
+EMAIL = os.environ.get('BENCH_EMAIL', 'respondent@example.com')
+PASSWORD = os.environ.get('BENCH_PASSWORD', 'benchmark-password')
+
+
+def make_answers(survey):
+    answers = []
+    for question in survey['questions']:
+        answer = {'question': question['id']}
+        if question['question_type'] == 'text':
+            answer['text_answer'] = random.choice(['Yes', 'No', 'Maybe later', 'Works fine'])
+        elif question['choices']:
+            choices = [choice['id'] for choice in question['choices']]
+            if question['question_type'] == 'multiple_choice':
+                answer['selected_choices'] = random.sample(choices, random.randint(1, len(choices)))
+            else:
+                answer['selected_choices'] = [random.choice(choices)]
+        answers.append(answer)
+    return answers
+
+
+class Respondent(HttpUser):
+    wait_time = between(0.5, 2)
+
+    def on_start(self):
+        response = self.client.post('/api/auth/login/', json={'email': EMAIL, 'password': PASSWORD})
+        response.raise_for_status()
+        self.client.headers['Authorization'] = f"Bearer {response.json()['access']}"
+        self.survey = None
+
+    @task(4)
+    def open_survey(self):
+        response = self.client.get(f'/api/surveys/{SURVEY_ID}/public/', name='/api/surveys/[id]/public/')
+        if response.ok:
+            self.survey = response.json()
+
+    @task(1)
+    def submit(self):
+        if self.survey is None:
+            return self.open_survey()
+        self.client.post('/api/survey-responses/', json={
+            'survey': SURVEY_ID,
+            'answers': make_answers(self.survey),
+        })
@@ -0,0 +1,157 @@
+"""
+Packed answer storage: all of a response's answers in one document on its
+SurveyResponse row, instead of an Answer row per question plus an
+Answer.selected_choices row per picked choice.
+
+Each survey picks a mode with ``Survey.answer_storage``. New surveys take
+settings.ANSWER_STORAGE, and ``manage.py convert_answers`` moves a survey's
+existing responses between the modes. A document looks like this, with the
+answers in submission order:
+
+    {"format": 1, "revision": 7, "answers": {"<question id>": [text_answer, [choice ids]]}}
+
+Choice ids are kept in ascending order, the order the Answer rows return them in.
+
+``revision`` is the survey revision the answers were validated against.
+Survey.revision goes up whenever a question or choice changes
+(jigyasa.signals). A document from an older revision is read through the
+survey's current questions and choices. That drops answers to deleted
+questions and deleted choices, the same rows the database would have removed.
+"""
+from django.db import transaction
+
+from .models import Answer, Choice, Question, Survey, SurveyResponse
+
+PACKED_FORMAT = 1
+ROWS = 'rows'
+PACKED = 'packed'
+
+
+def pack(revision, rows):
+    """The document for ``(question id, text answer, choice ids)`` rows validated against ``revision``."""
+    return {
+        'format': PACKED_FORMAT,
+        'revision': revision,
+        'answers': {
+            str(question_id): [text_answer, sorted(choice_ids)]
+            for question_id, text_answer, choice_ids in rows
+        },
+    }
+
+
+def unpack(document):
+    """A document's answers as ``(question id, text answer, choice ids)`` rows."""
+    if document.get('format') != PACKED_FORMAT:
+        raise ValueError(f"Unknown packed answer format: {document.get('format')!r}")
+    return [
+        (int(question_id), text_answer, choice_ids)
+        for question_id, (text_answer, choice_ids) in document['answers'].items()
+    ]
+
+
+def survey_questions(survey_id):
+    """The survey's current question ids, each with the set of its choice ids."""
+    questions = {question_id: set() for question_id in Question.objects.filter(survey_id=survey_id).values_list('id', flat=True)}
+    for question_id, choice_id in Choice.objects.filter(question__survey_id=survey_id).values_list('question_id', 'id'):
+        questions[question_id].add(choice_id)
+    return questions
+
+
+class AnswerReader:
+    """
+    Reads documents of any number of surveys. A survey's questions are loaded
+    once, and only if one of its documents is older than the survey.
+    """
+
+    def __init__(self):
+        self.questions = {}
+
+    def rows(self, survey_id, revision, document):
+        """The document's rows, as of the survey's current ``revision``."""
+        rows = unpack(document)
+        if document['revision'] == revision:
+            return rows
+        if survey_id not in self.questions:
+            self.questions[survey_id] = survey_questions(survey_id)
+        current = self.questions[survey_id]
+        return [
+            (question_id, text_answer, [choice_id for choice_id in choice_ids if choice_id in current[question_id]])
+            for question_id, text_answer, choice_ids in rows
+            if question_id in current
+        ]
+
+
+def packed_selections(survey):
+    """``(response id, choice id)`` for every choice picked in the survey's packed responses."""
+    reader = AnswerReader()
+    documents = SurveyResponse.objects.filter(survey=survey, packed_answers__isnull=False).values_list('id', 'packed_answers')
+    return [
+        (response_id, choice_id)
+        for response_id, document in documents.iterator()
+        for _, _, choice_ids in reader.rows(survey.id, survey.revision, document)
+        for choice_id in choice_ids
+    ]
+
+
+@transaction.atomic
+def pack_responses(response_ids, revision):
+    """Move the Answer rows of ``response_ids`` into documents recorded against ``revision``."""
+    selections = {}
+    for answer_id, choice_id in (
+        Answer.selected_choices.through.objects.filter(answer__response_id__in=response_ids)
+        .order_by('id').values_list('answer_id', 'choice_id')
+    ):
+        selections.setdefault(answer_id, []).append(choice_id)
+    rows = {response_id: [] for response_id in response_ids}
+    for answer_id, response_id, question_id, text_answer in (
+        Answer.objects.filter(response_id__in=response_ids)
+        .order_by('id').values_list('id', 'response_id', 'question_id', 'text_answer')
+    ):
+        rows[response_id].append((question_id, text_answer, selections.get(answer_id, [])))
+
+    SurveyResponse.objects.bulk_update(
+        [SurveyResponse(id=response_id, packed_answers=pack(revision, answers)) for response_id, answers in rows.items()],
+        ['packed_answers'],
+    )
+    Answer.objects.filter(response_id__in=response_ids).delete()
+
+
+@transaction.atomic
+def unpack_responses(survey_id, revision, documents, reader):
+    """Write ``(response id, document)`` pairs of one survey back as Answer rows."""
+    answers = []
+    selections = []
+    for response_id, document in documents:
+        for question_id, text_answer, choice_ids in reader.rows(survey_id, revision, document):
+            answers.append(Answer(response_id=response_id, question_id=question_id, text_answer=text_answer))
+            selections.append(choice_ids)
+    answers = Answer.objects.bulk_create(answers)
+    Selected = Answer.selected_choices.through
+    Selected.objects.bulk_create([
+        Selected(answer_id=answer.id, choice_id=choice_id)
+        for answer, choice_ids in zip(answers, selections)
+        for choice_id in choice_ids
+    ])
+    SurveyResponse.objects.filter(id__in=[response_id for response_id, _ in documents]).update(packed_answers=None)
+
+
+def convert_survey(survey, storage, batch_size=1000):
+    """
+    Convert every response of ``survey`` not yet stored as ``storage``, one
+    transaction per ``batch_size`` responses. Returns how many were converted.
+    """
+    converted = 0
+    while True:
+        revision = Survey.objects.values_list('revision', flat=True).get(id=survey.id)
+        responses = SurveyResponse.objects.filter(survey=survey, packed_answers__isnull=storage == PACKED).order_by('id')
+        if storage == PACKED:
+            batch = list(responses.values_list('id', flat=True)[:batch_size])
+            if batch:
+                pack_responses(batch, revision)
+        else:
+            batch = list(responses.values_list('id', 'packed_answers')[:batch_size])
+            if batch:
+                unpack_responses(survey.id, revision, batch, AnswerReader())
+        if not batch:
+            return converted
+        converted += len(batch)
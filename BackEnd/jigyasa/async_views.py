@@ -0,0 +1,262 @@
+"""
+Async views for the requests that spike together during a survey blast:
+loading a survey and submitting a response.
+
+They run natively under ASGI (see jigyasa_backend.asgi) and use the async ORM
+and cache APIs, so a worker keeps accepting respondents while others wait on
+the database. Survey definitions are cached for
+settings.SURVEY_DEFINITION_CACHE_SECONDS. jigyasa.signals drops the entry when
+the survey, its questions or choices change, but only in the cache of the
+process making the change: with the default per-process LocMemCache the other
+workers serve the old definition until their entry expires, so keep the
+timeout short unless CACHES points at a shared backend.
+"""
+import json
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.http import JsonResponse
+from django.utils.cache import patch_cache_control
+from django.views.decorators.csrf import csrf_exempt
+from django.views.decorators.http import require_GET
+from rest_framework import status
+from rest_framework.exceptions import AuthenticationFailed
+from rest_framework_simplejwt.authentication import JWTAuthentication
+
+from .answer_storage import PACKED, pack
+from .models import Answer, Question, Survey, SurveyResponse, UserProfile
+from .signals import definition_cache_key
+from .views import SurveyResponseViewSet
+
+survey_response_list = SurveyResponseViewSet.as_view({'get': 'list'})
+
+
+def detail_response(detail, status_code):
+    return JsonResponse(detail if isinstance(detail, dict) else {"detail": detail}, status=status_code)
+
+
+async def load_definition(survey_id):
+    """
+    The survey with its questions and choices as served to respondents, plus
+    the creator and organization for access checks and the revision and answer
+    storage for saving responses. None if there is no such survey.
+    """
+    key = definition_cache_key(survey_id)
+    definition = await cache.aget(key)
+    if definition is not None:
+        return definition
+
+    survey = await Survey.objects.filter(id=survey_id).afirst()
+    if survey is None:
+        return None
+    questions = Question.objects.filter(survey_id=survey_id).prefetch_related('choice_set')
+    definition = {
+        'creator_id': survey.creator_id,
+        'organization_id': survey.organization_id,
+        'revision': survey.revision,
+        'answer_storage': survey.answer_storage,
+        'survey': {
+            'id': survey.id,
+            'title': survey.title,
+            'description': survey.description,
+            'is_active': survey.is_active,
+            'requires_organization': survey.requires_organization,
+            'questions': [
+                {
+                    'id': question.id,
+                    'text': question.text,
+                    'question_type': question.question_type,
+                    'required': question.required,
+                    'choices': [{'id': choice.id, 'text': choice.text} for choice in question.choice_set.all()],
+                }
+                async for question in questions
+            ],
+        },
+    }
+    await cache.aset(key, definition, settings.SURVEY_DEFINITION_CACHE_SECONDS)
+    return definition
+
+
+async def request_user(request):
+    """
+    The user of the request's bearer token, None without one. An invalid
+    token raises AuthenticationFailed, as it does in the DRF views.
+    """
+    result = await sync_to_async(JWTAuthentication().authenticate)(request)
+    return result[0] if result else None
+
+
+async def access_error(user, definition):
+    """The response refusing ``user`` access to the survey, or None."""
+    if not definition['survey']['requires_organization']:
+        return None
+    if user is None:
+        return detail_response("Authentication required for this survey", status.HTTP_401_UNAUTHORIZED)
+    organization_id = await UserProfile.objects.filter(user_id=user.id).values_list('organization_id', flat=True).afirst()
+    if organization_id is None or organization_id != definition['organization_id']:
+        return detail_response("You don't have access to this survey", status.HTTP_403_FORBIDDEN)
+    return None
+
+
+@require_GET
+async def survey_detail(request, creator_id, survey_id):
+    """Async counterpart of the former SurveyDetailView; the page respondents open."""
+    definition = await load_definition(survey_id)
+    if definition is None or definition['creator_id'] != creator_id:
+        return detail_response("Not found.", status.HTTP_404_NOT_FOUND)
+    survey = definition['survey']
+    return JsonResponse({
+        'id': survey['id'],
+        'title': survey['title'],
+        'description': survey['description'],
+        'questions': [
+            {key: question[key] for key in ('id', 'text', 'question_type', 'choices')}
+            for question in survey['questions']
+        ],
+    })
+
+
+@require_GET
+async def public_survey(request, pk):
+    """A survey for respondents, checking organization access when the survey requires it."""
+    try:
+        user = await request_user(request)
+    except AuthenticationFailed as exc:
+        return detail_response(exc.detail, exc.status_code)
+    definition = await load_definition(pk)
+    if definition is None:
+        return detail_response("Not found.", status.HTTP_404_NOT_FOUND)
+    denied = await access_error(user, definition)
+    if denied is not None:
+        return denied
+
+    response = JsonResponse(definition['survey'])
+    if definition['survey']['requires_organization']:
+        patch_cache_control(response, private=True)
+    else:
+        # Open surveys are identical for every respondent, which also lets the
+        # compression middleware reuse the compressed body.
+        patch_cache_control(response, public=True, max_age=settings.PUBLIC_SURVEY_CACHE_SECONDS)
+    return response
+
+
+def _as_id(value):
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        return None
+
+
+def validate_answers(survey, answers):
+    """
+    ``(rows, errors)``: ``(question id, text answer, choice ids)`` per answer,
+    checked against the survey definition, or the error body to return.
+    """
+    if not isinstance(answers, list) or not all(isinstance(answer, dict) for answer in answers):
+        return None, {"answers": "Expected a list of answers."}
+
+    questions = {question['id']: question for question in survey['questions']}
+    answered = {_as_id(answer.get('question')) for answer in answers}
+    missing = {
+        f"question_{question['id']}": "This field is required"
+        for question in survey['questions']
+        if question['required'] and question['id'] not in answered
+    }
+    if missing:
+        return None, missing
+
+    rows = []
+    for answer in answers:
+        question = questions.get(_as_id(answer.get('question')))
+        if question is None:
+            return None, {"detail": f"Question {answer.get('question')} is not part of this survey."}
+        text_answer = answer.get('text_answer')
+        choice_ids = answer.get('selected_choices') or []
+        if not isinstance(choice_ids, list):
+            choice_ids = [choice_ids]
+
+        if question['required']:
+            if question['question_type'] == 'text':
+                if not str(text_answer or '').strip():
+                    return None, {f"question_{question['id']}": "Please provide an answer"}
+            elif question['question_type'] in ['multiple_choice', 'single_choice']:
+                if not choice_ids:
+                    return None, {f"question_{question['id']}": "Please select at least one choice"}
+
+        valid_choices = {choice['id'] for choice in question['choices']}
+        choice_ids = [_as_id(choice_id) for choice_id in choice_ids]
+        if any(choice_id not in valid_choices for choice_id in choice_ids):
+            return None, {f"question_{question['id']}": "Invalid choice"}
+        rows.append((question['id'], text_answer, list(dict.fromkeys(choice_ids))))
+    return rows, None
+
+
+def save_response(survey_id, respondent, rows, packed_revision=None):
+    """
+    One response with its answers: a single INSERT of a packed document
+    validated against ``packed_revision`` when given (see answer_storage), else
+    the response, answers and selected choices in three INSERTs.
+    """
+    if packed_revision is not None:
+        return SurveyResponse.objects.create(
+            survey_id=survey_id, respondent=respondent, packed_answers=pack(packed_revision, rows),
+        )
+    with transaction.atomic():
+        response = SurveyResponse.objects.create(survey_id=survey_id, respondent=respondent)
+        answers = Answer.objects.bulk_create([
+            Answer(response=response, question_id=question_id, text_answer=text_answer)
+            for question_id, text_answer, _ in rows
+        ])
+        Selected = Answer.selected_choices.through
+        Selected.objects.bulk_create([
+            Selected(answer_id=answer.id, choice_id=choice_id)
+            for answer, (_, _, choice_ids) in zip(answers, rows)
+            for choice_id in choice_ids
+        ])
+    return response
+
+
+async def submit_response(request):
+    try:
+        user = await request_user(request)
+    except AuthenticationFailed as exc:
+        return detail_response(exc.detail, exc.status_code)
+    if user is None:
+        return detail_response("Authentication credentials were not provided.", status.HTTP_401_UNAUTHORIZED)
+
+    try:
+        data = json.loads(request.body or b'{}')
+    except ValueError:
+        return detail_response("JSON parse error.", status.HTTP_400_BAD_REQUEST)
+    if not isinstance(data, dict):
+        return detail_response("Expected a JSON object.", status.HTTP_400_BAD_REQUEST)
+
+    survey_id = _as_id(data.get('survey'))
+    definition = await load_definition(survey_id) if survey_id is not None else None
+    if definition is None:
+        return detail_response("Survey not found", status.HTTP_404_NOT_FOUND)
+    denied = await access_error(user, definition)
+    if denied is not None:
+        return denied
+
+    rows, errors = validate_answers(definition['survey'], data.get('answers', []))
+    if errors is not None:
+        return detail_response(errors, status.HTTP_400_BAD_REQUEST)
+
+    # Definitions cached before answer storage existed have neither key.
+    packed_revision = definition['revision'] if definition.get('answer_storage') == PACKED else None
+    await sync_to_async(save_response)(survey_id, user, rows, packed_revision)
+    return detail_response("Response submitted successfully", status.HTTP_201_CREATED)
+
+
+@csrf_exempt
+async def survey_responses(request):
+    """
+    POST submits a response; listing stays with the synchronous
+    SurveyResponseViewSet.
+    """
+    if request.method == 'POST':
+        return await submit_response(request)
+    return await sync_to_async(survey_response_list)(request)
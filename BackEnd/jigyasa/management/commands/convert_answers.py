@@ -0,0 +1,37 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from jigyasa.answer_storage import convert_survey
+from jigyasa.models import Survey
+
+
+class Command(BaseCommand):
+    help = (
+        "Moves surveys' responses between Answer rows and packed answer documents "
+        '(see jigyasa.answer_storage) and makes their new responses use the same storage.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('storage', choices=[value for value, _ in Survey.ANSWER_STORAGE])
+        parser.add_argument('--survey', type=int, nargs='+', dest='surveys', help='Survey ids (default: every survey)')
+        parser.add_argument('--batch-size', type=int, default=1000, help='Responses per transaction')
+
+    def handle(self, *args, **options):
+        storage = options['storage']
+        surveys = Survey.objects.order_by('id')
+        if options['surveys']:
+            surveys = surveys.filter(id__in=options['surveys'])
+            missing = set(options['surveys']) - {survey.id for survey in surveys}
+            if missing:
+                raise CommandError(f"No such survey: {', '.join(map(str, sorted(missing)))}")
+
+        total = 0
+        for survey in surveys:
+            # Switched first, so responses submitted meanwhile are already in the
+            # new storage or picked up by a later batch.
+            if survey.answer_storage != storage:
+                survey.answer_storage = storage
+                survey.save(update_fields=['answer_storage'])
+            converted = convert_survey(survey, storage, options['batch_size'])
+            total += converted
+            self.stdout.write(f"Survey {survey.id}: {converted} responses converted")
+        self.stdout.write(self.style.SUCCESS(f"Converted {total} responses to {storage} storage"))
@@ -0,0 +1,249 @@
+import os
+import random
+import tempfile
+import time
+
+from django.contrib.auth.hashers import make_password
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+
+from jigyasa.answer_storage import PACKED, pack
+from jigyasa.models import Answer, Choice, Organization, Question, Survey, SurveyResponse, User, UserProfile
+
+QUESTION_TYPES = ['single_choice', 'multiple_choice', 'text']
+QUESTION_TYPE_WEIGHTS = [5, 3, 2]
+TEXT_ANSWERS = [
+    'Yes', 'No', 'Maybe later', 'Works fine', 'Could be faster', 'Not sure',
+    'The mobile app crashes sometimes', 'Great experience overall', 'Too many steps',
+]
+CSV_CATEGORIES = ['north', 'south', 'east', 'west', 'central', 'online', 'partner', 'other']
+
+
+class Command(BaseCommand):
+    help = (
+        'Generates a large, deterministic benchmark dataset: organizations, users, '
+        'surveys with questions and choices, responses with answers, and wide CSV uploads. '
+        'The same seed and sizes on an empty database always give the same rows and ids. '
+        'Users are bench-user-<n>@example.com with --password; survey 0 never requires '
+        'an organization.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--seed', type=int, default=0)
+        parser.add_argument('--organizations', type=int, default=20)
+        parser.add_argument('--users', type=int, default=1000)
+        parser.add_argument('--surveys', type=int, default=50)
+        parser.add_argument('--questions', type=int, default=10, help='Questions per survey')
+        parser.add_argument('--choices', type=int, default=5, help='Choices per choice question')
+        parser.add_argument('--responses', type=int, default=100_000)
+        parser.add_argument('--csv-uploads', type=int, default=2)
+        parser.add_argument('--csv-rows', type=int, default=100_000)
+        parser.add_argument('--csv-columns', type=int, default=100)
+        parser.add_argument('--batch-size', type=int, default=5000, help='Responses per transaction')
+        parser.add_argument(
+            '--answer-storage', choices=[value for value, _ in Survey.ANSWER_STORAGE], default='rows',
+            help='How the surveys store answers (see jigyasa.answer_storage)',
+        )
+        parser.add_argument('--password', default='benchmark-password')
+
+    def handle(self, *args, **options):
+        if User.objects.filter(username__startswith='bench-user-').exists():
+            raise CommandError('Benchmark data already exists; run clear_db first.')
+
+        rng = random.Random(options['seed'])
+        started = time.perf_counter()
+
+        with transaction.atomic():
+            organizations = Organization.objects.bulk_create([
+                Organization(name=f'Benchmark Org {i}') for i in range(options['organizations'])
+            ])
+            users = self.create_users(rng, organizations, options)
+            surveys = self.create_surveys(rng, users, organizations, options)
+        self.stdout.write(
+            f"Created {len(organizations)} organizations, {len(users)} users and {len(surveys)} surveys "
+            f"({time.perf_counter() - started:.1f}s)"
+        )
+
+        self.create_responses(rng, users, surveys, options)
+        self.create_csv_uploads(users[0] if users else None, options)
+        self.stdout.write(self.style.SUCCESS(f'Seeded benchmark data in {time.perf_counter() - started:.1f}s'))
+
+    def create_users(self, rng, organizations, options):
+        # One hash for everyone: hashing per user would dominate the run.
+        password = make_password(options['password'], salt=f"benchmark{options['seed']}")
+        users = User.objects.bulk_create([
+            User(username=f'bench-user-{i}', email=f'bench-user-{i}@example.com', password=password)
+            for i in range(options['users'])
+        ], batch_size=5000)
+        UserProfile.objects.bulk_create([
+            UserProfile(user=user, organization=rng.choice(organizations) if organizations and rng.random() < 0.9 else None)
+            for user in users
+        ], batch_size=5000)
+        return users
+
+    def create_surveys(self, rng, users, organizations, options):
+        """
+        The surveys as ``(survey id, questions)``, each question a
+        ``(question id, question type, required, choice ids)`` tuple.
+        """
+        if not users:
+            raise CommandError('--users must be at least 1.')
+        surveys = Survey.objects.bulk_create([
+            Survey(
+                title=f'Benchmark survey {i}',
+                description=f'Synthetic survey {i} for load tests.',
+                creator=rng.choice(users),
+                organization=rng.choice(organizations) if organizations else None,
+                requires_organization=i > 0 and bool(organizations) and rng.random() < 0.2,
+                answer_storage=options['answer_storage'],
+            )
+            for i in range(options['surveys'])
+        ])
+        questions = Question.objects.bulk_create([
+            Question(
+                survey=survey,
+                text=f'Question {j + 1} of survey {i}',
+                question_type=rng.choices(QUESTION_TYPES, QUESTION_TYPE_WEIGHTS)[0],
+                required=rng.random() < 0.7,
+            )
+            for i, survey in enumerate(surveys)
+            for j in range(options['questions'])
+        ], batch_size=5000)
+        choices = Choice.objects.bulk_create([
+            Choice(question=question, text=f'Option {k + 1}')
+            for question in questions
+            if question.question_type != 'text'
+            for k in range(options['choices'])
+        ], batch_size=5000)
+
+        choice_ids = {}
+        for choice in choices:
+            choice_ids.setdefault(choice.question_id, []).append(choice.id)
+        survey_questions = {}
+        for question in questions:
+            survey_questions.setdefault(question.survey_id, []).append(
+                (question.id, question.question_type, question.required, choice_ids.get(question.id, []))
+            )
+        return [(survey.id, survey_questions.get(survey.id, [])) for survey in surveys]
+
+    def create_responses(self, rng, users, surveys, options):
+        total = options['responses']
+        if not total or not surveys:
+            return
+        # A few surveys get most of the responses, as in production.
+        weights = [1 / (rank + 1) for rank in range(len(surveys))]
+        rng.shuffle(weights)
+        cumulative = []
+        running = 0.0
+        for weight in weights:
+            running += weight
+            cumulative.append(running)
+        user_ids = [user.id for user in users]
+        packed = options['answer_storage'] == PACKED
+        Selected = Answer.selected_choices.through
+
+        started = time.perf_counter()
+        created = answers_created = 0
+        while created < total:
+            picked = rng.choices(surveys, cum_weights=cumulative, k=min(options['batch_size'], total - created))
+            with transaction.atomic():
+                responses = [
+                    SurveyResponse(survey_id=survey_id, respondent_id=rng.choice(user_ids))
+                    for survey_id, _ in picked
+                ]
+                response_rows = []
+                for response, (_, questions) in zip(responses, picked):
+                    rows = []
+                    for question_id, question_type, required, choice_ids in questions:
+                        if not required and rng.random() < 0.2:
+                            continue
+                        if question_type == 'text':
+                            rows.append((question_id, rng.choice(TEXT_ANSWERS), ()))
+                        elif not choice_ids:
+                            rows.append((question_id, None, ()))
+                        elif question_type == 'single_choice':
+                            rows.append((question_id, None, (rng.choice(choice_ids),)))
+                        else:
+                            rows.append((question_id, None, rng.sample(choice_ids, rng.randint(1, len(choice_ids)))))
+                    if packed:
+                        # New surveys are at revision 1.
+                        response.packed_answers = pack(1, rows)
+                    response_rows.append(rows)
+                    answers_created += len(rows)
+
+                responses = SurveyResponse.objects.bulk_create(responses)
+                if not packed:
+                    answers = []
+                    selections = []
+                    for response, rows in zip(responses, response_rows):
+                        for question_id, text_answer, choice_ids in rows:
+                            answers.append(Answer(response_id=response.id, question_id=question_id, text_answer=text_answer))
+                            selections.append(choice_ids)
+                    answers = Answer.objects.bulk_create(answers)
+                    Selected.objects.bulk_create([
+                        Selected(answer_id=answer.id, choice_id=choice_id)
+                        for answer, choice_ids in zip(answers, selections)
+                        for choice_id in choice_ids
+                    ])
+            created += len(responses)
+            elapsed = time.perf_counter() - started
+            self.stdout.write(f"{created}/{total} responses, {answers_created} answers ({created / elapsed:.0f} responses/s)")
+
+    def create_csv_uploads(self, user, options):
+        if not options['csv_uploads'] or user is None:
+            return
+        # Imported here so seeding survey data alone does not load pandas.
+        import numpy as np
+        import pandas as pd
+
+        from survey_analyzer.models import CSVUpload
+        from survey_analyzer.storage import hash_path, store_blob
+        from survey_analyzer.views import ingest_upload
+
+        for index in range(options['csv_uploads']):
+            started = time.perf_counter()
+            frame = synthetic_frame(np, pd, options['csv_rows'], options['csv_columns'], options['seed'] * 1000 + index)
+            with tempfile.NamedTemporaryFile(suffix='.csv', delete=False) as output:
+                path = output.name
+            try:
+                frame.to_csv(path, index=False)
+                sha256, size = hash_path(path)
+                with open(path, 'rb') as content:
+                    blob, _ = store_blob(sha256, size, content)
+            finally:
+                os.remove(path)
+            filename = f"benchmark-{options['seed']}-{index}.csv"
+            csv_upload = CSVUpload.objects.create(user=user, file=blob.file.name, blob=blob, original_filename=filename)
+            ingest_upload(csv_upload)
+            self.stdout.write(
+                f"CSV upload {csv_upload.id}: {filename}, {len(frame)} rows x {len(frame.columns)} columns, "
+                f"{size / 1e6:.1f} MB ({time.perf_counter() - started:.1f}s)"
+            )
+
+
+def synthetic_frame(np, pd, rows, columns, seed):
+    """
+    A wide survey-export-like frame: a respondent id and timestamp, then
+    numeric, integer rating, categorical and yes/no columns in turn, with a few
+    percent missing values.
+    """
+    rng = np.random.default_rng(seed)
+    data = {
+        'respondent_id': np.arange(1, rows + 1),
+        'submitted_at': pd.Timestamp('2024-01-01') + pd.to_timedelta(np.sort(rng.integers(0, 365 * 86400, rows)), unit='s'),
+    }
+    for i in range(max(columns - 2, 0)):
+        kind = i % 4
+        if kind == 0:
+            values = rng.normal(50, 15, rows).round(2)
+            values[rng.random(rows) < 0.03] = np.nan
+            data[f'score_{i}'] = values
+        elif kind == 1:
+            data[f'rating_{i}'] = rng.integers(1, 6, rows)
+        elif kind == 2:
+            values = np.array(CSV_CATEGORIES, dtype=object)[rng.integers(0, len(CSV_CATEGORIES), rows)]
+            values[rng.random(rows) < 0.03] = None
+            data[f'segment_{i}'] = values
+        else:
+            data[f'agrees_{i}'] = np.where(rng.random(rows) < 0.6, 'yes', 'no')
+    return pd.DataFrame(data)
@@ -0,0 +1,29 @@
+# Generated by Django 5.0.2 on 2026-10-19 03:13
+
+import jigyasa.models
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('jigyasa', '0002_question_required'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='survey',
+            name='answer_storage',
+            field=models.CharField(choices=[('rows', 'Answer rows'), ('packed', 'Packed document')], default=jigyasa.models.default_answer_storage, max_length=10),
+        ),
+        migrations.AddField(
+            model_name='survey',
+            name='revision',
+            field=models.PositiveIntegerField(default=1),
+        ),
+        migrations.AddField(
+            model_name='surveyresponse',
+            name='packed_answers',
+            field=models.JSONField(blank=True, null=True),
+        ),
+    ]
@@ -1,6 +1,12 @@
+from django.conf import settings
 from django.db import models
 from django.contrib.auth.models import AbstractUser
 
+
+def default_answer_storage():
+    return getattr(settings, 'ANSWER_STORAGE', 'rows')
+
+
 class User(AbstractUser):
     email = models.EmailField(unique=True)
     created_at = models.DateTimeField(auto_now_add=True)
@@ -53,12 +59,21 @@ class UserProfile(models.Model):
         return f"{self.user.email}'s profile"
 
 class Survey(models.Model):
+    ANSWER_STORAGE = [
+        ('rows', 'Answer rows'),
+        ('packed', 'Packed document'),
+    ]
+
     title = models.CharField(max_length=200)
     description = models.TextField()
     creator = models.ForeignKey(User, on_delete=models.CASCADE)
     organization = models.ForeignKey(Organization, on_delete=models.SET_NULL, null=True, blank=True)
     is_active = models.BooleanField(default=True)
     requires_organization = models.BooleanField(default=False)
+    # Goes up whenever a question or choice changes (jigyasa.signals).
+    revision = models.PositiveIntegerField(default=1)
+    # How new responses store their answers; see jigyasa.answer_storage.
+    answer_storage = models.CharField(max_length=10, choices=ANSWER_STORAGE, default=default_answer_storage)
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
@@ -104,6 +119,8 @@ class SurveyResponse(models.Model):
     survey = models.ForeignKey(Survey, on_delete=models.CASCADE)
     respondent = models.ForeignKey(User, on_delete=models.CASCADE, null=True, blank=True)
     submitted_at = models.DateTimeField(auto_now_add=True)
+    # All answers in one document instead of Answer rows; see jigyasa.answer_storage.
+    packed_answers = models.JSONField(null=True, blank=True)
 
     class Meta:
         app_label = 'jigyasa'
@@ -1,6 +1,7 @@
 from rest_framework import serializers
 from django.contrib.auth import get_user_model
 from django.contrib.auth.password_validation import validate_password
+from .answer_storage import AnswerReader
 from .models import User, Survey, Question, Choice, Answer, SurveyResponse, Organization, UserProfile
 
 User = get_user_model()
@@ -72,18 +73,26 @@ class SurveySerializer(serializers.ModelSerializer):
         return data
 
     def get_responses_count(self, obj):
+        # Survey querysets in jigyasa.views annotate the count (with_responses_count).
+        if hasattr(obj, 'responses_count'):
+            return obj.responses_count
         return obj.surveyresponse_set.count()
 
     def create(self, validated_data):
         questions_data = validated_data.pop('questions', [])
         survey = Survey.objects.create(**validated_data)
-        
-        for question_data in questions_data:
-            choices_data = question_data.pop('choices', [])
-            question = Question.objects.create(survey=survey, **question_data)
-            
-            for choice_data in choices_data:
-                Choice.objects.create(question=question, **choice_data)
+
+        # Two INSERTs for all questions and choices, however many there are. A
+        # new survey has no cached definition, so skipping signals loses nothing.
+        choices_data = [question_data.pop('choices', []) for question_data in questions_data]
+        questions = Question.objects.bulk_create([
+            Question(survey=survey, **question_data) for question_data in questions_data
+        ])
+        Choice.objects.bulk_create([
+            Choice(question=question, **choice_data)
+            for question, question_choices in zip(questions, choices_data)
+            for choice_data in question_choices
+        ])
         
         return survey
         
@@ -230,6 +239,18 @@ class SurveyResponseSerializer(serializers.ModelSerializer):
         model = SurveyResponse
         fields = ['id', 'survey', 'respondent', 'submitted_at', 'answers']
 
+    def to_representation(self, instance):
+        representation = super().to_representation(instance)
+        if instance.packed_answers is not None:
+            # Shaped like AnswerSerializer's output; packed answers have no Answer row to give an id.
+            reader = self.context.setdefault('answer_reader', AnswerReader())
+            revision = getattr(instance, 'survey_revision', None) or instance.survey.revision
+            representation['answers'] = [
+                {'id': None, 'question': question_id, 'text_answer': text_answer, 'selected_choices': choice_ids}
+                for question_id, text_answer, choice_ids in reader.rows(instance.survey_id, revision, instance.packed_answers)
+            ]
+        return representation
+
     def create(self, validated_data):
         answers_data = validated_data.pop('answer_set', [])
         response = SurveyResponse.objects.create(**validated_data)
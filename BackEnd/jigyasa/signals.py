@@ -0,0 +1,53 @@
+"""
+Drop cached survey definitions (jigyasa.async_views) when a survey changes,
+and move Survey.revision on when its questions or choices do.
+"""
+from django.core.cache import cache
+from django.db.models import F, QuerySet
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from .models import Choice, Question, Survey
+
+
+def definition_cache_key(survey_id):
+    return f"survey-definition:{survey_id}"
+
+
+def forget_definition(survey_id):
+    if survey_id is not None:
+        cache.delete(definition_cache_key(survey_id))
+
+
+def bump_revision(survey_id):
+    # An UPDATE rather than save(), which would send Survey's signals again.
+    Survey.objects.filter(id=survey_id).update(revision=F('revision') + 1)
+
+
+def deleted_with(origin, model):
+    """Whether a post_delete came from deleting a ``model`` (or a queryset of them)."""
+    return (origin.model if isinstance(origin, QuerySet) else type(origin)) is model
+
+
+@receiver([post_save, post_delete], sender=Survey)
+def survey_changed(sender, instance, **kwargs):
+    forget_definition(instance.id)
+
+
+@receiver([post_save, post_delete], sender=Question)
+def question_changed(sender, instance, origin=None, **kwargs):
+    if origin is None or not deleted_with(origin, Survey):
+        bump_revision(instance.survey_id)
+    forget_definition(instance.survey_id)
+
+
+@receiver([post_save, post_delete], sender=Choice)
+def choice_changed(sender, instance, origin=None, **kwargs):
+    # Choices deleted along with their survey or question are covered by that
+    # model's receiver; looking each one's survey up would cost a query per choice.
+    if origin is not None and not deleted_with(origin, Choice):
+        return
+    survey_id = Question.objects.filter(id=instance.question_id).values_list('survey_id', flat=True).first()
+    if survey_id is not None:
+        bump_revision(survey_id)
+    forget_definition(survey_id)
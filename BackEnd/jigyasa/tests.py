@@ -1,3 +1,466 @@
-from django.test import TestCase
+"""
+Query budgets for every route in jigyasa/urls.py, on data from seed_benchmark.
 
-# Create your tests here.
+List and detail endpoints are measured again after adding rows of the kind
+they read; see monitoring.testing. Then behaviour tests of answer storage, of
+the survey response routes, of the response compression middleware and of
+which modules workers load.
+"""
+import gzip
+import json
+import os
+import subprocess
+import sys
+import zlib
+from io import StringIO
+
+import zstandard
+from django.conf import settings
+from django.core.cache import cache
+from django.core.management import call_command
+from django.http import HttpResponse, StreamingHttpResponse
+from django.test import RequestFactory, SimpleTestCase, TestCase, override_settings
+from rest_framework.test import APITestCase
+from rest_framework_simplejwt.tokens import AccessToken, RefreshToken
+
+from jigyasa_backend.middleware import CompressionMiddleware, negotiate_encoding
+from monitoring.testing import PerformanceAssertionsMixin
+
+from .async_views import save_response
+from .models import Answer, Choice, Organization, Question, Survey, SurveyResponse, User, UserProfile
+from .serializers import SurveyResponseSerializer
+
+PASSWORD = 'benchmark-password'
+
+
+def make_survey(creator, organization=None, requires_organization=False, questions=4, choices=3, answer_storage='rows'):
+    """A survey alternating single choice, multiple choice and text questions."""
+    survey = Survey.objects.create(
+        title=f'Survey by {creator.username}', description='Budget test survey', creator=creator,
+        organization=organization, requires_organization=requires_organization, answer_storage=answer_storage,
+    )
+    types = ['single_choice', 'multiple_choice', 'text']
+    created = Question.objects.bulk_create([
+        Question(survey=survey, text=f'Question {i}', question_type=types[i % 3], required=True)
+        for i in range(questions)
+    ])
+    Choice.objects.bulk_create([
+        Choice(question=question, text=f'Option {k}')
+        for question in created if question.question_type != 'text'
+        for k in range(choices)
+    ])
+    return survey
+
+
+def add_responses(survey, respondents, count):
+    """``count`` responses answering every question, round-robin over ``respondents``."""
+    survey.refresh_from_db(fields=['revision', 'answer_storage'])
+    packed_revision = survey.revision if survey.answer_storage == 'packed' else None
+    questions = list(Question.objects.filter(survey=survey).prefetch_related('choice_set'))
+    for i in range(count):
+        rows = []
+        for question in questions:
+            choice_ids = [choice.id for choice in question.choice_set.all()]
+            if question.question_type == 'text':
+                rows.append((question.id, f'Answer {i}', []))
+            else:
+                picked = choice_ids[:2] if question.question_type == 'multiple_choice' else choice_ids[:1]
+                rows.append((question.id, None, picked))
+        save_response(survey.id, respondents[i % len(respondents)], rows, packed_revision)
+
+
+class SurveyAPIQueryBudgetTests(PerformanceAssertionsMixin, APITestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        call_command(
+            'seed_benchmark', users=30, surveys=6, questions=6, choices=4, responses=300,
+            csv_uploads=0, batch_size=100, password=PASSWORD, stdout=StringIO(),
+        )
+        cls.organization = Organization.objects.order_by('id').first()
+        cls.user = User.objects.create_user(username='owner', email='owner@example.com', password=PASSWORD)
+        UserProfile.objects.create(user=cls.user, organization=cls.organization)
+        cls.respondents = list(User.objects.filter(username__startswith='bench-user-').order_by('id')[:10])
+
+        cls.survey = make_survey(cls.user, cls.organization)
+        add_responses(cls.survey, cls.respondents, 5)
+        cls.private_survey = make_survey(cls.respondents[0], cls.organization, requires_organization=True)
+        # Seeded survey 0 never requires an organization.
+        cls.open_survey = Survey.objects.get(title='Benchmark survey 0')
+
+    def setUp(self):
+        self.authenticate(self.user)
+
+    def authenticate(self, user):
+        self.client.credentials(HTTP_AUTHORIZATION=f"Bearer {AccessToken.for_user(user)}")
+
+    def grow_surveys(self, creator, organization=None):
+        def grow():
+            for _ in range(3):
+                survey = make_survey(creator, organization)
+                add_responses(survey, self.respondents, 3)
+        return grow
+
+    def test_register(self):
+        self.client.credentials()
+        self.assertQueryBudget(6, lambda: self.client.post('/api/auth/register/', {
+            'email': 'new@example.com', 'username': 'new', 'password': 'A-long-passw0rd',
+            'password2': 'A-long-passw0rd', 'organization_id': self.organization.id,
+        }, format='json'), status_code=201)
+
+    def test_login(self):
+        self.client.credentials()
+        self.assertQueryBudget(3, lambda: self.client.post('/api/auth/login/', {
+            'email': 'owner@example.com', 'password': PASSWORD,
+        }, format='json'), status_code=200)
+
+    def test_refresh(self):
+        self.client.credentials()
+        refresh = str(RefreshToken.for_user(self.user))
+        self.assertQueryBudget(1, lambda: self.client.post('/api/auth/refresh/', {'refresh': refresh}, format='json'), status_code=200)
+
+    def test_profile(self):
+        self.assertQueryBudget(3, lambda: self.client.get('/api/auth/profile/'), status_code=200)
+
+    def test_create_survey(self):
+        self.assertQueryBudget(5, lambda: self.client.post('/api/create-survey/', {
+            'title': 'New', 'description': 'New survey', 'questions': [
+                {'text': 'Pick one', 'question_type': 'single_choice', 'choices': [{'text': 'A'}, {'text': 'B'}]},
+                {'text': 'Pick some', 'question_type': 'multiple_choice', 'choices': [{'text': 'C'}, {'text': 'D'}]},
+            ],
+        }, format='json'), status_code=201)
+
+    def test_survey_list(self):
+        response = self.assertQueryBudget(
+            2, lambda: self.client.get('/api/surveys/'), grow=self.grow_surveys(self.user), status_code=200,
+        )
+        self.assertEqual(len(response.data), 4)
+        self.assertEqual(response.data[0]['responses_count'], 5)
+
+    def test_survey_retrieve(self):
+        response = self.assertQueryBudget(
+            4, lambda: self.client.get(f'/api/surveys/{self.survey.id}/'),
+            grow=lambda: add_responses(self.survey, self.respondents, 10), status_code=200,
+        )
+        self.assertEqual(response.data['responses_count'], 15)
+        self.assertEqual(len(response.data['questions']), 4)
+
+    def test_survey_update(self):
+        self.assertQueryBudget(
+            5, lambda: self.client.patch(f'/api/surveys/{self.survey.id}/', {'title': 'Renamed'}, format='json'),
+            status_code=200,
+        )
+
+    def test_survey_delete(self):
+        # The second run deletes a survey of the same shape with more responses.
+        surveys = [self.survey]
+
+        def grow():
+            surveys[0] = make_survey(self.user)
+            add_responses(surveys[0], self.respondents, 20)
+
+        self.assertQueryBudget(
+            14, lambda: self.client.delete(f'/api/surveys/{surveys[0].id}/'), grow=grow, status_code=204,
+        )
+
+    def test_organization_surveys(self):
+        response = self.assertQueryBudget(
+            3, lambda: self.client.get('/api/api/organization-surveys/'),
+            grow=self.grow_surveys(self.respondents[1], self.organization), status_code=200,
+        )
+        self.assertTrue(all(survey['responses_count'] is not None for survey in response.data))
+
+    def test_organization_list(self):
+        self.client.credentials()
+        self.assertQueryBudget(
+            1, lambda: self.client.get('/api/organizations/'),
+            grow=lambda: Organization.objects.bulk_create(Organization(name=f'Extra {i}') for i in range(20)),
+            status_code=200,
+        )
+
+    def test_organization_create(self):
+        self.assertQueryBudget(2, lambda: self.client.post('/api/organizations/', {'name': 'New'}, format='json'), status_code=201)
+
+    def test_survey_detail(self):
+        url = f'/api/api/surveys/{self.user.id}/{self.survey.id}/'
+        self.assertQueryBudget(
+            3, lambda: self.client.get(url),
+            grow=lambda: add_responses(self.survey, self.respondents, 10), status_code=200,
+        )
+        # Served from the definition cache once loaded.
+        self.clear_cache = False
+        self.assertQueryBudget(0, lambda: self.client.get(url), status_code=200)
+
+    def test_public_survey(self):
+        self.client.credentials()
+        self.assertQueryBudget(3, lambda: self.client.get(f'/api/surveys/{self.open_survey.id}/public/'), status_code=200)
+
+    def test_public_survey_with_organization(self):
+        self.assertQueryBudget(5, lambda: self.client.get(f'/api/surveys/{self.private_survey.id}/public/'), status_code=200)
+
+    def test_submit_response(self):
+        answers = []
+        for question in Question.objects.filter(survey=self.survey).prefetch_related('choice_set'):
+            choices = [choice.id for choice in question.choice_set.all()]
+            answers.append({'question': question.id, 'text_answer': 'Fine', 'selected_choices': choices[:1]})
+        # Includes the savepoint pair of save_response's atomic block inside the test transaction.
+        self.assertQueryBudget(9, lambda: self.client.post('/api/survey-responses/', {
+            'survey': self.survey.id, 'answers': answers,
+        }, format='json'), status_code=201)
+
+    def submit(self, survey):
+        answers = []
+        for question in Question.objects.filter(survey=survey).prefetch_related('choice_set'):
+            choices = [choice.id for choice in question.choice_set.all()]
+            answers.append({'question': question.id, 'text_answer': 'Fine', 'selected_choices': choices[:1]})
+        return lambda: self.client.post('/api/survey-responses/', {'survey': survey.id, 'answers': answers}, format='json')
+
+    def test_submit_packed_response(self):
+        survey = make_survey(self.user, answer_storage='packed')
+        # One INSERT for the response and all of its answers.
+        self.assertQueryBudget(5, self.submit(survey), status_code=201)
+
+    def test_packed_survey_response_list(self):
+        survey = make_survey(self.user, answer_storage='packed')
+        add_responses(survey, self.respondents, 5)
+        response = self.assertQueryBudget(
+            3, lambda: self.client.get(f'/api/survey-responses/?survey={survey.id}'),
+            grow=lambda: add_responses(survey, self.respondents, 10), status_code=200,
+        )
+        self.assertEqual(len(response.data), 15)
+        self.assertEqual(len(response.data[0]['answers']), 4)
+
+    def test_survey_response_list(self):
+        response = self.assertQueryBudget(
+            4, lambda: self.client.get(f'/api/survey-responses/?survey={self.survey.id}'),
+            grow=lambda: add_responses(self.survey, self.respondents, 10), status_code=200,
+        )
+        self.assertEqual(len(response.data), 15)
+
+    def test_own_survey_response_list(self):
+        self.authenticate(self.respondents[0])
+        self.assertQueryBudget(
+            4, lambda: self.client.get('/api/survey-responses/'),
+            grow=lambda: add_responses(self.survey, self.respondents[:1], 5), status_code=200,
+        )
+
+    def test_survey_response_retrieve(self):
+        self.authenticate(self.respondents[0])
+        response_id = SurveyResponse.objects.filter(survey=self.survey, respondent=self.respondents[0]).values_list('id', flat=True).first()
+        self.assertQueryBudget(
+            4, lambda: self.client.get(f'/api/survey-responses/{response_id}/'),
+            grow=lambda: add_responses(self.survey, self.respondents, 10), status_code=200,
+        )
+
+    def test_api_root(self):
+        self.assertQueryBudget(1, lambda: self.client.get('/api/'), status_code=200)
+
+
+class AnswerStorageTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username='owner', email='owner@example.com', password=PASSWORD)
+        cls.respondents = [
+            User.objects.create_user(username=f'respondent-{i}', email=f'respondent-{i}@example.com', password=PASSWORD)
+            for i in range(3)
+        ]
+        cls.survey = make_survey(cls.user, questions=6)
+        add_responses(cls.survey, cls.respondents, 12)
+
+    def answers(self):
+        queryset = SurveyResponse.objects.filter(survey=self.survey).order_by('id').select_related('survey')
+        return [
+            [{key: answer[key] for key in ('question', 'text_answer', 'selected_choices')} for answer in response['answers']]
+            for response in SurveyResponseSerializer(queryset.prefetch_related('answer_set__selected_choices'), many=True).data
+        ]
+
+    def convert(self, storage):
+        call_command('convert_answers', storage, survey=[self.survey.id], batch_size=5, stdout=StringIO())
+
+    def test_convert_round_trip(self):
+        rows = self.answers()
+        self.convert('packed')
+        self.assertFalse(Answer.objects.filter(response__survey=self.survey).exists())
+        self.assertEqual(self.answers(), rows)
+        self.convert('rows')
+        self.assertFalse(SurveyResponse.objects.filter(survey=self.survey, packed_answers__isnull=False).exists())
+        self.assertEqual(self.answers(), rows)
+
+    def test_packed_answers_follow_survey_changes(self):
+        self.convert('packed')
+        questions = list(Question.objects.filter(survey=self.survey).order_by('id').prefetch_related('choice_set'))
+        deleted_choice = questions[1].choice_set.all()[0]
+        revision = Survey.objects.get(id=self.survey.id).revision
+        questions[0].delete()
+        deleted_choice.delete()
+        self.assertEqual(Survey.objects.get(id=self.survey.id).revision, revision + 2)
+
+        for answers in self.answers():
+            self.assertNotIn(questions[0].id, [answer['question'] for answer in answers])
+            self.assertTrue(all(deleted_choice.id not in answer['selected_choices'] for answer in answers))
+            self.assertEqual(len(answers), 5)
+        packed = self.answers()
+        self.convert('rows')
+        self.assertEqual(self.answers(), packed)
+
+
+class SurveyResponseRoutesTests(APITestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username='owner', email='owner@example.com', password=PASSWORD)
+        cls.respondent = User.objects.create_user(username='respondent', email='respondent@example.com', password=PASSWORD)
+        cls.survey = make_survey(cls.user)
+        add_responses(cls.survey, [cls.respondent], 1)
+
+    def test_responses_are_not_edited(self):
+        self.client.credentials(HTTP_AUTHORIZATION=f"Bearer {AccessToken.for_user(self.respondent)}")
+        response_id = SurveyResponse.objects.get(survey=self.survey).id
+        url = f'/api/survey-responses/{response_id}/'
+        self.assertEqual(self.client.put(url, {'survey': self.survey.id, 'answers': []}, format='json').status_code, 405)
+        self.assertEqual(self.client.patch(url, {'survey': self.survey.id}, format='json').status_code, 405)
+        self.assertEqual(self.client.delete(url).status_code, 204)
+        self.assertFalse(SurveyResponse.objects.filter(id=response_id).exists())
+
+
+def decompress(body, coding):
+    if coding == 'gzip':
+        return gzip.decompress(body)
+    if coding == 'zstd':
+        return zstandard.ZstdDecompressor().decompressobj().decompress(body)
+    import brotli
+    return brotli.decompress(body)
+
+
+class CompressionMiddlewareTests(SimpleTestCase):
+    body = json.dumps([{"id": i, "text": f"Option {i % 7}"} for i in range(200)]).encode()
+
+    def respond(self, response, accept_encoding):
+        request = RequestFactory().get('/', HTTP_ACCEPT_ENCODING=accept_encoding)
+        return CompressionMiddleware(lambda request: response)(request)
+
+    def json_response(self, body=None, **headers):
+        return HttpResponse(self.body if body is None else body, content_type='application/json', headers=headers)
+
+    def test_negotiation(self):
+        available = ['zstd', 'br', 'gzip']
+        for header, expected in [
+            ('gzip, br, zstd', 'zstd'),
+            ('gzip;q=0.5, br;q=0.8', 'br'),
+            ('zstd;q=0, *', 'br'),
+            ('gzip;q=1.0, *;q=0.1', 'gzip'),
+            ('GZIP', 'gzip'),
+            ('identity', None),
+            ('gzip;q=0', None),
+            ('', None),
+            ('gzip;q=abc, br', 'br'),
+        ]:
+            with self.subTest(header=header):
+                self.assertEqual(negotiate_encoding(header, available), expected)
+
+    def test_compresses_with_negotiated_encoding(self):
+        for accept_encoding, coding in [('gzip', 'gzip'), ('br;q=0.9, gzip;q=0.5', 'br'), ('zstd, br, gzip', 'zstd')]:
+            with self.subTest(accept_encoding=accept_encoding):
+                response = self.respond(self.json_response(ETag='"v1"'), accept_encoding)
+                self.assertEqual(response['Content-Encoding'], coding)
+                self.assertEqual(decompress(response.content, coding), self.body)
+                self.assertEqual(response['Content-Length'], str(len(response.content)))
+                self.assertEqual(response['Vary'], 'Accept-Encoding')
+                self.assertEqual(response['ETag'], 'W/"v1"')
+
+    def test_sent_as_is(self):
+        for name, response, accept_encoding in [
+            ('shorter than MIN_LENGTH', self.json_response(b'{"ok": true}'), 'gzip'),
+            ('no accepted encoding', self.json_response(), 'identity'),
+            ('not a compressed type', HttpResponse(self.body, content_type='application/pdf'), 'gzip'),
+            ('already encoded', self.json_response(**{'Content-Encoding': 'gzip'}), 'gzip'),
+        ]:
+            with self.subTest(name):
+                content = response.content
+                response = self.respond(response, accept_encoding)
+                self.assertEqual(response.content, content)
+                self.assertIn('Accept-Encoding', response['Vary'])
+                if name != 'already encoded':
+                    self.assertFalse(response.has_header('Content-Encoding'))
+
+    def test_min_length_setting(self):
+        body = b'{"answer": "' + b'y' * 300 + b'"}'
+        self.assertFalse(self.respond(self.json_response(body), 'gzip').has_header('Content-Encoding'))
+        with override_settings(RESPONSE_COMPRESSION={'MIN_LENGTH': 100}):
+            self.assertEqual(self.respond(self.json_response(body), 'gzip')['Content-Encoding'], 'gzip')
+
+    def test_streaming(self):
+        rows = [f"{i},Option {i % 5}\n".encode() for i in range(500)]
+        response = StreamingHttpResponse(iter(rows), content_type='text/csv')
+        response['Content-Length'] = str(sum(map(len, rows)))
+        response = self.respond(response, 'gzip')
+        self.assertEqual(response['Content-Encoding'], 'gzip')
+        self.assertFalse(response.has_header('Content-Length'))
+        chunks = list(response.streaming_content)
+        # Flushed per chunk: a stream reader can decode rows before the end.
+        self.assertGreater(len(chunks), 1)
+        self.assertEqual(zlib.decompressobj(31).decompress(chunks[0]), rows[0])
+        self.assertEqual(gzip.decompress(b''.join(chunks)), b''.join(rows))
+
+    def test_short_stream_sent_as_is(self):
+        response = StreamingHttpResponse(iter([b'a,b\n']), content_type='text/csv', headers={'Content-Length': '4'})
+        response = self.respond(response, 'gzip')
+        self.assertFalse(response.has_header('Content-Encoding'))
+        self.assertEqual(b''.join(response.streaming_content), b'a,b\n')
+
+
+class PublicSurveyCompressionTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        creator = User.objects.create_user(username='creator', password=PASSWORD)
+        cls.survey = make_survey(creator, questions=30, choices=5)
+
+    def test_public_survey_varies_and_reuses_compressed_body(self):
+        cache.clear()
+        url = f'/api/surveys/{self.survey.id}/public/'
+        first = self.client.get(url, HTTP_ACCEPT_ENCODING='gzip')
+        self.assertEqual(first.status_code, 200)
+        self.assertEqual(first['Content-Encoding'], 'gzip')
+        self.assertIn('public', first['Cache-Control'])
+        self.assertIn('Accept-Encoding', first['Vary'])
+        self.assertEqual(json.loads(gzip.decompress(first.content))['id'], self.survey.id)
+        # The compressed body of a public response is cached, so it is byte-identical
+        # (gzip's header carries a timestamp that would otherwise differ).
+        second = self.client.get(url, HTTP_ACCEPT_ENCODING='gzip')
+        self.assertEqual(second.content, first.content)
+
+        plain = self.client.get(url)
+        self.assertFalse(plain.has_header('Content-Encoding'))
+        self.assertIn('Accept-Encoding', plain['Vary'])
+        self.assertEqual(json.loads(plain.content), json.loads(gzip.decompress(first.content)))
+
+
+class StartupImportTests(SimpleTestCase):
+    """Workers that only serve surveys never load the analysis stack."""
+    heavy = ['pandas', 'numpy', 'plotly', 'reportlab']
+    script = """
+import json, sys
+from django.core.asgi import get_asgi_application
+from django.urls import resolve
+get_asgi_application()
+for path in ['/api/auth/login/', '/api/surveys/1/public/', '/api/survey-responses/', '/metrics']:
+    resolve(path)
+print(json.dumps([module for module in {heavy!r} if module in sys.modules]))
+"""
+
+    def loaded(self, settings_module):
+        result = subprocess.run(
+            [sys.executable, '-c', self.script.format(heavy=self.heavy)],
+            cwd=settings.BASE_DIR, env=dict(os.environ, DJANGO_SETTINGS_MODULE=settings_module),
+            capture_output=True, text=True, check=True,
+        )
+        return json.loads(result.stdout.splitlines()[-1])
+
+    def test_survey_workers(self):
+        self.assertEqual(self.loaded('jigyasa_backend.settings_survey'), [])
+
+    def test_full_workers_before_analysis_requests(self):
+        # survey_analyzer.urls is only imported for /survey-analyzer/ paths.
+        self.assertEqual(self.loaded('jigyasa_backend.settings'), [])
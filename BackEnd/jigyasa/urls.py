@@ -1,12 +1,12 @@
 from django.urls import path, include
 from rest_framework_simplejwt.views import TokenRefreshView
 from rest_framework.routers import DefaultRouter
+from .async_views import public_survey, survey_detail, survey_responses
 from .views import (
     RegisterView,
     LoginView,
     UserProfileView,
     SurveyCreateView,
-    SurveyDetailView,
     SurveyViewSet,
     SurveyResponseViewSet,
     OrganizationViewSet,
@@ -24,7 +24,10 @@ urlpatterns = [
     path('auth/refresh/', TokenRefreshView.as_view(), name='token_refresh'),
     path('auth/profile/', UserProfileView.as_view(), name='profile'),
     path('create-survey/', SurveyCreateView.as_view(), name='create-survey'),
-    path('api/surveys/<int:creator_id>/<int:survey_id>/', SurveyDetailView.as_view(), name='survey-detail'),
+    path('api/surveys/<int:creator_id>/<int:survey_id>/', survey_detail, name='survey-detail'),
     path('api/organization-surveys/', organization_surveys, name='organization-surveys'),
+    # Async views for survey blasts (jigyasa.async_views), ahead of the router's routes.
+    path('surveys/<int:pk>/public/', public_survey, name='survey-public'),
+    path('survey-responses/', survey_responses, name='survey-response-list'),
     path('', include(router.urls)),
 ]
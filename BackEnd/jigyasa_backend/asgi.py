@@ -5,6 +5,13 @@ It exposes the ASGI callable as a module-level variable named ``application``.
 
 For more information on this file, see
 https://docs.djangoproject.com/en/5.1/howto/deployment/asgi/
+
+Survey loading and submission (jigyasa.async_views) are async views, so under
+ASGI one worker serves many waiting respondents at once:
+
+    gunicorn jigyasa_backend.asgi:application -k uvicorn.workers.UvicornWorker -w 4
+
+benchmarks/locustfile.py compares this with the sync WSGI workers.
 """
 
 import os
@@ -0,0 +1,253 @@
+import hashlib
+import logging
+import re
+import zlib
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.core.cache import caches
+from django.utils.cache import patch_vary_headers
+
+try:
+    import brotli
+except ImportError:  # pragma: no cover - optional encoder
+    brotli = None
+
+try:
+    import zstandard
+except ImportError:  # pragma: no cover - optional encoder
+    zstandard = None
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_COMPRESSION = {
+    # Server preference order; only encodings the client accepts are used.
+    'ENCODINGS': ['zstd', 'br', 'gzip'],
+    # Bodies shorter than this are sent as-is.
+    'MIN_LENGTH': 1024,
+    # Levels per content type (longest matching prefix wins). Types that match
+    # nothing, e.g. PDFs and images, are never compressed.
+    'LEVELS': {
+        'application/json': {'zstd': 3, 'br': 4, 'gzip': 6},
+        'application/vnd.jigyasa.typed+json': {'zstd': 3, 'br': 4, 'gzip': 6},
+        'text/csv': {'zstd': 6, 'br': 5, 'gzip': 6},
+        'text/': {'zstd': 3, 'br': 4, 'gzip': 6},
+    },
+    # Compressed bodies of responses marked "Cache-Control: public" are kept
+    # here, keyed by a hash of the uncompressed body.
+    'CACHE_ALIAS': 'default',
+    'CACHE_TIMEOUT': 300,
+}
+
+accept_encoding_re = re.compile(r'^\s*([\w*-]+)\s*(?:;\s*q\s*=\s*([0-9.]+))?\s*$')
+
+
+class _GzipCompressor:
+    def __init__(self, level):
+        # wbits=31 writes a gzip header and trailer around the deflate stream.
+        self._obj = zlib.compressobj(level, zlib.DEFLATED, 31)
+
+    def compress(self, data):
+        return self._obj.compress(data)
+
+    def flush(self):
+        return self._obj.flush(zlib.Z_SYNC_FLUSH)
+
+    def finish(self):
+        return self._obj.flush(zlib.Z_FINISH)
+
+
+class _BrotliCompressor:
+    def __init__(self, level):
+        self._obj = brotli.Compressor(quality=level)
+
+    def compress(self, data):
+        return self._obj.process(data)
+
+    def flush(self):
+        return self._obj.flush()
+
+    def finish(self):
+        return self._obj.finish()
+
+
+class _ZstdCompressor:
+    def __init__(self, level):
+        self._obj = zstandard.ZstdCompressor(level=level).compressobj()
+
+    def compress(self, data):
+        return self._obj.compress(data)
+
+    def flush(self):
+        return self._obj.flush(zstandard.COMPRESSOBJ_FLUSH_BLOCK)
+
+    def finish(self):
+        return self._obj.flush(zstandard.COMPRESSOBJ_FLUSH_FINISH)
+
+
+COMPRESSORS = {'gzip': _GzipCompressor}
+if brotli is not None:
+    COMPRESSORS['br'] = _BrotliCompressor
+if zstandard is not None:
+    COMPRESSORS['zstd'] = _ZstdCompressor
+
+
+def compression_settings():
+    config = dict(DEFAULT_COMPRESSION)
+    config.update(getattr(settings, 'RESPONSE_COMPRESSION', {}))
+    return config
+
+
+def parse_accept_encoding(header):
+    """Return {coding: q} for an Accept-Encoding header."""
+    accepted = {}
+    for part in header.split(','):
+        match = accept_encoding_re.match(part)
+        if not match:
+            continue
+        coding, q = match.group(1).lower(), match.group(2)
+        try:
+            accepted[coding] = float(q) if q is not None else 1.0
+        except ValueError:
+            continue
+    return accepted
+
+
+def negotiate_encoding(header, available):
+    """Pick the best of ``available`` (in server preference order) for the client."""
+    accepted = parse_accept_encoding(header)
+    best, best_q = None, 0.0
+    for coding in available:
+        q = accepted.get(coding, accepted.get('*', 0.0))
+        if q > best_q:
+            best, best_q = coding, q
+    return best
+
+
+def levels_for(content_type, levels):
+    content_type = content_type.split(';')[0].strip().lower()
+    match = None
+    for prefix in levels:
+        if content_type.startswith(prefix) and (match is None or len(prefix) > len(match)):
+            match = prefix
+    return levels[match] if match is not None else None
+
+
+def compress_bytes(data, coding, level):
+    compressor = COMPRESSORS[coding](level)
+    return compressor.compress(data) + compressor.finish()
+
+
+def compress_stream(chunks, coding, level):
+    compressor = COMPRESSORS[coding](level)
+    for chunk in chunks:
+        # Flush after every chunk so streamed rows reach the client without waiting
+        # for the compressor's window to fill.
+        data = compressor.compress(chunk) + compressor.flush()
+        if data:
+            yield data
+    yield compressor.finish()
+
+
+async def acompress_stream(chunks, coding, level):
+    compressor = COMPRESSORS[coding](level)
+    async for chunk in chunks:
+        data = compressor.compress(chunk) + compressor.flush()
+        if data:
+            yield data
+    yield compressor.finish()
+
+
+def is_cacheable(response):
+    cache_control = response.get('Cache-Control', '').lower()
+    return 'public' in cache_control and 'no-store' not in cache_control and 'private' not in cache_control
+
+
+class CompressionMiddleware:
+    """
+    Negotiated zstd/brotli/gzip response compression.
+
+    Unlike django.middleware.gzip.GZipMiddleware this picks the encoding from the
+    client's Accept-Encoding q-values, uses per content type levels from
+    ``settings.RESPONSE_COMPRESSION`` and reuses compressed bodies of public,
+    cacheable responses (e.g. public survey definitions) instead of compressing
+    them again on every request.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.config = compression_settings()
+        self.encodings = [coding for coding in self.config['ENCODINGS'] if coding in COMPRESSORS]
+        if iscoroutinefunction(self.get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        response = self.get_response(request)
+        return self.process_response(request, response)
+
+    async def __acall__(self, request):
+        response = await self.get_response(request)
+        return self.process_response(request, response)
+
+    def process_response(self, request, response):
+        # The response varies with Accept-Encoding even when it is sent uncompressed.
+        patch_vary_headers(response, ('Accept-Encoding',))
+
+        if response.has_header('Content-Encoding') or response.status_code == 206:
+            return response
+
+        levels = levels_for(response.get('Content-Type', ''), self.config['LEVELS'])
+        if not levels:
+            return response
+
+        available = [coding for coding in self.encodings if coding in levels]
+        coding = negotiate_encoding(request.META.get('HTTP_ACCEPT_ENCODING', ''), available)
+        if coding is None:
+            return response
+        level = levels[coding]
+
+        if response.streaming:
+            content_length = response.get('Content-Length')
+            if content_length is not None and int(content_length) < self.config['MIN_LENGTH']:
+                return response
+            if response.is_async:
+                response.streaming_content = acompress_stream(response.streaming_content, coding, level)
+            else:
+                response.streaming_content = compress_stream(response.streaming_content, coding, level)
+            # The compressed length is unknown until the stream ends.
+            response.headers.pop('Content-Length', None)
+        else:
+            if len(response.content) < self.config['MIN_LENGTH']:
+                return response
+            compressed = self.compress_content(response, coding, level)
+            if len(compressed) >= len(response.content):
+                return response
+            response.content = compressed
+            response.headers['Content-Length'] = str(len(compressed))
+
+        # A strong ETag must not be shared by the compressed and identity bodies.
+        etag = response.get('ETag')
+        if etag and etag.startswith('"'):
+            response.headers['ETag'] = 'W/' + etag
+
+        response.headers['Content-Encoding'] = coding
+        return response
+
+    def compress_content(self, response, coding, level):
+        if not is_cacheable(response):
+            return compress_bytes(response.content, coding, level)
+
+        cache = caches[self.config['CACHE_ALIAS']]
+        digest = hashlib.blake2b(response.content, digest_size=20).hexdigest()
+        key = f"compressed-body:{coding}:{level}:{digest}"
+        compressed = cache.get(key)
+        if compressed is None:
+            compressed = compress_bytes(response.content, coding, level)
+            cache.set(key, compressed, self.config['CACHE_TIMEOUT'])
+        else:
+            logger.debug(f"Reused cached {coding} body for {digest}")
+        return compressed
@@ -59,16 +59,20 @@ INSTALLED_APPS = [
     'corsheaders',
     'jigyasa',
     'survey_analyzer',
+    'monitoring',
 ]
 
 
 MIDDLEWARE = [
+    'monitoring.middleware.MetricsMiddleware',
     'django.middleware.security.SecurityMiddleware',
+    'jigyasa_backend.middleware.CompressionMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'corsheaders.middleware.CorsMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
+    'monitoring.profiling.ProfilingMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
 ]
@@ -156,6 +160,11 @@ REST_FRAMEWORK = {
     'DEFAULT_PERMISSION_CLASSES': (
         'rest_framework.permissions.IsAuthenticated',
     ),
+    'DEFAULT_RENDERER_CLASSES': (
+        'survey_analyzer.renderers.NumpyJSONRenderer',
+        'survey_analyzer.renderers.TypedArrayJSONRenderer',
+        'rest_framework.renderers.BrowsableAPIRenderer',
+    ),
 }
 
 from datetime import timedelta
@@ -180,3 +189,91 @@ SIMPLE_JWT = {
 }
 
 CORS_ALLOW_CREDENTIALS = True
+
+# Response compression (see jigyasa_backend.middleware.DEFAULT_COMPRESSION for
+# the per content type levels).
+RESPONSE_COMPRESSION = {
+    'ENCODINGS': ['zstd', 'br', 'gzip'],
+    'MIN_LENGTH': 1024,
+    'CACHE_TIMEOUT': 300,
+}
+
+# Public survey definitions may be cached by browsers/proxies for this long.
+PUBLIC_SURVEY_CACHE_SECONDS = 60
+
+# How long a worker keeps a survey definition in the cache. Edits only clear
+# the editing process's entry while CACHES is the default LocMemCache, so other
+# workers may serve the old questions for this long; raise it only with a
+# shared cache (Redis or memcached) configured.
+SURVEY_DEFINITION_CACHE_SECONDS = 5
+
+# How new surveys store response answers: 'rows' (an Answer row per question)
+# or 'packed' (one document per response); see jigyasa.answer_storage.
+ANSWER_STORAGE = 'rows'
+
+# Parsed uploads shared between worker processes through mmap'd column files
+# (see survey_analyzer.column_store).
+COLUMN_STORE = {
+    'DIR': BASE_DIR / 'column_store',
+    'MAX_BYTES': 4 * 1024 ** 3,
+    'HANDLES_PER_WORKER': 16,
+}
+
+# In-memory bitmap indexes of surveys' choice answers for drill-down counts
+# (see survey_analyzer.choice_index).
+CHOICE_INDEX = {
+    'SURVEYS_PER_WORKER': 8,
+}
+
+# Cached results of pairwise statistics (correlation matrices, ...) per upload
+# content and request.
+STATS_CACHE_TIMEOUT = 60 * 60
+
+# Plot data built from saved plot specs, cached per upload content and spec.
+PLOT_CACHE_TIMEOUT = 60 * 60
+
+# Plot data, group-by counts, statistics and PDF publishing run in a process
+# pool behind per-user and host-wide limits (see survey_analyzer.compute for
+# all options).
+ANALYSIS_COMPUTE = {
+    'DIR': BASE_DIR / 'compute_slots',
+    'WORKERS': 2,
+    'SLOTS': 4,
+    'QUEUE': 8,
+    'PER_USER': 2,
+    'QUEUE_TIMEOUT': 10,
+    'TIMEOUT': 120,
+}
+
+# /metrics (Prometheus text format, see monitoring.metrics) is served to
+# requests with "Authorization: Bearer <METRICS_TOKEN>" (none without a token).
+# METRICS_ALLOWED_IPS lets addresses in without it; only list loopback when no
+# reverse proxy runs on the same host, since proxied requests come from there.
+METRICS_TOKEN = None
+METRICS_ALLOWED_IPS = []
+# Every worker writes its series here and /metrics merges them.
+METRICS_DIR = BASE_DIR / 'metrics'
+METRICS_FLUSH_SECONDS = 1.0
+
+# Staff users can profile single requests with "X-Profile: 1" or "?profile=1"
+# (see monitoring.profiling); only the newest REQUEST_PROFILE_LIMIT are kept.
+REQUEST_PROFILING_ENABLED = True
+REQUEST_PROFILE_LIMIT = 200
+
+# Phase timings (monitoring.timing) in a Server-Timing header on every response.
+SERVER_TIMING = True
+
+# One JSON line per request on the 'monitoring.requests' logger.
+LOGGING = {
+    'version': 1,
+    'disable_existing_loggers': False,
+    'formatters': {
+        'json': {'()': 'monitoring.log_format.JSONFormatter'},
+    },
+    'handlers': {
+        'requests': {'class': 'logging.StreamHandler', 'formatter': 'json'},
+    },
+    'loggers': {
+        'monitoring.requests': {'handlers': ['requests'], 'level': 'INFO', 'propagate': False},
+    },
+}
@@ -0,0 +1,17 @@
+"""
+Settings for survey-only workers.
+
+Survey blasts need many workers for the survey API, and none of them needs the
+analysis stack. Workers started with these settings serve everything except
+/survey-analyzer/ (which 404s), and stay small: the full workers, started with
+jigyasa_backend.settings, take the analysis routes behind the same proxy.
+
+    DJANGO_SETTINGS_MODULE=jigyasa_backend.settings_survey \
+        gunicorn jigyasa_backend.asgi:application -k uvicorn.workers.UvicornWorker -w 8
+
+benchmarks/bench_startup.py compares their boot time and memory with the full
+workers'.
+"""
+from .settings import *  # noqa: F401,F403
+
+ROOT_URLCONF = 'jigyasa_backend.urls_survey'
@@ -16,10 +16,24 @@ Including another URLconf
 """
 from django.contrib import admin
 from django.urls import path, include
+from django.urls.resolvers import RoutePattern, URLResolver
+
+
+def lazy_include(route, urlconf):
+    """
+    Like ``path(route, include(urlconf))``, but ``urlconf`` is imported the
+    first time a request path starts with ``route`` (or something reverses a
+    URL) instead of when the worker loads this module.
+    """
+    return URLResolver(RoutePattern(route, is_endpoint=False), urlconf)
+
 
 urlpatterns = [
     path('admin/', admin.site.urls),
     path('api/', include('jigyasa.urls')),
-    path('survey-analyzer/', include('survey_analyzer.urls')),
+    # The analysis views bring in pandas and NumPy; a worker only pays for them
+    # once it serves an analysis request. Survey-only workers
+    # (jigyasa_backend.settings_survey) use urls_survey, which leaves them out.
+    lazy_include('survey-analyzer/', 'survey_analyzer.urls'),
+    path('', include('monitoring.urls')),
 ]
-
@@ -0,0 +1,14 @@
+"""
+URL configuration for survey-only workers (jigyasa_backend.settings_survey).
+
+The same routes as jigyasa_backend.urls without the analysis API, so these
+workers never import pandas, NumPy, SciPy or ReportLab.
+"""
+from django.contrib import admin
+from django.urls import path, include
+
+urlpatterns = [
+    path('admin/', admin.site.urls),
+    path('api/', include('jigyasa.urls')),
+    path('', include('monitoring.urls')),
+]
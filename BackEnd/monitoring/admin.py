@@ -0,0 +1,24 @@
+from django.contrib import admin
+from django.urls import reverse
+from django.utils.html import format_html
+
+from .models import RequestProfile
+
+
+@admin.register(RequestProfile)
+class RequestProfileAdmin(admin.ModelAdmin):
+    list_display = ['created_at', 'method', 'path', 'view', 'status_code', 'duration_ms', 'query_count', 'download']
+    list_filter = ['view', 'method', 'status_code']
+    search_fields = ['path', 'view']
+    exclude = ['stats']
+    readonly_fields = [
+        'user', 'created_at', 'method', 'path', 'view', 'params', 'status_code',
+        'duration_ms', 'query_count', 'query_ms', 'summary', 'download',
+    ]
+
+    def has_add_permission(self, request):
+        return False
+
+    @admin.display(description='Profile')
+    def download(self, obj):
+        return format_html('<a href="{}">.prof</a>', reverse('request-profile-download', args=[obj.id]))
@@ -0,0 +1,21 @@
+import json
+import logging
+
+
+class JSONFormatter(logging.Formatter):
+    """
+    One JSON object per line: time, level, logger and message, plus the dict
+    passed as ``extra={"fields": {...}}`` merged in.
+    """
+
+    def format(self, record):
+        entry = {
+            "time": self.formatTime(record),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+        }
+        entry.update(getattr(record, 'fields', None) or {})
+        if record.exc_info:
+            entry["exception"] = self.formatException(record.exc_info)
+        return json.dumps(entry, default=str)
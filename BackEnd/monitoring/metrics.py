@@ -0,0 +1,422 @@
+"""
+Request metrics in the Prometheus text exposition format.
+
+Counters and histograms are recorded in memory by the process that observes
+them. With ``METRICS_DIR`` set, every process also writes its series to a file
+of its own in that directory, at most every ``METRICS_FLUSH_SECONDS`` and when
+it exits, and ``/metrics`` merges the files of all processes. Any worker behind
+the shared port can then answer a scrape, and counters never go backwards:
+- The files of processes that have exited are folded into one archive file,
+  so a restarted worker's counts are kept.
+- Readers and the folding hold a ``flock`` on the directory's lock file, so a
+  scrape never counts a folded file twice.
+
+The directory is per host. Emptying it when the server restarts is optional;
+Prometheus reads the drop as a counter reset. Without METRICS_DIR (tests,
+management commands) a process only reports its own series.
+
+Labels are route-level (view class and action), never URLs or ids, so the
+number of series stays bounded.
+"""
+import atexit
+import bisect
+import fcntl
+import json
+import math
+import os
+import threading
+import time
+import uuid
+
+from django.conf import settings
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+QUERY_COUNT_BUCKETS = (0, 1, 2, 5, 10, 20, 50, 100, 200, 500, 1000)
+PHASE_BUCKETS = (0.0001, 0.00025, 0.0005, 0.001, 0.0025) + LATENCY_BUCKETS
+SIZE_BUCKETS = (256, 1024, 4096, 16384, 65536, 262144, 1048576, 4194304, 16777216, 67108864)
+
+ARCHIVE = 'archive.json'
+LOCK = '.lock'
+
+
+def _escape(value):
+    return str(value).replace('\\', r'\\').replace('"', r'\"').replace('\n', r'\n')
+
+
+def _format_labels(labels):
+    if not labels:
+        return ''
+    return '{' + ','.join(f'{name}="{_escape(value)}"' for name, value in labels) + '}'
+
+
+def _format_value(value):
+    if value == math.inf:
+        return '+Inf'
+    if float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
+
+
+class Metric:
+    type = None
+
+    def __init__(self, registry, name, documentation, labelnames=()):
+        self.registry = registry
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def _key(self, labels):
+        if set(labels) != set(self.labelnames):
+            raise ValueError(f"{self.name} takes labels {self.labelnames}, got {tuple(labels)}")
+        self.registry.check_process()
+        return tuple(str(labels[name]) for name in self.labelnames)
+
+    def describe(self):
+        return {"type": self.type, "help": self.documentation, "labels": list(self.labelnames)}
+
+    def dump(self):
+        """This process' series as ``[[label values], value]`` pairs, copied under the lock."""
+        with self._lock:
+            return [[list(key), self.copy(value)] for key, value in self._values.items()]
+
+    def clear(self):
+        with self._lock:
+            self._values.clear()
+
+
+class Counter(Metric):
+    type = 'counter'
+
+    def inc(self, amount=1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+        self.registry.changed()
+
+    @staticmethod
+    def copy(value):
+        return value
+
+    @staticmethod
+    def combine(value, other):
+        return value + other
+
+    @staticmethod
+    def sample_lines(name, description, items):
+        for key, value in items:
+            yield f"{name}_total{_format_labels(zip(description['labels'], key))} {_format_value(value)}"
+
+
+class Histogram(Metric):
+    type = 'histogram'
+
+    def __init__(self, registry, name, documentation, labelnames=(), buckets=LATENCY_BUCKETS):
+        super().__init__(registry, name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+
+    def observe(self, value, **labels):
+        key = self._key(labels)
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            state = self._values.get(key)
+            if state is None:
+                # Per-bucket (not cumulative) counts, then the sum and the count.
+                state = self._values[key] = [[0] * len(self.buckets), 0.0, 0]
+            if index < len(self.buckets):
+                state[0][index] += 1
+            state[1] += value
+            state[2] += 1
+        self.registry.changed()
+
+    def describe(self):
+        return {**super().describe(), "buckets": list(self.buckets)}
+
+    def snapshot(self):
+        """``{label values: (bucket counts, sum, count)}`` over every process (see Registry.collect)."""
+        _, values = self.registry.collect().get(self.name, (None, {}))
+        return {key: tuple(state) for key, state in values.items()}
+
+    def quantile(self, counts, count, q):
+        """
+        Estimate the ``q`` quantile from per-bucket counts, interpolating within
+        the bucket like Prometheus' histogram_quantile.
+        """
+        rank = q * count
+        cumulative = 0
+        lower = 0.0
+        for bound, bucket_count in zip(self.buckets, counts):
+            if bucket_count and cumulative + bucket_count >= rank:
+                return lower + (bound - lower) * (rank - cumulative) / bucket_count
+            cumulative += bucket_count
+            lower = bound
+        return self.buckets[-1]
+
+    @staticmethod
+    def copy(state):
+        return [list(state[0]), state[1], state[2]]
+
+    @staticmethod
+    def combine(state, other):
+        return [[a + b for a, b in zip(state[0], other[0])], state[1] + other[1], state[2] + other[2]]
+
+    @staticmethod
+    def sample_lines(name, description, items):
+        for key, (counts, total, count) in items:
+            labels = list(zip(description['labels'], key))
+            cumulative = 0
+            for bound, bucket_count in zip(description['buckets'], counts):
+                cumulative += bucket_count
+                yield f"{name}_bucket{_format_labels(labels + [('le', _format_value(bound))])} {cumulative}"
+            yield f"{name}_bucket{_format_labels(labels + [('le', '+Inf')])} {count}"
+            yield f"{name}_sum{_format_labels(labels)} {_format_value(total)}"
+            yield f"{name}_count{_format_labels(labels)} {count}"
+
+
+METRIC_TYPES = {cls.type: cls for cls in (Counter, Histogram)}
+
+
+def _merge_into(merged, metrics):
+    """Add one process' dumped ``{name: {"description", "samples"}}`` to ``merged``."""
+    for name, dumped in metrics.items():
+        description = dumped["description"]
+        cls = METRIC_TYPES.get(description["type"])
+        if cls is None:
+            continue
+        values = merged.setdefault(name, (description, {}))[1]
+        for key, value in dumped["samples"]:
+            key = tuple(key)
+            values[key] = cls.combine(values[key], value) if key in values else value
+
+
+def _process_alive(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+    return True
+
+
+class Registry:
+    def __init__(self):
+        self._metrics = {}
+        self._lock = threading.Lock()
+        self._start_process()
+        atexit.register(self.flush)
+
+    def _start_process(self):
+        self._pid = os.getpid()
+        # pid plus a random part: a later process reusing the pid gets a file of its own.
+        self._filename = f"{self._pid}-{uuid.uuid4().hex}.json"
+        self._dirty = False
+        self._flusher = None
+
+    def check_process(self):
+        """Called before recording: a forked child starts without its parent's series."""
+        if os.getpid() != self._pid:
+            with self._lock:
+                if os.getpid() != self._pid:
+                    for metric in self._metrics.values():
+                        metric.clear()
+                    self._start_process()
+
+    def directory(self):
+        return getattr(settings, 'METRICS_DIR', None)
+
+    def changed(self):
+        self._dirty = True
+        if self._flusher is None and self.directory():
+            with self._lock:
+                if self._flusher is None:
+                    self._flusher = threading.Thread(target=self._flush_loop, name='metrics-flush', daemon=True)
+                    self._flusher.start()
+
+    def _flush_loop(self):
+        while True:
+            time.sleep(getattr(settings, 'METRICS_FLUSH_SECONDS', 1.0))
+            if self._dirty:
+                self.flush()
+
+    def _register(self, cls, name, *args, **kwargs):
+        with self._lock:
+            metric = self._metrics.get(name)
+            if metric is None:
+                metric = self._metrics[name] = cls(self, name, *args, **kwargs)
+            elif not isinstance(metric, cls):
+                raise ValueError(f"{name} is already registered as a {metric.type}")
+            return metric
+
+    def counter(self, name, documentation, labelnames=()):
+        return self._register(Counter, name, documentation, labelnames)
+
+    def histogram(self, name, documentation, labelnames=(), buckets=LATENCY_BUCKETS):
+        return self._register(Histogram, name, documentation, labelnames, buckets)
+
+    def dump(self):
+        with self._lock:
+            metrics = list(self._metrics.values())
+        return {metric.name: {"description": metric.describe(), "samples": metric.dump()} for metric in metrics}
+
+    def flush(self):
+        """Write this process' series to its file in METRICS_DIR (if set)."""
+        directory = self.directory()
+        if not directory or os.getpid() != self._pid:
+            return
+        self._dirty = False
+        os.makedirs(directory, exist_ok=True)
+        path = os.path.join(directory, self._filename)
+        with open(f"{path}.tmp", 'w') as fh:
+            json.dump({"pid": self._pid, "metrics": self.dump()}, fh)
+        os.replace(f"{path}.tmp", path)
+
+    def _lock_directory(self, directory, mode):
+        os.makedirs(directory, exist_ok=True)
+        handle = open(os.path.join(directory, LOCK), 'a')
+        fcntl.flock(handle, mode)
+        return handle
+
+    def _read(self, path):
+        try:
+            with open(path) as fh:
+                return json.load(fh)["metrics"]
+        except (OSError, ValueError, KeyError):
+            return {}
+
+    def _fold_exited(self, directory):
+        """Merge the files of processes that have exited into the archive."""
+        exited = []
+        for filename in os.listdir(directory):
+            if not filename.endswith('.json') or filename in (ARCHIVE, self._filename):
+                continue
+            pid = int(filename.split('-', 1)[0])
+            if pid == self._pid or not _process_alive(pid):
+                exited.append(filename)
+        if not exited:
+            return
+        handle = self._lock_directory(directory, fcntl.LOCK_EX)
+        try:
+            merged = {}
+            _merge_into(merged, self._read(os.path.join(directory, ARCHIVE)))
+            for filename in exited:
+                _merge_into(merged, self._read(os.path.join(directory, filename)))
+            archive = os.path.join(directory, ARCHIVE)
+            with open(f"{archive}.tmp", 'w') as fh:
+                json.dump({"pid": None, "metrics": {
+                    name: {"description": description, "samples": [[list(key), value] for key, value in values.items()]}
+                    for name, (description, values) in merged.items()
+                }}, fh)
+            os.replace(f"{archive}.tmp", archive)
+            for filename in exited:
+                try:
+                    os.remove(os.path.join(directory, filename))
+                except FileNotFoundError:
+                    pass
+        finally:
+            handle.close()
+
+    def collect(self):
+        """``{name: (description, {label values: value})}`` over every process writing to METRICS_DIR."""
+        merged = {}
+        directory = self.directory()
+        if directory:
+            self._fold_exited(directory)
+            handle = self._lock_directory(directory, fcntl.LOCK_SH)
+            try:
+                for filename in sorted(os.listdir(directory)):
+                    if filename.endswith('.json') and filename != self._filename:
+                        _merge_into(merged, self._read(os.path.join(directory, filename)))
+            finally:
+                handle.close()
+        # This process' own series are read from memory, not from its last flush.
+        _merge_into(merged, self.dump())
+        return merged
+
+    def render(self):
+        """All metrics as one Prometheus text-format document."""
+        lines = []
+        for name, (description, values) in sorted(self.collect().items()):
+            lines.append(f"# HELP {name} {_escape(description['help'])}")
+            lines.append(f"# TYPE {name} {description['type']}")
+            lines.extend(METRIC_TYPES[description['type']].sample_lines(name, description, sorted(values.items())))
+        return '\n'.join(lines) + '\n'
+
+
+REGISTRY = Registry()
+
+REQUEST_DURATION = REGISTRY.histogram(
+    'jigyasa_http_request_duration_seconds',
+    'Time until the response is returned (streamed bodies excluded), by view.',
+    ['view', 'method', 'status'],
+)
+REQUEST_QUERIES = REGISTRY.histogram(
+    'jigyasa_http_request_db_queries',
+    'Database queries run while handling a request.',
+    ['view', 'method'],
+    QUERY_COUNT_BUCKETS,
+)
+REQUEST_QUERY_DURATION = REGISTRY.histogram(
+    'jigyasa_http_request_db_duration_seconds',
+    'Time spent in database queries while handling a request.',
+    ['view', 'method'],
+)
+RESPONSE_SIZE = REGISTRY.histogram(
+    'jigyasa_http_response_size_bytes',
+    'Response body size as sent (after compression).',
+    ['view', 'method'],
+    SIZE_BUCKETS,
+)
+PHASE_DURATION = REGISTRY.histogram(
+    'jigyasa_phase_duration_seconds',
+    'Time spent in named phases of a request (CSV parsing, pandas compute, kaleido, ...).',
+    ['view', 'phase'],
+    PHASE_BUCKETS,
+)
+
+
+def _merge(states):
+    counts, total, count = None, 0.0, 0
+    for state_counts, state_total, state_count in states:
+        counts = state_counts if counts is None else [a + b for a, b in zip(counts, state_counts)]
+        total += state_total
+        count += state_count
+    return counts, total, count
+
+
+def _statistics(histogram, states):
+    counts, total, count = _merge(states)
+    return {
+        "count": count,
+        "total_seconds": round(total, 6),
+        "mean_ms": round(total / count * 1000, 3) if count else None,
+        "p50_ms": round(histogram.quantile(counts, count, 0.5) * 1000, 3) if count else None,
+        "p95_ms": round(histogram.quantile(counts, count, 0.95) * 1000, 3) if count else None,
+    }
+
+
+def phase_statistics():
+    """
+    Per view, request latency and time per phase over everything recorded (by
+    every process, with METRICS_DIR), with quantiles estimated from the
+    histogram buckets.
+    """
+    requests = {}
+    for (view, _method, _status), state in REQUEST_DURATION.snapshot().items():
+        requests.setdefault(view, []).append(state)
+    phases = {}
+    for (view, name), state in PHASE_DURATION.snapshot().items():
+        phases.setdefault(view, {}).setdefault(name, []).append(state)
+
+    return {
+        view: {
+            "requests": _statistics(REQUEST_DURATION, states),
+            "phases": {
+                name: _statistics(PHASE_DURATION, phase_states)
+                for name, phase_states in sorted(phases.get(view, {}).items())
+            },
+        }
+        for view, states in sorted(requests.items())
+    }
@@ -0,0 +1,177 @@
+import logging
+import time
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction, sync_to_async
+from django.conf import settings
+from django.db import connection
+
+from . import timing
+from .metrics import PHASE_DURATION, REQUEST_DURATION, REQUEST_QUERIES, REQUEST_QUERY_DURATION, RESPONSE_SIZE
+
+# One structured entry per request (see monitoring.log_format.JSONFormatter).
+request_logger = logging.getLogger('monitoring.requests')
+
+
+class QueryRecorder:
+    """``connection.execute_wrapper`` callable counting queries and their time."""
+
+    def __init__(self):
+        self.count = 0
+        self.seconds = 0.0
+
+    def __call__(self, execute, sql, params, many, context):
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.count += 1
+            self.seconds += time.perf_counter() - start
+
+
+def _install_wrapper(wrapper):
+    connection.execute_wrappers.append(wrapper)
+
+
+def _remove_wrapper(wrapper):
+    connection.execute_wrappers.remove(wrapper)
+
+
+async def arecording(queries):
+    """
+    Install ``queries`` on the connection async views' ORM calls use.
+    Connections are per thread, and under ASGI a request's database work runs
+    in its own thread-sensitive executor rather than the event loop thread.
+    """
+    await sync_to_async(_install_wrapper)(queries)
+
+
+async def astop_recording(queries):
+    await sync_to_async(_remove_wrapper)(queries)
+
+
+def view_label(request):
+    """
+    The view that handled ``request``: the DRF view class, with the action for
+    viewsets (``SurveyResponseViewSet.create``), else the URL name.
+    """
+    match = getattr(request, 'resolver_match', None)
+    if match is None:
+        return 'unmatched'
+    cls = getattr(match.func, 'cls', None) or getattr(match.func, 'view_class', None)
+    if cls is None:
+        return match.view_name or match.route
+    actions = getattr(match.func, 'actions', None) or {}
+    action = actions.get(request.method.lower())
+    return f"{cls.__name__}.{action}" if action else cls.__name__
+
+
+def _counted(chunks, done):
+    size = 0
+    try:
+        for chunk in chunks:
+            size += len(chunk)
+            yield chunk
+    finally:
+        done(size)
+
+
+def server_timing(phases, queries, duration):
+    """
+    A Server-Timing header value: one entry per phase (phases may nest, e.g.
+    read_csv inside plots), plus database time and the total, in milliseconds.
+    """
+    entries = [f"{name};dur={seconds * 1000:.1f}" for name, seconds in phases.items()]
+    entries.append(f'db;dur={queries.seconds * 1000:.1f};desc="{queries.count} queries"')
+    entries.append(f"total;dur={duration * 1000:.1f}")
+    return ', '.join(entries)
+
+
+async def _acounted(chunks, done):
+    size = 0
+    try:
+        async for chunk in chunks:
+            size += len(chunk)
+            yield chunk
+    finally:
+        done(size)
+
+
+class MetricsMiddleware:
+    """
+    Records latency, database queries, response size and phase timings
+    (monitoring.timing) per view into monitoring.metrics. Goes first in
+    MIDDLEWARE so sizes are measured after compression.
+
+    Each response also gets a Server-Timing header with the request's phases
+    (when settings.SERVER_TIMING is on), and each request one entry on the
+    'monitoring.requests' logger.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(self.get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        queries = QueryRecorder()
+        token = timing.start_request()
+        start = time.perf_counter()
+        try:
+            with connection.execute_wrapper(queries):
+                response = self.get_response(request)
+        finally:
+            phases = timing.finish_request(token)
+        return self.record(request, response, queries, phases, time.perf_counter() - start)
+
+    async def __acall__(self, request):
+        queries = QueryRecorder()
+        token = timing.start_request()
+        start = time.perf_counter()
+        await arecording(queries)
+        try:
+            response = await self.get_response(request)
+        finally:
+            await astop_recording(queries)
+            phases = timing.finish_request(token)
+        return self.record(request, response, queries, phases, time.perf_counter() - start)
+
+    def record(self, request, response, queries, phases, duration):
+        view = view_label(request)
+        method = request.method
+        REQUEST_DURATION.observe(duration, view=view, method=method, status=response.status_code)
+        REQUEST_QUERIES.observe(queries.count, view=view, method=method)
+        REQUEST_QUERY_DURATION.observe(queries.seconds, view=view, method=method)
+        for name, seconds in phases.items():
+            PHASE_DURATION.observe(seconds, view=view, phase=name)
+        if settings.SERVER_TIMING:
+            response['Server-Timing'] = server_timing(phases, queries, duration)
+        request_logger.info(
+            f"{method} {request.path} {response.status_code} {duration * 1000:.1f}ms",
+            extra={"fields": {
+                "view": view,
+                "method": method,
+                "path": request.path,
+                "status": response.status_code,
+                "duration_ms": round(duration * 1000, 2),
+                "db_queries": queries.count,
+                "db_ms": round(queries.seconds * 1000, 2),
+                "phases_ms": {name: round(seconds * 1000, 2) for name, seconds in phases.items()},
+            }},
+        )
+
+        def record_size(size):
+            RESPONSE_SIZE.observe(size, view=view, method=method)
+
+        if not response.streaming:
+            record_size(len(response.content))
+        elif response.has_header('Content-Length'):
+            record_size(int(response['Content-Length']))
+        elif response.is_async:
+            response.streaming_content = _acounted(response.streaming_content, record_size)
+        else:
+            response.streaming_content = _counted(response.streaming_content, record_size)
+        return response
@@ -0,0 +1,23 @@
+from django.db import migrations
+
+
+def redact_params(apps, schema_editor):
+    # Profiles stored before request_params redacted secrets.
+    from monitoring.profiling import redact
+
+    RequestProfile = apps.get_model('monitoring', 'RequestProfile')
+    for profile in RequestProfile.objects.only('id', 'params').iterator():
+        params = redact(profile.params)
+        if params != profile.params:
+            RequestProfile.objects.filter(id=profile.id).update(params=params)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('monitoring', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.RunPython(redact_params, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,24 @@
+from django.conf import settings
+from django.db import models
+
+
+class RequestProfile(models.Model):
+    """A cProfile run of one request, taken on demand for a staff user."""
+    user = models.ForeignKey(settings.AUTH_USER_MODEL, null=True, blank=True, on_delete=models.SET_NULL)
+    created_at = models.DateTimeField(auto_now_add=True)
+    method = models.CharField(max_length=10)
+    path = models.CharField(max_length=2048)
+    view = models.CharField(max_length=255)
+    params = models.JSONField(default=dict, blank=True)  # Query string, and small JSON bodies
+    status_code = models.PositiveSmallIntegerField()
+    duration_ms = models.FloatField()
+    query_count = models.PositiveIntegerField()
+    query_ms = models.FloatField()
+    summary = models.TextField()  # pstats report, top functions by cumulative time
+    stats = models.BinaryField()  # marshal'd pstats data, readable by pstats.Stats / snakeviz
+
+    class Meta:
+        ordering = ['-created_at', '-id']
+
+    def __str__(self):
+        return f"{self.method} {self.path} ({self.duration_ms:.0f} ms)"
@@ -0,0 +1,191 @@
+"""
+On-demand profiling of single requests.
+
+A staff user adds ``X-Profile: 1`` (or ``?profile=1``) to a request; it then
+runs under cProfile and is stored as a RequestProfile with its view, params,
+duration and query counts. The response carries ``X-Profile-Id``, and the
+profile can be listed and downloaded from /monitoring/profiles/ or the admin.
+
+Streaming responses are profiled until the response object is returned, not
+while the body is sent. Under ASGI only the event loop thread is profiled:
+async views' ORM calls run in executor threads and show up as waits.
+"""
+import cProfile
+import io
+import json
+import logging
+import marshal
+import pstats
+import time
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction, sync_to_async
+from django.conf import settings
+from django.db import connection
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.exceptions import InvalidToken, AuthenticationFailed
+
+from .middleware import QueryRecorder, arecording, astop_recording, view_label
+from .models import RequestProfile
+
+logger = logging.getLogger(__name__)
+
+# Functions listed in a profile's text summary.
+SUMMARY_FUNCTIONS = 60
+# JSON request bodies up to this size are stored with the profile.
+MAX_STORED_BODY = 4096
+# Body and query parameters whose name contains one of these are stored as
+# REDACTED: login, register, token refresh and password changes send secrets.
+SENSITIVE_KEYS = ('password', 'token', 'refresh', 'access', 'secret', 'authorization')
+REDACTED = '[redacted]'
+
+
+def profiling_requested(request):
+    return request.META.get('HTTP_X_PROFILE') == '1' or request.GET.get('profile') == '1'
+
+
+def request_user(request):
+    """
+    The user making ``request``. API requests authenticate with JWT inside the
+    DRF view, after middleware has run, so the token is checked here too.
+    """
+    user = getattr(request, 'user', None)
+    if user is not None and user.is_authenticated:
+        return user
+    try:
+        result = JWTAuthentication().authenticate(request)
+    except (InvalidToken, AuthenticationFailed):
+        return None
+    return result[0] if result else None
+
+
+def sensitive(key):
+    key = str(key).lower()
+    return any(word in key for word in SENSITIVE_KEYS)
+
+
+def redact(value):
+    """``value`` with the values of sensitive keys, at any depth, replaced."""
+    if isinstance(value, dict):
+        return {key: REDACTED if sensitive(key) else redact(item) for key, item in value.items()}
+    if isinstance(value, list):
+        return [redact(item) for item in value]
+    return value
+
+
+def body_storable(request):
+    """
+    Whether the body is small enough to read and store, going by its declared
+    length: reading one over DATA_UPLOAD_MAX_MEMORY_SIZE would raise
+    RequestDataTooBig here, before the view runs.
+    """
+    try:
+        length = int(request.META.get('CONTENT_LENGTH') or 0)
+    except ValueError:
+        return False
+    limit = settings.DATA_UPLOAD_MAX_MEMORY_SIZE
+    return length <= MAX_STORED_BODY and (limit is None or length <= limit)
+
+
+def request_params(request):
+    params = {"query": redact({key: request.GET.getlist(key) for key in request.GET if key != 'profile'})}
+    content_type = request.META.get('CONTENT_TYPE', '')
+    if content_type.startswith('application/json') and body_storable(request):
+        try:
+            params["body"] = redact(json.loads(request.body))
+        except ValueError:
+            pass
+    return params
+
+
+def profile_summary(stats):
+    output = io.StringIO()
+    stats.stream = output
+    stats.sort_stats('cumulative').print_stats(SUMMARY_FUNCTIONS)
+    return output.getvalue()
+
+
+def prune_profiles():
+    """Keep only the newest settings.REQUEST_PROFILE_LIMIT profiles."""
+    stale = RequestProfile.objects.values_list('id', flat=True)[settings.REQUEST_PROFILE_LIMIT:]
+    RequestProfile.objects.filter(id__in=list(stale)).delete()
+
+
+def profiling_user(request):
+    """The staff user to profile ``request`` for, or None to run it normally."""
+    user = request_user(request)
+    return user if user is not None and user.is_staff else None
+
+
+class ProfilingMiddleware:
+    """Runs requests that ask for it (staff users only) under cProfile and stores the result."""
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(self.get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        if not settings.REQUEST_PROFILING_ENABLED or not profiling_requested(request):
+            return self.get_response(request)
+        user = profiling_user(request)
+        if user is None:
+            return self.get_response(request)
+
+        # Read now: the view may consume the request stream.
+        params = request_params(request)
+        queries = QueryRecorder()
+        profiler = cProfile.Profile()
+        start = time.perf_counter()
+        with connection.execute_wrapper(queries):
+            profiler.enable()
+            try:
+                response = self.get_response(request)
+            finally:
+                profiler.disable()
+        duration = time.perf_counter() - start
+        return self.store(request, response, user, params, profiler, queries, duration)
+
+    async def __acall__(self, request):
+        if not settings.REQUEST_PROFILING_ENABLED or not profiling_requested(request):
+            return await self.get_response(request)
+        user = await sync_to_async(profiling_user)(request)
+        if user is None:
+            return await self.get_response(request)
+
+        params = request_params(request)
+        queries = QueryRecorder()
+        profiler = cProfile.Profile()
+        start = time.perf_counter()
+        await arecording(queries)
+        profiler.enable()
+        try:
+            response = await self.get_response(request)
+        finally:
+            profiler.disable()
+            await astop_recording(queries)
+        duration = time.perf_counter() - start
+        return await sync_to_async(self.store)(request, response, user, params, profiler, queries, duration)
+
+    def store(self, request, response, user, params, profiler, queries, duration):
+        stats = pstats.Stats(profiler)
+        profile = RequestProfile.objects.create(
+            user=user,
+            method=request.method,
+            path=request.path[:2048],
+            view=view_label(request)[:255],
+            params=params,
+            status_code=response.status_code,
+            duration_ms=duration * 1000,
+            query_count=queries.count,
+            query_ms=queries.seconds * 1000,
+            summary=profile_summary(stats),
+            stats=marshal.dumps(stats.stats),
+        )
+        prune_profiles()
+        logger.info(f"Stored profile {profile.id} of {request.method} {request.path} ({duration * 1000:.0f} ms)")
+        response['X-Profile-Id'] = str(profile.id)
+        return response
@@ -0,0 +1,19 @@
+from rest_framework import serializers
+
+from .models import RequestProfile
+
+
+class RequestProfileSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = RequestProfile
+        fields = [
+            'id', 'user', 'created_at', 'method', 'path', 'view', 'params', 'status_code',
+            'duration_ms', 'query_count', 'query_ms',
+        ]
+        read_only_fields = fields
+
+
+class RequestProfileDetailSerializer(RequestProfileSerializer):
+    class Meta(RequestProfileSerializer.Meta):
+        fields = RequestProfileSerializer.Meta.fields + ['summary']
+        read_only_fields = fields
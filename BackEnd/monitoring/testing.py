@@ -0,0 +1,79 @@
+"""
+Assertions for the performance regression tests (jigyasa.tests,
+survey_analyzer.tests).
+
+Query budgets are checked twice: once on the seeded data and again after the
+test has added more rows of the kind the endpoint reads. An endpoint whose
+query count changes in between issues queries per row (an N+1), and the
+failure lists the SQL of both runs so the repeated statement is easy to spot.
+
+Wall-time budgets are for fixed data sizes on a developer machine; slower CI
+runners can scale them with the PERF_TIME_SCALE environment variable.
+"""
+import os
+import time
+
+from django.core.cache import cache
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+
+TIME_SCALE = float(os.environ.get('PERF_TIME_SCALE', '1'))
+
+
+def format_queries(queries):
+    return '\n'.join(f"  {i}. {query['sql']}" for i, query in enumerate(queries, 1))
+
+
+class PerformanceAssertionsMixin:
+    """For TestCase subclasses; ``clear_cache`` empties the cache before every request measured."""
+    clear_cache = True
+
+    def measure(self, request):
+        """The response of ``request()`` and the queries it ran."""
+        if self.clear_cache:
+            cache.clear()
+        with CaptureQueriesContext(connection) as context:
+            response = request()
+        return response, context.captured_queries
+
+    def assertQueryBudget(self, budget, request, grow=None, status_code=None):
+        """
+        Run ``request()`` within ``budget`` queries. With ``grow``, call it to
+        add rows and require the same number of queries again. Returns the
+        (last) response.
+        """
+        response, queries = self.measure(request)
+        if status_code is not None:
+            self.assertEqual(response.status_code, status_code, getattr(response, 'data', None))
+        if len(queries) > budget:
+            self.fail(f"{len(queries)} queries, budget {budget}:\n{format_queries(queries)}")
+        if grow is None:
+            return response
+
+        grow()
+        grown_response, grown_queries = self.measure(request)
+        if status_code is not None:
+            self.assertEqual(grown_response.status_code, status_code, getattr(grown_response, 'data', None))
+        if len(grown_queries) != len(queries):
+            self.fail(
+                f"Query count grew with the data: {len(queries)} -> {len(grown_queries)}.\n"
+                f"Before:\n{format_queries(queries)}\nAfter:\n{format_queries(grown_queries)}"
+            )
+        return grown_response
+
+    def assertTimeBudget(self, seconds, request, repeat=3, status_code=200):
+        """
+        The fastest of ``repeat`` cold (cache cleared) runs of ``request()``
+        must take under ``seconds`` times PERF_TIME_SCALE. Returns the last response.
+        """
+        budget = seconds * TIME_SCALE
+        timings = []
+        for _ in range(repeat):
+            cache.clear()
+            start = time.perf_counter()
+            response = request()
+            timings.append(time.perf_counter() - start)
+            self.assertEqual(response.status_code, status_code, getattr(response, 'data', None))
+        if min(timings) > budget:
+            self.fail(f"Fastest of {repeat} runs took {min(timings):.3f}s, budget {budget:.3f}s")
+        return response
@@ -0,0 +1,194 @@
+import json
+import os
+import tempfile
+
+from django.contrib.auth import get_user_model
+from django.http import HttpResponse
+from django.test import RequestFactory, SimpleTestCase, TestCase, override_settings
+from rest_framework_simplejwt.tokens import AccessToken
+
+from .metrics import ARCHIVE, Registry, _process_alive
+from .middleware import MetricsMiddleware
+from .models import RequestProfile
+from .profiling import REDACTED, prune_profiles, request_params
+from .timing import phase
+
+
+def exited_pid():
+    pid = 2 ** 22 - 1
+    while _process_alive(pid):
+        pid -= 1
+    return pid
+
+
+class MetricsStoreTests(SimpleTestCase):
+    """Series of several processes merged through METRICS_DIR."""
+
+    def setUp(self):
+        self.directory = self.enterContext(tempfile.TemporaryDirectory())
+        self.enterContext(override_settings(METRICS_DIR=self.directory))
+        self.registry = Registry()
+        self.requests = self.registry.counter('test_requests', 'Requests.', ['view'])
+        self.latency = self.registry.histogram('test_latency_seconds', 'Latency.', ['view'], buckets=(0.1, 1))
+
+    def other_process(self, pid, requests, latencies):
+        """A process' file, as if written by ``pid``."""
+        other = Registry()
+        other.counter('test_requests', 'Requests.', ['view']).inc(requests, view='a')
+        latency = other.histogram('test_latency_seconds', 'Latency.', ['view'], buckets=(0.1, 1))
+        for seconds in latencies:
+            latency.observe(seconds, view='a')
+        path = os.path.join(self.directory, f'{pid}-other.json')
+        with open(path, 'w') as fh:
+            json.dump({"pid": pid, "metrics": other.dump()}, fh)
+        return path
+
+    def test_merges_processes(self):
+        self.requests.inc(2, view='a')
+        self.latency.observe(0.05, view='a')
+        self.other_process(os.getppid(), 3, [0.5, 2])
+
+        rendered = self.registry.render()
+        self.assertIn('test_requests_total{view="a"} 5', rendered)
+        self.assertIn('test_latency_seconds_bucket{view="a",le="0.1"} 1', rendered)
+        self.assertIn('test_latency_seconds_bucket{view="a",le="1"} 2', rendered)
+        self.assertIn('test_latency_seconds_count{view="a"} 3', rendered)
+        self.assertEqual(self.latency.snapshot(), {('a',): ([1, 1], 2.55, 3)})
+
+    def test_exited_processes_are_kept(self):
+        self.requests.inc(view='a')
+        first = self.other_process(exited_pid(), 3, [])
+        self.assertIn('test_requests_total{view="a"} 4', self.registry.render())
+        self.assertFalse(os.path.exists(first))
+        self.assertTrue(os.path.exists(os.path.join(self.directory, ARCHIVE)))
+
+        # A second exit adds to the archive; the count never goes back.
+        self.other_process(exited_pid(), 2, [])
+        self.assertIn('test_requests_total{view="a"} 6', self.registry.render())
+        self.assertIn('test_requests_total{view="a"} 6', self.registry.render())
+
+    def test_flush(self):
+        self.requests.inc(view='b')
+        self.registry.flush()
+        reader = Registry()
+        reader.counter('test_requests', 'Requests.', ['view'])
+        # The flushing process is alive (it is this one, under another file name).
+        self.assertIn('test_requests_total{view="b"} 1', reader.render())
+
+
+@override_settings(METRICS_DIR=None)
+class MetricsAccessTests(SimpleTestCase):
+
+    def test_token_required_by_default(self):
+        # The test client's REMOTE_ADDR is 127.0.0.1, like a proxy on the same host.
+        self.assertEqual(self.client.get('/metrics').status_code, 404)
+        with override_settings(METRICS_TOKEN='secret'):
+            self.assertEqual(self.client.get('/metrics').status_code, 404)
+            self.assertEqual(self.client.get('/metrics', HTTP_AUTHORIZATION='Bearer wrong').status_code, 404)
+            response = self.client.get('/metrics', HTTP_AUTHORIZATION='Bearer secret')
+            self.assertEqual(response.status_code, 200)
+            self.assertIn(b'# TYPE jigyasa_http_request_duration_seconds histogram', response.content)
+
+    def test_allowed_addresses_opt_in(self):
+        with override_settings(METRICS_ALLOWED_IPS=['127.0.0.1']):
+            self.assertEqual(self.client.get('/metrics').status_code, 200)
+
+
+class ServerTimingTests(TestCase):
+
+    @staticmethod
+    def view(request):
+        with phase('plots'):
+            with phase('read_csv'):
+                get_user_model().objects.count()
+            get_user_model().objects.exists()
+        return HttpResponse('ok')
+
+    def get(self):
+        return MetricsMiddleware(self.view)(RequestFactory().get('/survey-analyzer/publish-analysis/'))
+
+    def test_header(self):
+        entries = {}
+        for entry in self.get()['Server-Timing'].split(', '):
+            name, *params = entry.split(';')
+            entries[name] = dict(param.split('=', 1) for param in params)
+        self.assertEqual(list(entries), ['read_csv', 'plots', 'db', 'total'])
+        self.assertEqual(entries['db']['desc'], '"2 queries"')
+        for params in entries.values():
+            self.assertGreaterEqual(float(params['dur']), 0)
+        # read_csv is nested in plots, and everything in the total.
+        self.assertLessEqual(float(entries['read_csv']['dur']), float(entries['plots']['dur']))
+        self.assertLessEqual(float(entries['plots']['dur']), float(entries['total']['dur']))
+
+    def test_off(self):
+        with override_settings(SERVER_TIMING=False):
+            self.assertFalse(self.get().has_header('Server-Timing'))
+
+
+@override_settings(REQUEST_PROFILING_ENABLED=True)
+class ProfilingMiddlewareTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        User = get_user_model()
+        cls.staff = User.objects.create_user(username='staff', email='staff@example.com', password='pw', is_staff=True)
+        cls.user = User.objects.create_user(username='user', email='user@example.com', password='pw')
+
+    def get(self, user, **headers):
+        return self.client.get(
+            '/api/survey-responses/', HTTP_AUTHORIZATION=f"Bearer {AccessToken.for_user(user)}", **headers,
+        )
+
+    def test_staff_only(self):
+        response = self.get(self.user, HTTP_X_PROFILE='1')
+        self.assertEqual(response.status_code, 200)
+        self.assertFalse(response.has_header('X-Profile-Id'))
+        self.assertFalse(RequestProfile.objects.exists())
+
+    def test_staff_request_profiled(self):
+        self.assertFalse(self.get(self.staff).has_header('X-Profile-Id'))
+        response = self.get(self.staff, HTTP_X_PROFILE='1')
+        self.assertEqual(response.status_code, 200)
+        profile = RequestProfile.objects.get(id=response['X-Profile-Id'])
+        self.assertEqual(
+            (profile.user, profile.method, profile.path, profile.view, profile.status_code),
+            (self.staff, 'GET', '/api/survey-responses/', 'survey-response-list', 200),
+        )
+        self.assertGreater(profile.query_count, 0)
+        self.assertTrue(profile.summary)
+
+    def test_prune(self):
+        for _ in range(5):
+            self.get(self.staff, HTTP_X_PROFILE='1')
+        newest = list(RequestProfile.objects.values_list('id', flat=True)[:3])
+        with override_settings(REQUEST_PROFILE_LIMIT=3):
+            prune_profiles()
+        self.assertEqual(sorted(RequestProfile.objects.values_list('id', flat=True)), sorted(newest))
+
+    def test_large_body_left_to_the_view(self):
+        request = RequestFactory().post('/auth/login/', json.dumps({"text": "x" * 2000}), content_type='application/json')
+        with override_settings(DATA_UPLOAD_MAX_MEMORY_SIZE=1000):
+            self.assertEqual(request_params(request), {"query": {}})
+        self.assertFalse(hasattr(request, '_body'))
+
+
+class ProfileParamsTests(SimpleTestCase):
+
+    def test_secrets_are_redacted(self):
+        request = RequestFactory().post(
+            '/auth/login/?profile=1&token=abc&page=2',
+            json.dumps({
+                "username": "ana", "password": "hunter2",
+                "profile": {"new_password1": "x", "name": "Ana"},
+                "tokens": [{"refresh": "r"}], "items": [{"Access_Token": "t", "id": 1}],
+            }),
+            content_type='application/json',
+        )
+        self.assertEqual(request_params(request), {
+            "query": {"token": REDACTED, "page": ["2"]},
+            "body": {
+                "username": "ana", "password": REDACTED,
+                "profile": {"new_password1": REDACTED, "name": "Ana"},
+                "tokens": REDACTED, "items": [{"Access_Token": REDACTED, "id": 1}],
+            },
+        })
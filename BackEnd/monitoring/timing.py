@@ -0,0 +1,47 @@
+"""
+Named phase timings for the request being handled.
+
+    from monitoring.timing import phase
+
+    with phase('read_csv'):
+        df = pd.read_csv(path)
+
+Durations add up per request (a phase entered twice counts twice) and are
+recorded by MetricsMiddleware. Outside a request, e.g. in management commands
+or pool workers, phases cost one context variable lookup and are discarded.
+"""
+import contextvars
+import time
+from contextlib import contextmanager
+
+_phases = contextvars.ContextVar('monitoring_phases', default=None)
+
+
+def start_request():
+    """Begin collecting phases; pass the returned token to finish_request."""
+    return _phases.set({})
+
+
+def finish_request(token):
+    """Stop collecting and return ``{phase: seconds}`` for the request."""
+    phases = _phases.get()
+    _phases.reset(token)
+    return phases or {}
+
+
+def record(name, seconds):
+    phases = _phases.get()
+    if phases is not None:
+        phases[name] = phases.get(name, 0.0) + seconds
+
+
+@contextmanager
+def phase(name):
+    if _phases.get() is None:
+        yield
+        return
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        record(name, time.perf_counter() - start)
@@ -0,0 +1,13 @@
+from django.urls import path, include
+from rest_framework.routers import DefaultRouter
+
+from .views import PhaseStatisticsView, RequestProfileViewSet, metrics
+
+router = DefaultRouter()
+router.register(r'profiles', RequestProfileViewSet, basename='request-profile')
+
+urlpatterns = [
+    path('metrics', metrics, name='metrics'),
+    path('monitoring/phases/', PhaseStatisticsView.as_view(), name='phase-statistics'),
+    path('monitoring/', include(router.urls)),
+]
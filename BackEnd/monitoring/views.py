@@ -0,0 +1,70 @@
+from django.conf import settings
+from django.http import Http404, HttpResponse
+from django.utils.crypto import constant_time_compare
+from rest_framework import viewsets
+from rest_framework.authentication import SessionAuthentication
+from rest_framework.decorators import action
+from rest_framework.permissions import IsAdminUser
+from rest_framework.response import Response
+from rest_framework.views import APIView
+from rest_framework_simplejwt.authentication import JWTAuthentication
+
+from .metrics import REGISTRY, phase_statistics
+from .models import RequestProfile
+from .serializers import RequestProfileSerializer, RequestProfileDetailSerializer
+
+
+def metrics_allowed(request):
+    """
+    Requests with ``Authorization: Bearer <METRICS_TOKEN>``, and requests from
+    the addresses in METRICS_ALLOWED_IPS (none unless configured).
+    """
+    if request.META.get('REMOTE_ADDR') in settings.METRICS_ALLOWED_IPS:
+        return True
+    token = settings.METRICS_TOKEN
+    header = request.META.get('HTTP_AUTHORIZATION', '')
+    return bool(token) and constant_time_compare(header, f"Bearer {token}")
+
+
+def metrics(request):
+    # Not advertised to anyone else.
+    if not metrics_allowed(request):
+        raise Http404
+    return HttpResponse(REGISTRY.render(), content_type='text/plain; version=0.0.4; charset=utf-8')
+
+
+class PhaseStatisticsView(APIView):
+    """Latency and phase timing statistics per view, from this process' metrics."""
+    authentication_classes = [JWTAuthentication, SessionAuthentication]
+    permission_classes = [IsAdminUser]
+
+    def get(self, request, *args, **kwargs):
+        return Response(phase_statistics())
+
+
+class RequestProfileViewSet(viewsets.ReadOnlyModelViewSet):
+    queryset = RequestProfile.objects.defer('stats', 'summary')
+    serializer_class = RequestProfileSerializer
+    # Session authentication too, for the download links in the admin.
+    authentication_classes = [JWTAuthentication, SessionAuthentication]
+    permission_classes = [IsAdminUser]
+
+    def get_queryset(self):
+        queryset = self.queryset
+        if self.action != 'list':
+            queryset = RequestProfile.objects.all()
+        view = self.request.query_params.get('view')
+        return queryset.filter(view=view) if view else queryset
+
+    def get_serializer_class(self):
+        if self.action == 'retrieve':
+            return RequestProfileDetailSerializer
+        return self.serializer_class
+
+    @action(detail=True, methods=['get'])
+    def download(self, request, pk=None):
+        """The raw pstats data, for ``python -m pstats`` or snakeviz."""
+        profile = self.get_object()
+        response = HttpResponse(bytes(profile.stats), content_type='application/octet-stream')
+        response['Content-Disposition'] = f'attachment; filename="profile-{profile.id}.prof"'
+        return response
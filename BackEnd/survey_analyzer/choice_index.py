@@ -0,0 +1,238 @@
+"""
+Bitmap indexes over a survey's choice answers, for drill-down counts.
+
+A survey's index numbers its responses 0..n-1 in id order (their ordinals) and
+keeps one bitset per choice of its choice questions: bit i is set when
+response i picked that choice. Filters are then ANDs and ORs of bitsets and
+counts are popcounts, with no joins over Answer, Answer.selected_choices and
+SurveyResponse per request. Choices of both answer storages (Answer rows and
+packed documents, see jigyasa.answer_storage) are indexed.
+
+Each worker keeps the indexes of its ``CHOICE_INDEX['SURVEYS_PER_WORKER']``
+most recently used surveys in memory. The API only adds and deletes responses
+(SurveyResponseViewSet has no update routes), so an index is kept up to date
+on read:
+- Responses submitted since the last read, on any worker, are appended with
+  one query for their ids and documents and one for their Answer rows.
+- The index is rebuilt when the survey's revision moves (a question or
+  choice changed) or when responses were deleted.
+"""
+import threading
+from collections import OrderedDict
+
+import numpy as np
+from django.conf import settings
+from django.db.models import Count, Max
+
+from jigyasa.answer_storage import AnswerReader
+from jigyasa.models import Answer, Choice, SurveyResponse
+
+from .filters import FilterError
+from .survey_data import CHOICE_QUESTION_TYPES
+
+DEFAULT_CHOICE_INDEX = {
+    # Survey indexes each worker keeps; one takes about choices x responses / 8 bytes.
+    'SURVEYS_PER_WORKER': 8,
+}
+
+# Set bits per byte value.
+POPCOUNT = np.array([bin(value).count('1') for value in range(256)], dtype=np.uint8)
+
+
+def index_settings():
+    config = dict(DEFAULT_CHOICE_INDEX)
+    config.update(getattr(settings, 'CHOICE_INDEX', {}))
+    return config
+
+
+def popcount(bits):
+    """Set bits of a byte array, or of each row of a 2-d one."""
+    return POPCOUNT[bits].sum(axis=-1, dtype=np.int64)
+
+
+class ChoiceIndex:
+    """The bitsets of one survey at one revision; not thread-safe on its own."""
+
+    def __init__(self, survey_id, revision):
+        self.survey_id = survey_id
+        self.revision = revision
+        self.questions = []
+        self.choice_rows = {}
+        self.question_choices = {}
+        for question_id, question_text, question_type, choice_id, choice_text in (
+            Choice.objects.filter(question__survey_id=survey_id, question__question_type__in=CHOICE_QUESTION_TYPES)
+            .order_by('question_id', 'id')
+            .values_list('question_id', 'question__text', 'question__question_type', 'id', 'text')
+        ):
+            if question_id not in self.question_choices:
+                self.questions.append({"id": question_id, "text": question_text, "question_type": question_type})
+                self.question_choices[question_id] = []
+            self.question_choices[question_id].append((choice_id, choice_text))
+            self.choice_rows[choice_id] = len(self.choice_rows)
+
+        self.response_ids = np.empty(0, dtype=np.int64)
+        self.bits = np.zeros((len(self.choice_rows), 0), dtype=np.uint8)
+        self.reader = AnswerReader()
+        self.append_after(0)
+
+    @property
+    def size(self):
+        return len(self.response_ids)
+
+    @property
+    def last_id(self):
+        return int(self.response_ids[-1]) if self.size else 0
+
+    def append_after(self, last_id, until=None):
+        """Index the survey's responses with ids above ``last_id`` (and up to ``until``); returns how many."""
+        responses = SurveyResponse.objects.filter(survey_id=self.survey_id, id__gt=last_id)
+        if until is not None:
+            responses = responses.filter(id__lte=until)
+        responses = list(responses.order_by('id').values_list('id', 'packed_answers'))
+        if not responses:
+            return 0
+        # Bounded by the responses just read: ones submitted in between are
+        # left for the next append.
+        selected = Answer.selected_choices.through.objects.filter(
+            answer__response__survey_id=self.survey_id,
+            answer__response_id__gt=last_id, answer__response_id__lte=responses[-1][0],
+        )
+        selections = np.array(selected.values_list('answer__response_id', 'choice_id'), dtype=np.int64).reshape(-1, 2)
+        packed = [
+            (response_id, choice_id)
+            for response_id, document in responses if document is not None
+            for _, _, choice_ids in self.reader.rows(self.survey_id, self.revision, document)
+            for choice_id in choice_ids
+        ]
+        if packed:
+            selections = np.concatenate([selections, np.array(packed, dtype=np.int64)])
+
+        start = self.size
+        new_ids = np.fromiter((response_id for response_id, _ in responses), dtype=np.int64, count=len(responses))
+        self.response_ids = np.concatenate([self.response_ids, new_ids])
+        self._grow(self.size)
+        # Answers of responses not read above (committed late, under an id
+        # already read) would otherwise land on a neighbour's ordinal.
+        selections = selections[np.isin(selections[:, 0], new_ids)]
+        if not len(selections) or not self.choice_rows:
+            return len(responses)
+
+        # Rows are numbered in choice_rows order. Choices of other question
+        # types (or deleted since) are not indexed.
+        choice_ids = np.fromiter(self.choice_rows, dtype=np.int64, count=len(self.choice_rows))
+        order = np.argsort(choice_ids)
+        position = np.minimum(np.searchsorted(choice_ids[order], selections[:, 1]), len(order) - 1)
+        known = choice_ids[order][position] == selections[:, 1]
+        rows = order[position[known]]
+        ordinals = start + np.searchsorted(new_ids, selections[known, 0])
+        np.bitwise_or.at(self.bits, (rows, ordinals >> 3), (1 << (ordinals & 7)).astype(np.uint8))
+        return len(responses)
+
+    def _grow(self, size):
+        """Make room for ``size`` bits per choice, doubling so appends stay amortised O(1)."""
+        needed = (size + 7) >> 3
+        if needed <= self.bits.shape[1]:
+            return
+        bits = np.zeros((self.bits.shape[0], max(needed, 2 * self.bits.shape[1])), dtype=np.uint8)
+        bits[:, :self.bits.shape[1]] = self.bits
+        self.bits = bits
+
+    def everyone(self):
+        """The bitset of all indexed responses."""
+        mask = np.zeros(self.bits.shape[1], dtype=np.uint8)
+        full, rest = divmod(self.size, 8)
+        mask[:full] = 0xFF
+        if rest:
+            mask[full] = (1 << rest) - 1
+        return mask
+
+    def match(self, groups):
+        """
+        The bitset of responses matching every group of choice ids, where a
+        group matches responses that picked any of its choices.
+        """
+        mask = self.everyone()
+        for group in groups:
+            unknown = [choice_id for choice_id in group if choice_id not in self.choice_rows]
+            if unknown:
+                raise FilterError(f"Unknown choice: {', '.join(map(str, unknown))}")
+            mask &= np.bitwise_or.reduce(self.bits[[self.choice_rows[choice_id] for choice_id in group]], axis=0)
+        return mask
+
+    def tally(self, mask, question_ids=None):
+        """Per question: how many ``mask`` responses answered it, and picked each of its choices."""
+        questions = self.questions
+        if question_ids is not None:
+            wanted = set(question_ids)
+            missing = wanted - set(self.question_choices)
+            if missing:
+                raise FilterError(f"Not a choice question of this survey: {', '.join(map(str, sorted(missing)))}")
+            questions = [question for question in questions if question["id"] in wanted]
+
+        result = []
+        for question in questions:
+            choices = self.question_choices[question["id"]]
+            rows = self.bits[[self.choice_rows[choice_id] for choice_id, _ in choices]] & mask
+            counts = popcount(rows)
+            result.append({
+                **question,
+                "answered": int(popcount(np.bitwise_or.reduce(rows, axis=0))),
+                "choices": [
+                    {"id": choice_id, "text": text, "count": int(count)}
+                    for (choice_id, text), count in zip(choices, counts)
+                ],
+            })
+        return result
+
+
+_indexes = OrderedDict()
+_indexes_lock = threading.Lock()
+# One per survey ever queried, kept after eviction: a thread may still be waiting on it.
+_survey_locks = {}
+
+
+def _survey_lock(survey_id):
+    with _indexes_lock:
+        return _survey_locks.setdefault(survey_id, threading.Lock())
+
+
+def drilldown(survey, groups, question_ids=None):
+    """
+    ``(responses, matched, questions)``: the survey's response count, how many
+    of them match ``groups`` (see ChoiceIndex.match), and the tally of
+    ``question_ids`` (default: every choice question) over the matches.
+    """
+    with _survey_lock(survey.id):
+        index = current_index(survey)
+        mask = index.match(groups)
+        return index.size, int(popcount(mask)), index.tally(mask, question_ids)
+
+
+def current_index(survey):
+    """The survey's index brought up to date; call with the survey's lock held."""
+    with _indexes_lock:
+        index = _indexes.get(survey.id)
+    if index is not None and index.revision == survey.revision:
+        state = SurveyResponse.objects.filter(survey_id=survey.id).aggregate(count=Count('id'), last=Max('id'))
+        if (state['last'] or 0) > index.last_id:
+            index.append_after(index.last_id, until=state['last'])
+        if index.size != state['count']:
+            # Responses were deleted (or came in below an indexed id); start over.
+            index = None
+    else:
+        index = None
+    if index is None:
+        index = ChoiceIndex(survey.id, survey.revision)
+
+    with _indexes_lock:
+        _indexes[survey.id] = index
+        _indexes.move_to_end(survey.id)
+        while len(_indexes) > index_settings()['SURVEYS_PER_WORKER']:
+            _indexes.popitem(last=False)
+    return index
+
+
+def clear_indexes():
+    """Drop this worker's indexes; tests call it since rolled back responses leave their ids free for reuse."""
+    with _indexes_lock:
+        _indexes.clear()
@@ -0,0 +1,154 @@
+import datetime
+import logging
+import math
+import re
+
+import numpy as np
+import pandas as pd
+
+from monitoring.timing import phase
+
+logger = logging.getLogger(__name__)
+
+# Number of most frequent values kept per column. Columns with at most this many
+# distinct values are fully described by their profile.
+TOP_VALUES = 20
+
+# Text columns are tried as dates only when a sample of their values looks like
+# dates, and kept as dates only when nearly all of their values parse.
+DATE_LIKE = re.compile(r'^\s*(\d{4}[-/.]\d{1,2}[-/.]\d{1,2}|\d{1,2}[-/.]\d{1,2}[-/.]\d{2,4})')
+DATETIME_SAMPLE = 200
+DATETIME_MIN_PARSED = 0.95
+
+
+def _json_value(value):
+    """Convert a pandas/NumPy scalar into something JSONField can store."""
+    if value is None or value is pd.NaT:
+        return None
+    if isinstance(value, (pd.Timestamp, np.datetime64, datetime.datetime)):
+        return pd.Timestamp(value).isoformat()
+    if isinstance(value, np.generic):
+        value = value.item()
+    if isinstance(value, float) and not math.isfinite(value):
+        return None
+    return value
+
+
+def to_datetime(series):
+    """Parse ``series`` as naive UTC datetimes; unparseable values become NaT."""
+    return pd.to_datetime(series, errors='coerce', utc=True).dt.tz_localize(None)
+
+
+def parse_datetime_column(series):
+    """The column as datetime64 if its text values are dates, otherwise None."""
+    if series.dtype != object:
+        return None
+    sample = series.dropna().head(DATETIME_SAMPLE)
+    if sample.empty or not all(isinstance(value, str) and DATE_LIKE.match(value) for value in sample):
+        return None
+    try:
+        parsed = to_datetime(series)
+    except (ValueError, TypeError, OverflowError):
+        return None
+    present = series.notna().sum()
+    if parsed.notna().sum() < DATETIME_MIN_PARSED * present:
+        return None
+    return parsed
+
+
+def parse_datetimes(df, columns=None):
+    """
+    Convert date columns of ``df`` to datetime64 in place and return their names.
+    ``columns`` lists columns already known to be dates (from a stored profile);
+    otherwise every text column is checked.
+    """
+    if columns is not None:
+        converted = [name for name in columns if name in df.columns]
+        for name in converted:
+            df[name] = to_datetime(df[name])
+        return converted
+
+    converted = []
+    for name in df.columns:
+        parsed = parse_datetime_column(df[name])
+        if parsed is not None:
+            df[name] = parsed
+            converted.append(name)
+    return converted
+
+
+def read_csv_file(path, usecols=None, datetime_columns=None):
+    """Read an uploaded CSV, detecting date columns unless they are already known."""
+    with phase('read_csv'):
+        df = pd.read_csv(path, usecols=usecols)
+        parse_datetimes(df, datetime_columns)
+    return df
+
+
+def column_kind(series):
+    if pd.api.types.is_bool_dtype(series):
+        return 'boolean'
+    if pd.api.types.is_numeric_dtype(series):
+        return 'numeric'
+    if pd.api.types.is_datetime64_any_dtype(series):
+        return 'datetime'
+    return 'categorical'
+
+
+def profile_column(name, series):
+    kind = column_kind(series)
+    counts = series.value_counts(dropna=True)
+    entry = {
+        "name": name,
+        "dtype": str(series.dtype),
+        "kind": kind,
+        "null_count": int(series.isna().sum()),
+        "cardinality": int(len(counts)),
+        "min": None,
+        "max": None,
+        "top_values": [
+            {"value": _json_value(value), "count": int(count)}
+            for value, count in counts.head(TOP_VALUES).items()
+        ],
+    }
+    if kind in ('numeric', 'datetime') and len(counts):
+        entry["min"] = _json_value(series.min())
+        entry["max"] = _json_value(series.max())
+    return entry
+
+
+def build_profile(df):
+    """Per-column dtype, null count, min/max, cardinality and most frequent values."""
+    return {
+        "row_count": int(len(df)),
+        "columns": [profile_column(str(name), df[name]) for name in df.columns],
+    }
+
+
+def get_profile(csv_upload):
+    """Return the stored profile, computing it once for uploads that predate profiles."""
+    if not csv_upload.profile:
+        if csv_upload.blob_id is not None and csv_upload.blob.profile:
+            csv_upload.profile = csv_upload.blob.profile
+        else:
+            logger.info(f"Backfilling column profile for upload {csv_upload.id}")
+            csv_upload.profile = build_profile(read_csv_file(csv_upload.file.path))
+        csv_upload.save(update_fields=['profile'])
+    return csv_upload.profile
+
+
+def column_names(profile):
+    return [column["name"] for column in profile["columns"]]
+
+
+def column_entries(profile):
+    return {column["name"]: column for column in profile["columns"]}
+
+
+def datetime_columns(profile):
+    return [column["name"] for column in profile["columns"] if column["kind"] == 'datetime']
+
+
+def is_fully_counted(entry):
+    """True when the top-values sample holds every distinct value of the column."""
+    return entry["cardinality"] <= len(entry["top_values"])
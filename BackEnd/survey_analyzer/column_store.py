@@ -0,0 +1,360 @@
+"""
+Cross-process column store for parsed uploads.
+
+Each stored dataset (one per CSVBlob, keyed by its SHA-256) is a directory of
+``.npy`` files, one per column, plus a ``manifest.json``. Workers open columns
+with ``np.load(mmap_mode='r')``, so every gunicorn worker reading the same
+dataset maps the same physical pages from the OS page cache instead of keeping
+its own parsed copy.
+
+Text columns are stored as int32 codes into a JSON list of distinct values;
+only the codes are mapped, and values are materialised per request.
+
+The manifest also records per-chunk statistics (null counts, min/max for
+numeric and date columns, a bitmask of present codes for low-cardinality text
+columns) so row filters can skip chunks without reading them.
+
+Segment lifetime is reference-counted by the kernel: eviction renames a
+dataset's directory out of the way and unlinks its files, and workers that
+still have columns mapped keep reading valid pages until they drop their
+handles. Columns are mapped on first use, though, so a handle can outlive
+files it never mapped; reading one of those raises DatasetEvicted, and
+datasets.load_frame opens (rebuilding) the dataset again. The least recently
+opened datasets are evicted whenever the store grows past
+``COLUMN_STORE['MAX_BYTES']``.
+"""
+import json
+import logging
+import os
+import shutil
+import threading
+import uuid
+from collections import OrderedDict
+
+import numpy as np
+import pandas as pd
+from django.conf import settings
+
+from .filters import date_literal
+
+logger = logging.getLogger(__name__)
+
+MANIFEST = 'manifest.json'
+MANIFEST_VERSION = 1
+
+# Rows per statistics chunk, and the most categories a text column can have
+# while still recording which of them each chunk contains.
+CHUNK_ROWS = 65536
+MAX_PRESENT_CATEGORIES = 64
+
+DEFAULT_COLUMN_STORE = {
+    'DIR': os.path.join(settings.BASE_DIR, 'column_store'),
+    # Global cap on the store's size, i.e. on the pages workers can share.
+    'MAX_BYTES': 4 * 1024 ** 3,
+    # Datasets each worker keeps mapped.
+    'HANDLES_PER_WORKER': 16,
+}
+
+
+class DatasetEvicted(Exception):
+    """A column file of an open dataset was removed by eviction before it was mapped."""
+
+
+def store_settings():
+    config = dict(DEFAULT_COLUMN_STORE)
+    config.update(getattr(settings, 'COLUMN_STORE', {}))
+    return config
+
+
+def dataset_dir(key):
+    return os.path.join(store_settings()['DIR'], key)
+
+
+def _encode_column(series):
+    """Return (array, categories) for one column; categories is None unless coded."""
+    values = series.to_numpy()
+    if values.dtype.kind in 'biufM':
+        return values, None
+    codes, uniques = pd.factorize(series, use_na_sentinel=True)
+    categories = [value.item() if isinstance(value, np.generic) else value for value in uniques]
+    return codes.astype(np.int32), categories
+
+
+def _chunk_stats(array, categories, chunk_rows=CHUNK_ROWS):
+    """Per-chunk null counts plus min/max (values) or present-code bitmasks (codes)."""
+    if categories is not None:
+        stats = {"nulls": []}
+        if len(categories) <= MAX_PRESENT_CATEGORIES:
+            stats["present"] = []
+    elif array.dtype.kind in 'biufM':
+        stats = {"nulls": [], "min": [], "max": []}
+    else:
+        return None
+
+    for start in range(0, len(array), chunk_rows):
+        chunk = array[start:start + chunk_rows]
+        if categories is not None:
+            valid = chunk[chunk >= 0]
+            stats["nulls"].append(int(len(chunk) - len(valid)))
+            if "present" in stats:
+                bits = 0
+                for code in np.unique(valid).tolist():
+                    bits |= 1 << code
+                stats["present"].append(bits)
+            continue
+
+        if chunk.dtype.kind == 'M':
+            missing = np.isnat(chunk)
+            chunk = chunk.astype('datetime64[ns]').view('int64')
+        elif chunk.dtype.kind == 'f':
+            missing = np.isnan(chunk)
+        else:
+            missing = None
+        valid = chunk if missing is None else chunk[~missing]
+        stats["nulls"].append(int(len(chunk) - len(valid)))
+        stats["min"].append(valid.min().item() if len(valid) else None)
+        stats["max"].append(valid.max().item() if len(valid) else None)
+    return stats
+
+
+def build(key, df):
+    """
+    Write ``df`` as dataset ``key``. Concurrent builders race on an atomic
+    rename; the loser discards its copy.
+    """
+    config = store_settings()
+    final = dataset_dir(key)
+    if os.path.exists(os.path.join(final, MANIFEST)):
+        return
+
+    tmp = os.path.join(config['DIR'], f".{key}.{uuid.uuid4().hex}")
+    os.makedirs(tmp)
+    try:
+        columns = []
+        for i, name in enumerate(df.columns):
+            array, categories = _encode_column(df[name])
+            entry = {"name": str(name), "file": f"{i}.npy", "dtype": str(array.dtype)}
+            np.save(os.path.join(tmp, entry["file"]), np.ascontiguousarray(array), allow_pickle=False)
+            if categories is not None:
+                entry["categories"] = f"{i}.categories.json"
+                with open(os.path.join(tmp, entry["categories"]), 'w') as fh:
+                    json.dump(categories, fh, default=str)
+            stats = _chunk_stats(array, categories)
+            if stats is not None:
+                entry["stats"] = stats
+            columns.append(entry)
+
+        manifest = {
+            "version": MANIFEST_VERSION,
+            "rows": int(len(df)),
+            "chunk_rows": CHUNK_ROWS,
+            "columns": columns,
+        }
+        with open(os.path.join(tmp, MANIFEST), 'w') as fh:
+            json.dump(manifest, fh)
+
+        try:
+            os.rename(tmp, final)
+        except OSError:
+            # Someone else finished first.
+            shutil.rmtree(tmp, ignore_errors=True)
+            return
+    except Exception:
+        shutil.rmtree(tmp, ignore_errors=True)
+        raise
+
+    logger.info(f"Stored dataset {key}: {len(df)} rows, {len(df.columns)} columns")
+    evict(keep=key)
+
+
+def exists(key):
+    return os.path.exists(os.path.join(dataset_dir(key), MANIFEST))
+
+
+class Dataset:
+    """A worker's handle on a stored dataset. Columns are mapped lazily."""
+
+    def __init__(self, key, path, manifest):
+        self.key = key
+        self.path = path
+        self.manifest = manifest
+        self.rows = manifest["rows"]
+        # Datasets stored before chunk statistics existed are a single chunk with none.
+        self.chunk_rows = manifest.get("chunk_rows") or max(self.rows, 1)
+        self.chunk_count = max(-(-self.rows // self.chunk_rows), 1)
+        self._entries = {entry["name"]: entry for entry in manifest["columns"]}
+        self._arrays = {}
+        self._categories = {}
+        self._lookups = {}
+        self._lock = threading.Lock()
+
+    @property
+    def columns(self):
+        return [entry["name"] for entry in self.manifest["columns"]]
+
+    def is_valid(self):
+        return os.path.exists(os.path.join(self.path, MANIFEST))
+
+    def raw(self, name):
+        """The mapped array for a column: values, or codes for text columns."""
+        with self._lock:
+            if name not in self._arrays:
+                entry = self._entries[name]
+                try:
+                    self._arrays[name] = np.load(os.path.join(self.path, entry["file"]), mmap_mode='r')
+                except FileNotFoundError:
+                    raise DatasetEvicted(self.key)
+            return self._arrays[name]
+
+    def categories(self, name):
+        entry = self._entries[name]
+        if "categories" not in entry:
+            return None
+        with self._lock:
+            if name not in self._categories:
+                try:
+                    with open(os.path.join(self.path, entry["categories"])) as fh:
+                        self._categories[name] = np.array(json.load(fh) + [np.nan], dtype=object)
+                except FileNotFoundError:
+                    raise DatasetEvicted(self.key)
+            return self._categories[name]
+
+    def category_lookup(self, name):
+        """Map of value to code for a text column, or None for other columns."""
+        categories = self.categories(name)
+        if categories is None:
+            return None
+        with self._lock:
+            if name not in self._lookups:
+                self._lookups[name] = {value: code for code, value in enumerate(categories[:-1].tolist())}
+            return self._lookups[name]
+
+    def chunk_bounds(self, chunk):
+        start = chunk * self.chunk_rows
+        return start, min(start + self.chunk_rows, self.rows)
+
+    def chunk_stats(self, name):
+        """Statistics for ``name`` in the shape filters.chunk_candidates expects, or None."""
+        entry = self._entries.get(name)
+        if entry is None or "stats" not in entry:
+            return None
+        stats = dict(entry["stats"])
+        stats["rows"] = [stop - start for start, stop in map(self.chunk_bounds, range(self.chunk_count))]
+        if "present" in stats:
+            stats["lookup"] = self.category_lookup(name)
+        elif entry["dtype"].startswith('datetime64'):
+            # The same literal rules as evaluation (filters.date_literal), in nanoseconds.
+            stats["convert"] = lambda value: int(date_literal(value).astype(np.int64))
+        else:
+            stats["convert"] = float
+        return stats
+
+    def column(self, name, rows=None):
+        """Column values (optionally only ``rows``, a slice or index array)."""
+        array = self.raw(name)
+        if rows is not None:
+            array = array[rows]
+        categories = self.categories(name)
+        if categories is None:
+            return array
+        # Code -1 (missing) picks the trailing NaN.
+        return categories.take(array)
+
+    def frame(self, columns=None, rows=None):
+        columns = self.columns if columns is None else list(dict.fromkeys(columns))
+        return pd.DataFrame({name: self.column(name, rows) for name in columns}, copy=False)
+
+    def nbytes(self):
+        return dataset_size(self.path)
+
+
+_handles = OrderedDict()
+_handles_lock = threading.Lock()
+
+
+def open_dataset(key):
+    """Return a mapped Dataset for ``key``, or None if it is not stored."""
+    with _handles_lock:
+        dataset = _handles.get(key)
+        if dataset is not None and dataset.is_valid():
+            _handles.move_to_end(key)
+            _touch(dataset.path)
+            return dataset
+        _handles.pop(key, None)
+
+    path = dataset_dir(key)
+    try:
+        with open(os.path.join(path, MANIFEST)) as fh:
+            manifest = json.load(fh)
+    except FileNotFoundError:
+        return None
+
+    dataset = Dataset(key, path, manifest)
+    _touch(path)
+    with _handles_lock:
+        _handles[key] = dataset
+        while len(_handles) > store_settings()['HANDLES_PER_WORKER']:
+            _handles.popitem(last=False)
+    return dataset
+
+
+def _touch(path):
+    # The manifest's mtime records the last open across all workers, for LRU eviction.
+    try:
+        os.utime(os.path.join(path, MANIFEST))
+    except FileNotFoundError:
+        pass
+
+
+def dataset_size(path):
+    total = 0
+    for entry in os.scandir(path):
+        if entry.is_file():
+            total += entry.stat().st_size
+    return total
+
+
+def remove(key):
+    """Delete a dataset; False if it was not stored."""
+    root = store_settings()['DIR']
+    # Renamed first, so the dataset disappears at once rather than file by
+    # file; unlinking is safe while other workers have the files mapped.
+    doomed = os.path.join(root, f".evicted.{key}.{uuid.uuid4().hex}")
+    try:
+        os.rename(os.path.join(root, key), doomed)
+    except OSError:
+        return False
+    shutil.rmtree(doomed, ignore_errors=True)
+    return True
+
+
+def evict(keep=None):
+    """Remove least recently opened datasets until the store fits in MAX_BYTES."""
+    config = store_settings()
+    root = config['DIR']
+    if not os.path.isdir(root):
+        return []
+
+    datasets = []
+    for entry in os.scandir(root):
+        manifest = os.path.join(entry.path, MANIFEST)
+        if entry.name.startswith('.') or not os.path.exists(manifest):
+            continue
+        try:
+            datasets.append((os.stat(manifest).st_mtime, entry.name, dataset_size(entry.path)))
+        except FileNotFoundError:
+            continue
+
+    total = sum(size for _, _, size in datasets)
+    evicted = []
+    for _, key, size in sorted(datasets):
+        if total <= config['MAX_BYTES']:
+            break
+        if key == keep:
+            continue
+        if not remove(key):
+            continue
+        total -= size
+        evicted.append(key)
+        logger.info(f"Evicted dataset {key} ({size} bytes)")
+    return evicted
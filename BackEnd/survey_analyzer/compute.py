@@ -0,0 +1,256 @@
+"""
+Process pool with admission control for CPU-heavy analysis requests.
+
+Plot data, group-by counts, correlations, association tests and PDF
+publishing run pandas, NumPy, SciPy and ReportLab (or kaleido) for seconds at
+a time. Done on the request thread, a handful of
+them occupy every server worker and cheap survey endpoints queue behind them.
+Instead, such work goes through ``run()``:
+
+* Admission. A request first takes one of ``PER_USER`` slots for its user
+  (none free: 429), then one of ``SLOTS`` compute slots for the host. Without a
+  free compute slot it waits in one of ``QUEUE`` queue slots for up to
+  ``QUEUE_TIMEOUT`` seconds; with the queue full it gets 503, and after
+  waiting that long 504. All three carry ``Retry-After``.
+* Execution. Admitted work runs in this server process' pool of ``WORKERS``
+  spawned processes (0 runs it on the request thread). Workers are separate
+  interpreters, so the server's threads and event loop stay responsive, and
+  they read uploads from the shared column store like any other worker.
+* Timeouts. A computation still running after ``TIMEOUT`` seconds answers the
+  request with 504. The work itself cannot be interrupted; it keeps its slots
+  until it finishes, so a stuck computation lowers capacity instead of letting
+  more work in.
+
+Slots are ``flock``-ed files under ``DIR``, so the limits hold across all
+server processes on the host, and the kernel releases a slot when the process
+holding it dies. A slot file only exists while it is held: its holder deletes
+it before unlocking, so ``DIR`` does not collect a set of files for every user
+who ever ran an analysis.
+"""
+import fcntl
+import logging
+import multiprocessing
+import os
+import random
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor, TimeoutError as FutureTimeout
+from concurrent.futures.process import BrokenProcessPool
+
+from django.conf import settings
+
+from monitoring import timing
+from monitoring.metrics import REGISTRY
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_ANALYSIS_COMPUTE = {
+    'DIR': os.path.join(settings.BASE_DIR, 'compute_slots'),
+    # Pool processes per server process; 0 computes on the request thread.
+    'WORKERS': 2,
+    # Computations running at once on the host.
+    'SLOTS': 4,
+    # Requests waiting for a compute slot before new ones are refused (503).
+    'QUEUE': 8,
+    # Requests one user may have running or waiting before the next gets 429.
+    'PER_USER': 2,
+    # Seconds a request waits for a compute slot.
+    'QUEUE_TIMEOUT': 10,
+    # Seconds a computation may take before its request gets 504.
+    'TIMEOUT': 120,
+    # Retry-After (seconds) sent with 429 and 503.
+    'RETRY_AFTER': 5,
+    # Pool processes are replaced after this many tasks, returning pandas' memory.
+    'MAX_TASKS_PER_WORKER': 200,
+}
+
+# How often a queued request looks for a free compute slot.
+POLL_INTERVAL = 0.05
+
+REJECTED = REGISTRY.counter(
+    'jigyasa_analysis_rejected',
+    'Analysis requests refused by admission control or abandoned after TIMEOUT.',
+    ['reason'],
+)
+
+
+def compute_settings():
+    config = dict(DEFAULT_ANALYSIS_COMPUTE)
+    config.update(getattr(settings, 'ANALYSIS_COMPUTE', {}))
+    return config
+
+
+class Overloaded(Exception):
+    """Work refused by admission control (429, 503 or 504) or abandoned after its timeout (504)."""
+
+    def __init__(self, message, status_code, retry_after=None):
+        super().__init__(message)
+        self.status_code = status_code
+        self.retry_after = retry_after
+
+
+def _try_lock(path):
+    while True:
+        handle = open(path, 'a+b')
+        try:
+            fcntl.flock(handle, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            handle.close()
+            return None
+        try:
+            if os.stat(path).st_ino == os.fstat(handle.fileno()).st_ino:
+                return handle
+        except FileNotFoundError:
+            pass
+        # Locked a file its holder deleted on release (see _release) after
+        # this process opened it; the slot is free, under a new file.
+        handle.close()
+
+
+def _take_slot(directory, prefix, count):
+    """A locked handle on one of ``count`` slot files, or None if all are held."""
+    # Start at a random slot so concurrent requests don't all contend for slot 0.
+    first = random.randrange(count) if count else 0
+    for i in range(count):
+        handle = _try_lock(os.path.join(directory, f"{prefix}-{(first + i) % count}"))
+        if handle is not None:
+            return handle
+    return None
+
+
+def _release(handles):
+    for handle in handles:
+        # Deleted while still locked, so nobody can take the slot through this
+        # file any more; _try_lock retries on a fresh one.
+        try:
+            os.unlink(handle.name)
+        except FileNotFoundError:
+            pass
+        handle.close()
+
+
+def admit(user_id, config):
+    """
+    The slot handles admitting one computation for ``user_id``; closing them
+    releases the slots. Raises Overloaded when the work has to be refused.
+    """
+    directory = config['DIR']
+    os.makedirs(directory, exist_ok=True)
+    retry_after = config['RETRY_AFTER']
+
+    user_slot = _take_slot(directory, f"user-{user_id}", config['PER_USER'])
+    if user_slot is None:
+        REJECTED.inc(reason='per_user')
+        raise Overloaded("Too many analyses running for this user.", 429, retry_after)
+    try:
+        return [user_slot, _take_run_slot(directory, config)]
+    except BaseException:
+        _release([user_slot])
+        raise
+
+
+def _take_run_slot(directory, config):
+    run_slot = _take_slot(directory, 'run', config['SLOTS'])
+    if run_slot is not None:
+        return run_slot
+
+    queue_slot = _take_slot(directory, 'queue', config['QUEUE'])
+    if queue_slot is None:
+        REJECTED.inc(reason='queue_full')
+        raise Overloaded("The server is busy with other analyses.", 503, config['RETRY_AFTER'])
+    try:
+        deadline = time.monotonic() + config['QUEUE_TIMEOUT']
+        while run_slot is None:
+            if time.monotonic() >= deadline:
+                REJECTED.inc(reason='queue_timeout')
+                raise Overloaded("Timed out waiting for other analyses to finish.", 504, config['RETRY_AFTER'])
+            time.sleep(POLL_INTERVAL)
+            run_slot = _take_slot(directory, 'run', config['SLOTS'])
+    finally:
+        _release([queue_slot])
+    return run_slot
+
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def _init_worker():
+    # Spawned workers start a fresh interpreter: set Django up once per process.
+    import django
+    django.setup()
+
+
+def get_pool(config):
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            # Spawned rather than forked: the server may have threads and open
+            # database connections that must not be shared with the children.
+            _pool = ProcessPoolExecutor(
+                max_workers=config['WORKERS'],
+                mp_context=multiprocessing.get_context('spawn'),
+                initializer=_init_worker,
+                max_tasks_per_child=config['MAX_TASKS_PER_WORKER'],
+            )
+            logger.info(f"Started analysis pool with {config['WORKERS']} workers")
+        return _pool
+
+
+def _discard_pool(pool):
+    global _pool
+    with _pool_lock:
+        if _pool is pool:
+            _pool = None
+    pool.shutdown(wait=False, cancel_futures=True)
+
+
+def _execute(func, args):
+    """Runs in a pool worker: the result and the phases it recorded."""
+    token = timing.start_request()
+    try:
+        result = func(*args)
+    finally:
+        phases = timing.finish_request(token)
+    return result, phases
+
+
+def run(user_id, func, *args):
+    """
+    ``func(*args)`` under admission control, in the pool unless WORKERS is 0.
+    ``func`` must be a module-level function and its arguments and result
+    picklable. Exceptions raised by ``func`` propagate.
+    """
+    config = compute_settings()
+    with timing.phase('queue'):
+        slots = admit(user_id, config)
+
+    if not config['WORKERS']:
+        try:
+            return func(*args)
+        finally:
+            _release(slots)
+
+    pool = get_pool(config)
+    start = time.perf_counter()
+    try:
+        future = pool.submit(_execute, func, args)
+        result, phases = future.result(timeout=config['TIMEOUT'])
+    except FutureTimeout:
+        # The slots stay taken until the abandoned work really ends.
+        future.add_done_callback(lambda _: _release(slots))
+        REJECTED.inc(reason='timeout')
+        logger.warning(f"{func.__name__} still running after {config['TIMEOUT']}s; abandoning the request")
+        raise Overloaded("The analysis took too long.", 504)
+    except BaseException as e:
+        _release(slots)
+        if isinstance(e, BrokenProcessPool):
+            # A worker died (e.g. killed for memory); start a fresh pool next time.
+            _discard_pool(pool)
+        raise
+    finally:
+        timing.record('pool', time.perf_counter() - start)
+    _release(slots)
+    for name, seconds in phases.items():
+        timing.record(name, seconds)
+    return result
@@ -0,0 +1,93 @@
+"""
+Contingency tables and chi-square tests for every pair of categorical columns.
+
+Columns arrive as integer codes (-1 for missing), encoded once. The tables for
+one column against a batch of others come from a single ``np.bincount`` over
+offset cell indices, so no table is ever built row by row.
+
+Requests run ``associations`` through survey_analyzer.compute, so a test is
+admitted and runs in the shared analysis pool like other heavy work; one test
+uses one pool process.
+
+This module deliberately avoids Django so pool workers start quickly.
+"""
+import math
+
+import numpy as np
+import pandas as pd
+
+# Columns with more distinct values than this (free text, ids) are skipped.
+MAX_CATEGORIES = 50
+# Upper bound on the cell indices concatenated into one bincount.
+BATCH_ENTRIES = 8_000_000
+
+
+def encode(values):
+    """Integer codes (-1 for missing) and the distinct values they index."""
+    codes, uniques = pd.factorize(values, use_na_sentinel=True, sort=True)
+    return codes.astype(np.int32), uniques
+
+
+def tabulate(codes, cards, i, js):
+    """Contingency tables of column ``i`` against each column in ``js``, from one bincount."""
+    ci = codes[i]
+    parts = []
+    offsets = []
+    offset = 0
+    for j in js:
+        cj = codes[j]
+        valid = (ci >= 0) & (cj >= 0)
+        parts.append(offset + ci[valid].astype(np.int64) * cards[j] + cj[valid])
+        offsets.append(offset)
+        offset += cards[i] * cards[j]
+    counts = np.bincount(np.concatenate(parts), minlength=offset)
+    return [
+        counts[start:start + cards[i] * cards[j]].reshape(cards[i], cards[j])
+        for start, j in zip(offsets, js)
+    ]
+
+
+def test_table(table):
+    """Chi-square test of independence and Cramér's V, or None for a degenerate table."""
+    table = table[table.sum(axis=1) > 0][:, table.sum(axis=0) > 0]
+    if min(table.shape) < 2:
+        return None
+    from scipy import stats as scipy_stats
+    chi2, p_value, dof, expected = scipy_stats.chi2_contingency(table, correction=False)
+    n = int(table.sum())
+    return {
+        "chi2": float(chi2),
+        "p_value": float(p_value),
+        "dof": int(dof),
+        "cramers_v": math.sqrt(chi2 / (n * (min(table.shape) - 1))),
+        "n": n,
+        # Cochran's rule: the chi-square approximation is doubtful beyond this.
+        "low_expected": bool((expected < 5).mean() > 0.2),
+    }
+
+
+def test_column(codes, cards, i):
+    """Test column ``i`` against every later column, batching the tabulation."""
+    rows = codes.shape[1]
+    per_batch = max(1, BATCH_ENTRIES // max(rows, 1))
+    later = list(range(i + 1, len(cards)))
+    results = []
+    for start in range(0, len(later), per_batch):
+        js = later[start:start + per_batch]
+        for j, table in zip(js, tabulate(codes, cards, i, js)):
+            result = test_table(table)
+            if result is not None:
+                results.append((i, j, result))
+    return results
+
+
+def associations(codes, cards):
+    """
+    Tested pairs ``(i, j, result)`` for every pair of rows of the k x n code
+    matrix ``codes``, strongest association (Cramér's V) first.
+    """
+    codes = np.ascontiguousarray(codes, dtype=np.int32)
+    cards = [int(card) for card in cards]
+    pairs = [pair for i in range(len(cards) - 1) for pair in test_column(codes, cards, i)]
+    pairs.sort(key=lambda pair: (-pair[2]["cramers_v"], pair[2]["p_value"]))
+    return pairs
@@ -0,0 +1,132 @@
+import logging
+
+import numpy as np
+
+from monitoring.timing import phase
+
+from . import column_store
+from .column_profile import build_profile, datetime_columns, read_csv_file
+from .filters import chunk_candidates, evaluate, filter_columns, frame_mask
+from .plot_engine import group_counts
+
+logger = logging.getLogger(__name__)
+
+
+def ingest_blob(blob):
+    """
+    Parse new content once: store its column profile on the blob and its columns
+    in the shared column store. Every CSVUpload pointing at the blob reuses both.
+    """
+    if blob.profile and column_store.exists(blob.sha256):
+        return blob.profile
+
+    df = read_csv_file(blob.file.path)
+    with phase('column_store'):
+        column_store.build(blob.sha256, df)
+    with phase('profile'):
+        blob.profile = build_profile(df)
+    blob.save(update_fields=['profile'])
+    logger.info(f"Ingested {blob.sha256}: {len(df)} rows, {len(df.columns)} columns")
+    return blob.profile
+
+
+def open_blob_dataset(blob):
+    """The blob's mapped dataset, re-parsing the CSV if it was evicted."""
+    dataset = column_store.open_dataset(blob.sha256)
+    if dataset is None:
+        logger.info(f"Dataset {blob.sha256} not in column store; rebuilding")
+        known = datetime_columns(blob.profile) if blob.profile else None
+        column_store.build(blob.sha256, read_csv_file(blob.file.path, datetime_columns=known))
+        dataset = column_store.open_dataset(blob.sha256)
+    return dataset
+
+
+class DatasetSource:
+    """Filter evaluation source over one row range of a stored dataset."""
+
+    def __init__(self, dataset):
+        self.dataset = dataset
+        self.rows = slice(None)
+
+    def values(self, column):
+        return self.dataset.column(column, self.rows)
+
+    def codes(self, column):
+        lookup = self.dataset.category_lookup(column)
+        if lookup is None:
+            return None
+        return self.dataset.raw(column)[self.rows], lookup
+
+
+def filtered_rows(dataset, row_filter):
+    """
+    Indices of the rows matching ``row_filter``. Chunks whose statistics rule
+    out a match are skipped; the rest are evaluated in runs of adjacent chunks.
+    """
+    if dataset.rows == 0:
+        return np.empty(0, dtype=np.intp)
+
+    candidates = chunk_candidates(row_filter, dataset.chunk_stats, dataset.chunk_count)
+    source = DatasetSource(dataset)
+    selected = []
+    chunks = np.flatnonzero(candidates)
+    # Split the candidate chunks into runs of consecutive chunk numbers.
+    for run in np.split(chunks, np.flatnonzero(np.diff(chunks) != 1) + 1):
+        if not len(run):
+            continue
+        start = dataset.chunk_bounds(run[0])[0]
+        stop = dataset.chunk_bounds(run[-1])[1]
+        source.rows = slice(start, stop)
+        selected.append(np.flatnonzero(evaluate(row_filter, source)) + start)
+
+    logger.info(f"Filter on {dataset.key} scanned {len(chunks)}/{dataset.chunk_count} chunks")
+    return np.concatenate(selected) if selected else np.empty(0, dtype=np.intp)
+
+
+def content_key(csv_upload):
+    """Identifies an upload's data for caching: the blob hash, or the upload itself for legacy uploads."""
+    if csv_upload.blob_id is not None:
+        return csv_upload.blob.sha256
+    return f"upload-{csv_upload.id}-{csv_upload.uploaded_at.timestamp()}"
+
+
+def dataset_frame(blob, columns, row_filter):
+    """The stored columns of ``blob``, restricted like load_frame's."""
+    dataset = open_blob_dataset(blob)
+    rows = filtered_rows(dataset, row_filter) if row_filter is not None else None
+    return dataset.frame(columns, rows)
+
+
+def load_frame(csv_upload, columns=None, row_filter=None):
+    """
+    Read an upload, restricted to ``columns`` and to rows matching
+    ``row_filter`` (a parsed filter expression) when given.
+    """
+    if columns is not None:
+        columns = list(dict.fromkeys(columns))
+
+    if csv_upload.blob_id is not None:
+        with phase('column_store'):
+            try:
+                return dataset_frame(csv_upload.blob, columns, row_filter)
+            except column_store.DatasetEvicted:
+                # Evicted between opening it and mapping a column; the handle is
+                # stale now, so this opens (or rebuilds) the dataset afresh.
+                logger.info(f"Dataset {csv_upload.blob.sha256} was evicted while in use; reopening")
+                return dataset_frame(csv_upload.blob, columns, row_filter)
+
+    dates = datetime_columns(csv_upload.profile) if csv_upload.profile else None
+    if row_filter is None:
+        return read_csv_file(csv_upload.file.path, usecols=columns, datetime_columns=dates)
+
+    usecols = None if columns is None else list(dict.fromkeys(columns + filter_columns(row_filter)))
+    df = read_csv_file(csv_upload.file.path, usecols=usecols, datetime_columns=dates)
+    df = df[frame_mask(row_filter, df)].reset_index(drop=True)
+    return df if columns is None else df[columns]
+
+
+def group_columns(csv_upload, columns, row_filter=None):
+    """Row counts per distinct value of each of ``columns``, over rows matching ``row_filter``."""
+    df = load_frame(csv_upload, columns, row_filter)
+    with phase('compute'):
+        return {column: group_counts(df, column) for column in columns}
@@ -0,0 +1,423 @@
+"""
+Row filter expressions for plot and group-by requests.
+
+Grammar::
+
+    expr       := and_expr ('or' and_expr)*
+    and_expr   := not_expr ('and' not_expr)*
+    not_expr   := 'not' not_expr | '(' expr ')' | predicate
+    predicate  := column op literal
+                | column ['not'] 'in' '(' literal (',' literal)* ')'
+                | column 'is' ['not'] 'null'
+    op         := '=' | '==' | '!=' | '<' | '<=' | '>' | '>='
+    column     := identifier | `any column name`
+    literal    := number | 'string' | "string" | true | false
+
+For example ``year >= 2024 and region = 'West'`` or
+``\`Satisfaction Score\` in (4, 5)``. Date columns compare with quoted dates
+(``created >= '2024'``, ``created < '2024-07-01'``); a bare number is refused
+rather than read as nanoseconds since 1970. Comparisons with missing values
+are unknown, and rows where the whole expression is unknown do not match, so
+``not score > 2`` skips rows without a score just as ``score <= 2`` does.
+Parentheses and ``not`` nest at most MAX_DEPTH deep.
+
+Expressions are parsed into a small AST, never evaluated as Python. They compile
+to NumPy boolean masks, and against stored datasets they are first checked
+against per-chunk statistics so chunks that cannot match are never read.
+"""
+import re
+
+import numpy as np
+import pandas as pd
+
+
+class FilterError(ValueError):
+    """An invalid filter expression."""
+
+
+MAX_LENGTH = 2000
+MAX_DEPTH = 32
+
+
+TOKEN_RE = re.compile(r"""
+    \s*(?:
+        (?P<number>-?\d+(?:\.\d*)?(?:[eE][-+]?\d+)?)
+      | '(?P<squote>(?:[^'\\]|\\.)*)'
+      | "(?P<dquote>(?:[^"\\]|\\.)*)"
+      | `(?P<quoted_name>[^`]+)`
+      | (?P<op><=|>=|!=|==|=|<|>)
+      | (?P<punct>[(),])
+      | (?P<word>[A-Za-z_][A-Za-z0-9_.]*)
+    )""", re.VERBOSE)
+
+KEYWORDS = {'and', 'or', 'not', 'in', 'is', 'null', 'true', 'false'}
+TOKEN_NAMES = {'op': 'a comparison operator', 'literal': 'a value', 'name': 'a column name'}
+COMPARISONS = {'=': 'eq', '==': 'eq', '!=': 'ne', '<': 'lt', '<=': 'le', '>': 'gt', '>=': 'ge'}
+
+
+def tokenize(text):
+    tokens = []
+    position = 0
+    text = text.rstrip()
+    while position < len(text):
+        match = TOKEN_RE.match(text, position)
+        if not match or match.end() == position:
+            raise FilterError(f"Unexpected character at position {position}: {text[position:position + 10]!r}")
+        position = match.end()
+        kind = match.lastgroup
+        value = match.group(kind)
+        if kind == 'number':
+            tokens.append(('literal', float(value) if any(c in value for c in '.eE') else int(value)))
+        elif kind in ('squote', 'dquote'):
+            tokens.append(('literal', re.sub(r'\\(.)', r'\1', value)))
+        elif kind == 'quoted_name':
+            tokens.append(('name', value))
+        elif kind == 'word' and value.lower() in KEYWORDS:
+            word = value.lower()
+            if word in ('true', 'false'):
+                tokens.append(('literal', word == 'true'))
+            else:
+                tokens.append(('keyword', word))
+        elif kind == 'word':
+            tokens.append(('name', value))
+        else:
+            tokens.append((kind, value))
+    return tokens
+
+
+class Parser:
+    def __init__(self, text):
+        self.tokens = tokenize(text)
+        self.position = 0
+        self.depth = 0
+
+    def peek(self):
+        return self.tokens[self.position] if self.position < len(self.tokens) else (None, None)
+
+    def take(self, kind=None, value=None):
+        token = self.peek()
+        if token[0] is None or (kind and token[0] != kind) or (value is not None and token[1] != value):
+            expected = repr(value) if value is not None else TOKEN_NAMES.get(kind, kind)
+            found = token[1] if token[0] is not None else 'end of expression'
+            raise FilterError(f"Expected {expected}, found {found!r}")
+        self.position += 1
+        return token
+
+    def accept(self, kind, value=None):
+        token = self.peek()
+        if token[0] == kind and (value is None or token[1] == value):
+            self.position += 1
+            return True
+        return False
+
+    def parse(self):
+        if not self.tokens:
+            raise FilterError("Filter expression is empty.")
+        node = self.expr()
+        if self.position != len(self.tokens):
+            raise FilterError(f"Unexpected {self.peek()[1]!r} after expression")
+        return node
+
+    def expr(self):
+        parts = [self.and_expr()]
+        while self.accept('keyword', 'or'):
+            parts.append(self.and_expr())
+        return parts[0] if len(parts) == 1 else ('or', parts)
+
+    def and_expr(self):
+        parts = [self.not_expr()]
+        while self.accept('keyword', 'and'):
+            parts.append(self.not_expr())
+        return parts[0] if len(parts) == 1 else ('and', parts)
+
+    def not_expr(self):
+        if self.accept('keyword', 'not'):
+            return ('not', self.nested(self.not_expr))
+        if self.accept('punct', '('):
+            node = self.nested(self.expr)
+            self.take('punct', ')')
+            return node
+        return self.predicate()
+
+    def nested(self, parse):
+        self.depth += 1
+        if self.depth > MAX_DEPTH:
+            raise FilterError(f"Filter expression is nested more than {MAX_DEPTH} levels deep.")
+        node = parse()
+        self.depth -= 1
+        return node
+
+    def predicate(self):
+        column = self.take('name')[1]
+        if self.accept('keyword', 'is'):
+            negate = self.accept('keyword', 'not')
+            self.take('keyword', 'null')
+            return ('notnull' if negate else 'isnull', column)
+        negate = self.accept('keyword', 'not')
+        if self.accept('keyword', 'in'):
+            self.take('punct', '(')
+            values = [self.take('literal')[1]]
+            while self.accept('punct', ','):
+                values.append(self.take('literal')[1])
+            self.take('punct', ')')
+            return ('notin' if negate else 'in', column, values)
+        if negate:
+            raise FilterError("Expected 'in' after 'not'")
+        op = self.take('op')[1]
+        return (COMPARISONS[op], column, self.take('literal')[1])
+
+
+def parse_filter(text):
+    """Parse a filter expression into an AST of tuples."""
+    if len(text) > MAX_LENGTH:
+        raise FilterError("Filter expression is too long.")
+    return Parser(text).parse()
+
+
+def parse_request_filter(text, available):
+    """Parse a request's filter and check its columns; None when there is no filter."""
+    if not text or not text.strip():
+        return None
+    node = parse_filter(text)
+    validate_filter_columns(node, available)
+    return node
+
+
+def filter_columns(node):
+    """Column names referenced by a parsed filter."""
+    kind = node[0]
+    if kind in ('and', 'or'):
+        names = []
+        for part in node[1]:
+            names.extend(filter_columns(part))
+        return list(dict.fromkeys(names))
+    if kind == 'not':
+        return filter_columns(node[1])
+    return [node[1]]
+
+
+def validate_filter_columns(node, available):
+    unknown = [name for name in filter_columns(node) if name not in available]
+    if unknown:
+        raise FilterError(f"Unknown column in filter: {', '.join(unknown)}")
+
+
+# -- evaluation -------------------------------------------------------------
+
+def date_literal(literal):
+    """A literal compared with a date column, as naive datetime64[ns]; only quoted dates are accepted."""
+    if not isinstance(literal, str):
+        raise FilterError(f"Compare a date column with a quoted date such as '2024-01-01', not {literal!r}")
+    try:
+        return np.datetime64(pd.Timestamp(literal).tz_localize(None), 'ns')
+    except (ValueError, TypeError):
+        raise FilterError(f"Cannot compare a date column with {literal!r}")
+
+
+def _coerce(values, literal):
+    """Convert a literal to the column's type so the comparison is vectorised."""
+    kind = values.dtype.kind
+    if kind == 'M':
+        return date_literal(literal)
+    if kind in 'iufb' and isinstance(literal, str):
+        try:
+            return float(literal)
+        except ValueError:
+            raise FilterError(f"Cannot compare a numeric column with {literal!r}")
+    return literal
+
+
+def _missing(values):
+    if values.dtype.kind == 'f':
+        return np.isnan(values)
+    if values.dtype.kind == 'M':
+        return np.isnat(values)
+    if values.dtype.kind == 'O':
+        return pd.isna(values)
+    return np.zeros(len(values), dtype=bool)
+
+
+def _compare(values, op, literal):
+    literal = _coerce(values, literal)
+    present = ~_missing(values)
+    if values.dtype.kind == 'O':
+        # Text columns: compare only the non-missing values, keeping NumPy's
+        # element-wise comparison away from NaN/str mixes.
+        result = np.zeros(len(values), dtype=bool)
+        subset = values[present]
+        try:
+            result[present] = _apply(subset, op, literal)
+        except TypeError:
+            raise FilterError(f"Cannot compare text values with {literal!r} using '{op}'")
+        return result
+    return _apply(values, op, literal) & present
+
+
+def _apply(values, op, literal):
+    if op == 'eq':
+        return values == literal
+    if op == 'ne':
+        return values != literal
+    if op == 'lt':
+        return values < literal
+    if op == 'le':
+        return values <= literal
+    if op == 'gt':
+        return values > literal
+    return values >= literal
+
+
+def evaluate(node, source):
+    """
+    Boolean mask for ``node``. ``source`` provides ``values(column)`` returning
+    a NumPy array, and optionally ``codes(column)`` returning ``(codes,
+    categories)`` for dictionary-encoded text columns, which turns equality and
+    membership tests into integer comparisons.
+    """
+    return _truth(node, source)[0]
+
+
+def _truth(node, source):
+    """
+    ``(true, false)`` masks of ``node``. Rows in neither are unknown: a
+    comparison with a missing value, and whatever ``and``/``or``/``not`` make
+    of it (SQL's three-valued logic).
+    """
+    kind = node[0]
+    if kind == 'and':
+        true, false = _truth(node[1][0], source)
+        for part in node[1][1:]:
+            part_true, part_false = _truth(part, source)
+            true &= part_true
+            false |= part_false
+        return true, false
+    if kind == 'or':
+        true, false = _truth(node[1][0], source)
+        for part in node[1][1:]:
+            part_true, part_false = _truth(part, source)
+            true |= part_true
+            false &= part_false
+        return true, false
+    if kind == 'not':
+        true, false = _truth(node[1], source)
+        return false, true
+
+    column = node[1]
+    if kind in ('isnull', 'notnull'):
+        coded = source.codes(column)
+        missing = coded[0] < 0 if coded is not None else _missing(source.values(column))
+        return (missing, ~missing) if kind == 'isnull' else (~missing, missing)
+
+    coded = source.codes(column)
+    if coded is not None and kind in ('eq', 'ne', 'in', 'notin'):
+        codes, lookup = coded
+        literals = node[2] if kind in ('in', 'notin') else [node[2]]
+        wanted = [lookup[value] for value in literals if value in lookup]
+        mask = np.isin(codes, wanted) if len(wanted) > 1 else codes == (wanted[0] if wanted else -2)
+        other = ~mask & (codes >= 0)
+        return (other, mask) if kind in ('ne', 'notin') else (mask, other)
+
+    values = source.values(column)
+    present = ~_missing(values)
+    if kind in ('in', 'notin'):
+        mask = np.zeros(len(values), dtype=bool)
+        for literal in node[2]:
+            mask |= _compare(values, 'eq', literal)
+        other = ~mask & present
+        return (other, mask) if kind == 'notin' else (mask, other)
+    mask = _compare(values, kind, node[2])
+    return mask, ~mask & present
+
+
+class FrameSource:
+    """Evaluation source over a pandas DataFrame."""
+
+    def __init__(self, df):
+        self.df = df
+
+    def values(self, column):
+        return self.df[column].to_numpy()
+
+    def codes(self, column):
+        return None
+
+
+def frame_mask(node, df):
+    return evaluate(node, FrameSource(df))
+
+
+# -- chunk pruning ----------------------------------------------------------
+
+def chunk_candidates(node, stats, chunk_count):
+    """
+    Which chunks may contain matching rows, judged from per-chunk statistics
+    alone. ``stats(column)`` returns a dict with ``min``/``max``/``nulls`` lists
+    (numeric and date columns), ``present``/``lookup`` (low-cardinality text
+    columns), or None when nothing is known. Unknown means "may match".
+    """
+    everything = np.ones(chunk_count, dtype=bool)
+    kind = node[0]
+    if kind == 'and':
+        mask = everything
+        for part in node[1]:
+            mask = mask & chunk_candidates(part, stats, chunk_count)
+        return mask
+    if kind == 'or':
+        mask = np.zeros(chunk_count, dtype=bool)
+        for part in node[1]:
+            mask = mask | chunk_candidates(part, stats, chunk_count)
+        return mask
+    if kind == 'not':
+        # A chunk where the inner predicate may match can still hold rows where it does not.
+        return everything
+
+    column_stats = stats(node[1])
+    if not column_stats:
+        return everything
+
+    if kind in ('isnull', 'notnull'):
+        if 'nulls' not in column_stats:
+            return everything
+        nulls = np.asarray(column_stats['nulls'])
+        if kind == 'isnull':
+            return nulls > 0
+        return nulls < np.asarray(column_stats['rows'])
+
+    if 'present' in column_stats:
+        if kind not in ('eq', 'in'):
+            return everything
+        lookup = column_stats['lookup']
+        literals = node[2] if kind == 'in' else [node[2]]
+        bits = 0
+        for value in literals:
+            if value in lookup:
+                bits |= 1 << lookup[value]
+        return np.array([(present & bits) != 0 for present in column_stats['present']], dtype=bool)
+
+    if 'min' not in column_stats:
+        return everything
+    low = np.array([np.nan if v is None else v for v in column_stats['min']], dtype='float64')
+    high = np.array([np.nan if v is None else v for v in column_stats['max']], dtype='float64')
+    literals = node[2] if kind in ('in', 'notin') else [node[2]]
+    try:
+        points = [column_stats['convert'](value) for value in literals]
+    except (ValueError, TypeError, FilterError):
+        return everything
+
+    with np.errstate(invalid='ignore'):
+        if kind in ('eq', 'in'):
+            mask = np.zeros(chunk_count, dtype=bool)
+            for point in points:
+                mask |= (low <= point) & (point <= high)
+            return mask
+        if kind in ('ne', 'notin'):
+            if len(points) != 1:
+                return everything
+            # Only a chunk holding nothing but the excluded value can be skipped.
+            return ~((low == points[0]) & (high == points[0]))
+        # Statistics are compared as floats, which can round large integers and
+        # timestamps together, so strict bounds are checked non-strictly.
+        point = points[0]
+        if kind in ('lt', 'le'):
+            return low <= point
+        return high >= point
@@ -0,0 +1,17 @@
+from django.core.management.base import BaseCommand
+
+from survey_analyzer.models import CSVBlob
+from survey_analyzer.storage import release_blob
+
+
+class Command(BaseCommand):
+    help = (
+        'Deletes stored CSV content that no upload points at: the blob rows, their files '
+        'and their column store datasets. Deleting an upload already does this for its '
+        'content; this sweeps blobs left over from before, or from interrupted deletes.'
+    )
+
+    def handle(self, *args, **options):
+        unused = CSVBlob.objects.filter(uploads__isnull=True).values_list('id', flat=True)
+        deleted = sum(release_blob(blob_id) for blob_id in list(unused))
+        self.stdout.write(self.style.SUCCESS(f"Deleted {deleted} unused blobs"))
@@ -0,0 +1,18 @@
+# Generated by Django 5.0.2 on 2026-10-19 02:13
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('survey_analyzer', '0003_plot'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='csvupload',
+            name='profile',
+            field=models.JSONField(blank=True, default=dict),
+        ),
+    ]
@@ -0,0 +1,25 @@
+# Generated by Django 5.0.2 on 2026-10-19 02:26
+
+from django.db import migrations, models
+
+
+def count_plots(apps, schema_editor):
+    Analysis = apps.get_model('survey_analyzer', 'Analysis')
+    for analysis in Analysis.objects.only('id', 'plots').iterator():
+        Analysis.objects.filter(id=analysis.id).update(plot_count=len(analysis.plots or []))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('survey_analyzer', '0005_content_addressed_uploads'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='analysis',
+            name='plot_count',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.RunPython(count_plots, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,131 @@
+# Generated by Django 5.0.2 on 2026-10-19 02:29
+
+import json
+import zlib
+
+from django.db import migrations, models
+
+
+def _decode(codec, payload):
+    payload = bytes(payload)
+    if codec == 'zstd':
+        import zstandard
+        payload = zstandard.ZstdDecompressor().decompress(payload)
+    elif codec == 'zlib':
+        payload = zlib.decompress(payload)
+    return json.loads(payload)
+
+
+def _plot_type(entry):
+    if entry.get('spec'):
+        return entry['spec'].get('plot_type', '')
+    traces = (entry.get('data') or {}).get('data') or []
+    return traces[0].get('type', '') if traces and isinstance(traces[0], dict) else ''
+
+
+def move_plots_to_rows(apps, schema_editor):
+    Analysis = apps.get_model('survey_analyzer', 'Analysis')
+    Plot = apps.get_model('survey_analyzer', 'Plot')
+
+    # Plot rows from before this migration (never written by the API) go after
+    # the analysis' JSON plots, with their text data as the plot data.
+    for plot in Plot.objects.all():
+        try:
+            data = json.loads(plot.data)
+        except ValueError:
+            data = plot.data
+        plot.position = 1000000 + plot.id
+        plot.payload = zlib.compress(json.dumps({"data": data}).encode())
+        plot.save(update_fields=['position', 'payload'])
+
+    for analysis in Analysis.objects.only('id', 'plots').iterator():
+        rows = []
+        for position, entry in enumerate(analysis.plots or []):
+            if not isinstance(entry, dict):
+                continue
+            content = {key: entry[key] for key in ('spec', 'data') if entry.get(key) is not None}
+            rows.append(Plot(
+                analysis_id=analysis.id,
+                position=position,
+                title=(entry.get('title') or 'Untitled Plot')[:255],
+                description=entry.get('description') or '',
+                type=_plot_type(entry)[:255],
+                codec='zlib',
+                payload=zlib.compress(json.dumps(content).encode()),
+            ))
+        Plot.objects.bulk_create(rows)
+
+
+def move_rows_to_plots(apps, schema_editor):
+    Analysis = apps.get_model('survey_analyzer', 'Analysis')
+    Plot = apps.get_model('survey_analyzer', 'Plot')
+    for analysis in Analysis.objects.all().iterator():
+        plots = []
+        for plot in Plot.objects.filter(analysis_id=analysis.id).order_by('position', 'id'):
+            entry = {"title": plot.title, "description": plot.description}
+            entry.update(_decode(plot.codec, plot.payload))
+            plots.append(entry)
+        Analysis.objects.filter(id=analysis.id).update(plots=plots, plot_count=len(plots))
+    Plot.objects.all().delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('survey_analyzer', '0006_analysis_plot_count'),
+    ]
+
+    operations = [
+        migrations.AlterModelOptions(
+            name='plot',
+            options={'ordering': ['position', 'id']},
+        ),
+        migrations.AddField(
+            model_name='plot',
+            name='codec',
+            field=models.CharField(default='zlib', max_length=8),
+        ),
+        migrations.AddField(
+            model_name='plot',
+            name='description',
+            field=models.TextField(blank=True, default=''),
+        ),
+        migrations.AddField(
+            model_name='plot',
+            name='payload',
+            field=models.BinaryField(default=bytes),
+        ),
+        migrations.AddField(
+            model_name='plot',
+            name='position',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='plot',
+            name='title',
+            field=models.CharField(default='Untitled Plot', max_length=255),
+        ),
+        migrations.AlterField(
+            model_name='plot',
+            name='type',
+            field=models.CharField(blank=True, default='', max_length=255),
+        ),
+        migrations.AlterField(
+            model_name='plot',
+            name='data',
+            field=models.TextField(blank=True, default=''),
+        ),
+        migrations.RunPython(move_plots_to_rows, move_rows_to_plots),
+        migrations.RemoveField(
+            model_name='analysis',
+            name='plot_count',
+        ),
+        migrations.RemoveField(
+            model_name='analysis',
+            name='plots',
+        ),
+        migrations.RemoveField(
+            model_name='plot',
+            name='data',
+        ),
+    ]
@@ -1,16 +1,58 @@
 from django.db import models
 from django.conf import settings
 import os
+import uuid
 
 
 def upload_to(instance, filename):
     return os.path.join('uploads', 'csv', str(instance.user.id), filename)
 
 
+def blob_upload_to(instance, filename):
+    # Content-addressed: uploads/cas/ab/cd/abcd....csv
+    return os.path.join('uploads', 'cas', instance.sha256[:2], instance.sha256[2:4], f"{instance.sha256}.csv")
+
+
+def partial_upload_path(session_id):
+    return os.path.join('uploads', 'partial', f"{session_id}.part")
+
+
+class CSVBlob(models.Model):
+    """Stored CSV content, shared by every CSVUpload with the same SHA-256."""
+    sha256 = models.CharField(max_length=64, unique=True)
+    file = models.FileField(upload_to=blob_upload_to)
+    size = models.BigIntegerField()
+    profile = models.JSONField(default=dict, blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        return self.sha256
+
+
 class CSVUpload(models.Model):
     user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE)
     file = models.FileField(upload_to=upload_to)
     uploaded_at = models.DateTimeField(auto_now_add=True)
+    profile = models.JSONField(default=dict, blank=True)  # Per-column stats computed at upload
+    blob = models.ForeignKey(CSVBlob, null=True, blank=True, on_delete=models.PROTECT, related_name='uploads')
+    original_filename = models.CharField(max_length=255, blank=True)
+
+
+class UploadSession(models.Model):
+    """A chunked upload in progress; chunks are appended at ``offset`` until ``total_size``."""
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE)
+    filename = models.CharField(max_length=255)
+    total_size = models.BigIntegerField()
+    offset = models.BigIntegerField(default=0)
+    sha256 = models.CharField(max_length=64, blank=True)  # Declared by the client, checked on completion
+    csv_upload = models.ForeignKey(CSVUpload, null=True, blank=True, on_delete=models.SET_NULL)
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    @property
+    def is_complete(self):
+        return self.csv_upload_id is not None
 
 
 class Analysis(models.Model):
@@ -19,7 +61,6 @@ class Analysis(models.Model):
     author_name = models.CharField(max_length=255, default='Unknown Author')
     date = models.DateField(auto_now_add=True, null=True)
     description = models.TextField(blank=True, null=True)
-    plots = models.JSONField(default=list)  # Store plot configurations and data
 
     def __str__(self):
         return this.title
@@ -27,8 +68,16 @@ class Analysis(models.Model):
 
 class Plot(models.Model):
     analysis = models.ForeignKey('Analysis', related_name='related_plots', on_delete=models.CASCADE)
-    type = models.CharField(max_length=255)
-    data = models.TextField()  # Store plot data as JSON or plain text
+    position = models.PositiveIntegerField(default=0)
+    title = models.CharField(max_length=255, default='Untitled Plot')
+    description = models.TextField(blank=True, default='')
+    type = models.CharField(max_length=255, blank=True, default='')
+    # Compressed JSON of the plot's spec (or, for old plots, its data); see plot_storage.
+    codec = models.CharField(max_length=8, default='zlib')
+    payload = models.BinaryField(default=bytes)
+
+    class Meta:
+        ordering = ['position', 'id']
 
     def __str__(self):
         return f"{self.type} Plot for {self.analysis.title}"
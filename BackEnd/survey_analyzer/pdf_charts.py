@@ -0,0 +1,621 @@
+"""
+Plot data drawn as ReportLab vector graphics, for published PDFs.
+
+``chart_drawing`` turns the Plotly ``data``/``layout`` the plot engine builds
+(bar, line, scatter, area, pie, box and heatmap traces) into a ReportLab
+Drawing, which platypus lays out like any other flowable. Nothing is
+rasterised, so charts stay sharp at any zoom and publishing does not start a
+kaleido process per plot. Figures with anything else in them make
+``chart_drawing`` return None, and ``chart_flowable`` falls back to a kaleido
+raster for those (or for every figure, in 'raster' mode).
+
+Long series are thinned before drawing: lines keep the minimum and maximum of
+every horizontal point they span, and marker traces are strided down to
+MAX_MARKERS, so a million-row plot does not become a million PDF operators.
+"""
+import math
+from io import BytesIO
+
+import numpy as np
+import pandas as pd
+from reportlab.graphics.charts.piecharts import Pie
+from reportlab.graphics.shapes import Drawing, Group, Line, Path, Polygon, PolyLine, Rect, String
+from reportlab.lib import colors
+
+from monitoring.timing import phase
+
+from .column_profile import DATE_LIKE
+from .publish import DEFAULT_DPI, DEFAULT_QUALITY
+from .renderers import decode_typed_arrays
+
+# Plotly's default colorway, so PDFs match the charts in the app.
+COLORWAY = ['#636efa', '#EF553B', '#00cc96', '#ab63fa', '#FFA15A', '#19d3f3', '#FF6692', '#B6E880', '#FF97FF', '#FECB52']
+COLORSCALES = {
+    'Viridis': ['#440154', '#482878', '#3e4989', '#31688e', '#26828e', '#1f9e89', '#35b779', '#6ece58', '#b5de2b', '#fde725'],
+    'RdBu': ['#053061', '#2166ac', '#4393c3', '#92c5de', '#d1e5f0', '#f7f7f7', '#fddbc7', '#f4a582', '#d6604d', '#b2182b', '#67001f'],
+}
+SUPPORTED_TRACE_TYPES = ['bar', 'scatter', 'pie', 'box', 'heatmap']
+
+# Marker traces are strided down to this many points.
+MAX_MARKERS = 5000
+# Bar traces with more bars than this go to kaleido.
+MAX_BARS = 5000
+# Box plot outliers drawn per trace.
+MAX_OUTLIERS = 2000
+# Larger heatmaps go to kaleido.
+MAX_HEATMAP_CELLS = 40000
+# Category axes label at most this many ticks.
+MAX_CATEGORY_LABELS = 30
+
+# Width in pixels kaleido lays figures out at, before scaling to the DPI.
+RASTER_LAYOUT_WIDTH = 800
+
+FONT = 'Helvetica'
+FONT_SIZE = 7
+TITLE_SIZE = 11
+AXIS_COLOR = colors.HexColor('#444444')
+GRID_COLOR = colors.HexColor('#e5e5e5')
+
+
+def chart_flowable(figure, width, height, mode='vector', **raster_options):
+    """
+    A flowable for ``figure``: a vector Drawing when supported (and ``mode`` is
+    'vector'), else a kaleido image. ``raster_options`` go to kaleido_image.
+    """
+    if mode == 'vector':
+        with phase('vector_charts'):
+            drawing = chart_drawing(figure, width, height)
+        if drawing is not None:
+            return drawing
+    with phase('kaleido'):
+        return kaleido_image(figure, width, height, **raster_options)
+
+
+def kaleido_image(figure, width, height, dpi=DEFAULT_DPI, image_format='png', quality=DEFAULT_QUALITY):
+    """
+    ``figure`` rendered by kaleido at ``dpi`` for its size on the page
+    (``width`` x ``height`` points), as a platypus Image. JPEG images are
+    re-encoded at ``quality``; PNG is lossless.
+    """
+    import plotly.graph_objects as go
+    import plotly.io as pio
+    from PIL import Image as PILImage
+    from reportlab.platypus import Image
+
+    pio.kaleido.scope.mathjax = None
+    fig = go.Figure(data=decode_typed_arrays(figure['data']), layout=figure.get('layout') or {})
+    # Update layout for better PDF export
+    fig.update_layout(
+        paper_bgcolor='white',
+        plot_bgcolor='white',
+        width=RASTER_LAYOUT_WIDTH,
+        height=RASTER_LAYOUT_WIDTH * height / width,
+        margin=dict(l=50, r=50, t=50, b=50)
+    )
+    scale = width / 72 * dpi / RASTER_LAYOUT_WIDTH
+    img_bytes = pio.to_image(fig, format='png', engine='kaleido', scale=scale)
+    if image_format == 'jpeg':
+        # Kaleido has no quality setting, so JPEGs are encoded here.
+        output = BytesIO()
+        PILImage.open(BytesIO(img_bytes)).convert('RGB').save(output, 'JPEG', quality=quality, optimize=True)
+        img_bytes = output.getvalue()
+    return Image(BytesIO(img_bytes), width=width, height=height)
+
+
+def chart_drawing(figure, width, height):
+    """A ReportLab Drawing of ``figure``, or None when it has traces this module can't draw."""
+    traces = [trace for trace in decode_typed_arrays(figure.get('data') or []) if isinstance(trace, dict)]
+    layout = figure.get('layout') or {}
+    if not traces or any(trace.get('type', 'scatter') not in SUPPORTED_TRACE_TYPES for trace in traces):
+        return None
+
+    kinds = {trace.get('type', 'scatter') for trace in traces}
+    drawing = Drawing(width, height)
+    title = _text(layout.get('title'))
+    top = height - 8
+    if title:
+        drawing.add(String(width / 2, height - TITLE_SIZE - 4, title, fontName=FONT, fontSize=TITLE_SIZE, textAnchor='middle'))
+        top = height - TITLE_SIZE - 14
+
+    if kinds & {'pie', 'heatmap'}:
+        # These own the whole plot area.
+        if len(traces) > 1:
+            return None
+        draw = _draw_pie if 'pie' in kinds else _draw_heatmap
+    elif 'box' in kinds:
+        if kinds != {'box'}:
+            return None
+        draw = _draw_boxes
+    else:
+        draw = _draw_xy
+    if draw(drawing, traces, layout, (0, 0, width, top)) is False:
+        return None
+    return drawing
+
+
+# Helpers
+
+
+def _text(title):
+    if isinstance(title, dict):
+        title = title.get('text')
+    return str(title) if title not in (None, '') else ''
+
+
+def _color(index):
+    return colors.HexColor(COLORWAY[index % len(COLORWAY)])
+
+
+def _label(value):
+    if isinstance(value, (float, np.floating)):
+        return _number(value)
+    text = str(value)
+    return text if len(text) <= 18 else text[:17] + '…'
+
+
+def _number(value):
+    if value != value:
+        return ''
+    if float(value).is_integer() and abs(value) < 1e15:
+        return f"{int(value):,}"
+    return f"{value:.4g}"
+
+
+def _floats(values):
+    """``values`` as float64, with anything non-numeric as NaN."""
+    array = np.asarray(values if values is not None else [])
+    if array.dtype.kind in 'biuf':
+        return array.astype('float64')
+    if array.dtype.kind == 'M':
+        return _datetime_floats(array)
+    if array.dtype.kind == 'O' and array.ndim > 1:
+        try:
+            return array.astype('float64')
+        except (TypeError, ValueError):
+            return np.full(array.shape, np.nan)
+    return pd.to_numeric(pd.Series(array.ravel()), errors='coerce').to_numpy('float64', na_value=np.nan).reshape(array.shape)
+
+
+def _datetime_floats(array):
+    floats = array.astype('datetime64[ns]').astype('int64').astype('float64')
+    floats[np.isnat(array)] = np.nan
+    return floats
+
+
+def nice_ticks(low, high, count=5):
+    """Round tick values covering ``[low, high]``, about ``count`` of them."""
+    if not (math.isfinite(low) and math.isfinite(high)):
+        return np.array([])
+    if low == high:
+        low, high = low - 1, high + 1
+    raw = (high - low) / count
+    step = 10 ** math.floor(math.log10(raw))
+    for multiple in (1, 2, 2.5, 5, 10):
+        if raw <= step * multiple:
+            step *= multiple
+            break
+    first = math.ceil(low / step - 1e-9) * step
+    return np.arange(first, high + step * 1e-9, step)
+
+
+class Axis:
+    """Maps data values to drawing coordinates along one direction."""
+
+    def __init__(self, kind, low, high, start, end, categories=None):
+        if low == high:
+            low, high = low - 0.5, high + 0.5
+        self.kind = kind
+        self.low = low
+        self.high = high
+        self.start = start
+        self.end = end
+        self.categories = categories or []
+
+    def position(self, values):
+        return self.start + (np.asarray(values, dtype='float64') - self.low) / (self.high - self.low) * (self.end - self.start)
+
+    def ticks(self):
+        """``(values, labels)`` for this axis' tick marks."""
+        if self.kind == 'category':
+            step = max(1, math.ceil(len(self.categories) / MAX_CATEGORY_LABELS))
+            values = np.arange(0, len(self.categories), step)
+            return values, [_label(self.categories[i]) for i in values]
+        if self.kind == 'date':
+            values = np.linspace(self.low, self.high, 5)
+            span_days = (self.high - self.low) / 86400e9
+            unit = 'D' if span_days > 3 else 'm'
+            labels = [np.datetime_as_string(np.datetime64(int(v), 'ns'), unit=unit).replace('T', ' ') for v in values]
+            return values, labels
+        values = nice_ticks(self.low, self.high)
+        return values, [_number(v) for v in values]
+
+
+def _x_values(traces):
+    """
+    The x-axis kind ('number', 'date' or 'category'), each trace's x as floats,
+    and the categories in first-seen order for category axes.
+    """
+    arrays = [
+        np.asarray(trace['x'] if trace.get('x') is not None else np.arange(len(_floats(trace.get('y')))))
+        for trace in traces
+    ]
+    if all(array.dtype.kind in 'biuf' for array in arrays):
+        return 'number', [array.astype('float64') for array in arrays], []
+    if all(array.dtype.kind == 'M' or _looks_like_dates(array) for array in arrays):
+        try:
+            dates = [array if array.dtype.kind == 'M' else np.array(array, dtype='datetime64[ns]') for array in arrays]
+        except (TypeError, ValueError):
+            dates = None
+        if dates is not None:
+            return 'date', [_datetime_floats(array) for array in dates], []
+
+    categories = {}
+    positions = []
+    for array in arrays:
+        labels = array.astype(str) if array.dtype.kind != 'M' else np.datetime_as_string(array)
+        positions.append(np.array([categories.setdefault(label, len(categories)) for label in labels.tolist()], dtype='float64'))
+    return 'category', positions, list(categories)
+
+
+def _looks_like_dates(array):
+    # Datetime x values come back from JSON as ISO strings.
+    values = [value for value in array.tolist() if value is not None]
+    return bool(values) and all(isinstance(value, str) and DATE_LIKE.match(value) for value in values)
+
+
+def _finite_range(arrays, include=()):
+    values = [array[np.isfinite(array)] for array in arrays]
+    values = [array for array in values if array.size]
+    if not values and not include:
+        return 0.0, 1.0
+    low = min([float(array.min()) for array in values] + list(include))
+    high = max([float(array.max()) for array in values] + list(include))
+    return low, high
+
+
+def _padded(low, high):
+    """``[low, high]`` widened by 5% on each side, so extremes don't sit on the frame."""
+    pad = (high - low) * 0.05 or 0.5
+    return low - pad, high + pad
+
+
+def _draw_axes(drawing, x_axis, y_axis, layout, grid=True):
+    left, right = x_axis.start, x_axis.end
+    bottom, top = sorted((y_axis.start, y_axis.end))
+
+    values, labels = y_axis.ticks()
+    for value, label in zip(values, labels):
+        y = float(y_axis.position(value))
+        if grid:
+            drawing.add(Line(left, y, right, y, strokeColor=GRID_COLOR, strokeWidth=0.5))
+        drawing.add(String(left - 3, y - FONT_SIZE / 3, label, fontName=FONT, fontSize=FONT_SIZE, textAnchor='end', fillColor=AXIS_COLOR))
+
+    values, labels = x_axis.ticks()
+    rotate = x_axis.kind == 'category' and len(values) > 8
+    for value, label in zip(values, labels):
+        x = float(x_axis.position(value))
+        drawing.add(Line(x, bottom, x, bottom - 3, strokeColor=AXIS_COLOR, strokeWidth=0.5))
+        text = String(x, bottom - FONT_SIZE - 4, label, fontName=FONT, fontSize=FONT_SIZE, textAnchor='middle', fillColor=AXIS_COLOR)
+        if rotate:
+            # Slanted labels, anchored at their end under the tick.
+            text = String(0, 0, label, fontName=FONT, fontSize=FONT_SIZE, textAnchor='end', fillColor=AXIS_COLOR)
+            group = _rotated(text, x + 2, bottom - 6, 45)
+            drawing.add(group)
+            continue
+        drawing.add(text)
+
+    drawing.add(Line(left, bottom, right, bottom, strokeColor=AXIS_COLOR, strokeWidth=0.75))
+    drawing.add(Line(left, bottom, left, top, strokeColor=AXIS_COLOR, strokeWidth=0.75))
+
+    x_title = _text((layout.get('xaxis') or {}).get('title'))
+    if x_title:
+        drawing.add(String((left + right) / 2, 4, x_title, fontName=FONT, fontSize=FONT_SIZE + 1, textAnchor='middle'))
+    y_title = _text((layout.get('yaxis') or {}).get('title'))
+    if y_title:
+        drawing.add(_rotated(String(0, 0, y_title, fontName=FONT, fontSize=FONT_SIZE + 1, textAnchor='middle'), 10, (bottom + top) / 2, 90))
+
+
+def _rotated(shape, x, y, degrees):
+    group = Group(shape)
+    group.translate(x, y)
+    group.rotate(degrees)
+    return group
+
+
+def _draw_legend(drawing, names, left, top):
+    for i, name in enumerate(names):
+        y = top - 6 - i * (FONT_SIZE + 3)
+        drawing.add(Rect(left, y, 6, 6, fillColor=_color(i), strokeColor=None))
+        drawing.add(String(left + 9, y, _label(name), fontName=FONT, fontSize=FONT_SIZE))
+
+
+def _plot_area(box, layout, legend=False):
+    """The axes' box within ``box``, leaving room for tick labels, titles and a legend."""
+    left, bottom, right, top = box
+    has_x_title = bool(_text((layout.get('xaxis') or {}).get('title')))
+    return left + 52, bottom + (40 if has_x_title else 30), right - (95 if legend else 28), top
+
+
+# XY charts (bar, line, scatter, area)
+
+
+def _draw_xy(drawing, traces, layout, box):
+    names = [trace.get('name') or f"trace {i}" for i, trace in enumerate(traces)]
+    left, bottom, right, top = _plot_area(box, layout, legend=len(traces) > 1)
+    kind, xs, categories = _x_values(traces)
+    ys = [_floats(trace.get('y')) for trace in traces]
+    bars = [i for i, trace in enumerate(traces) if trace.get('type') == 'bar']
+    if any(len(xs[i]) > MAX_BARS for i in bars):
+        return False
+    fills = [i for i, trace in enumerate(traces) if trace.get('fill')]
+
+    if kind == 'category':
+        x_low, x_high = -0.5, max(len(categories) - 0.5, 0.5)
+        slot = 1.0
+    else:
+        x_low, x_high = _finite_range(xs)
+        slot = _bar_slot(xs, bars) if bars else 0
+        x_low, x_high = x_low - slot / 2, x_high + slot / 2
+    data_low, data_high = _finite_range(ys, include=(0,) if bars or fills else ())
+    y_low, y_high = _padded(data_low, data_high)
+    if bars or fills:
+        # Bars and fills grow from zero; the axis stops there rather than below it.
+        y_low = 0.0 if data_low == 0 else y_low
+        y_high = 0.0 if data_high == 0 else y_high
+
+    x_axis = Axis(kind, x_low, x_high, left, right, categories)
+    y_axis = Axis('number', y_low, y_high, bottom, top)
+    _draw_axes(drawing, x_axis, y_axis, layout)
+
+    width = slot * 0.8 / max(len(bars), 1)
+    for order, i in enumerate(bars):
+        offset = (order - (len(bars) - 1) / 2) * width
+        _draw_bars(drawing, x_axis, y_axis, xs[i] + offset, ys[i], width, _color(i))
+    for i, trace in enumerate(traces):
+        if trace.get('type') == 'bar':
+            continue
+        mode = trace.get('mode') or 'lines+markers'
+        if trace.get('fill'):
+            _draw_area(drawing, x_axis, y_axis, xs[i], ys[i], _color(i))
+        if 'lines' in mode:
+            _draw_lines(drawing, x_axis, y_axis, xs[i], ys[i], _color(i))
+        if 'markers' in mode:
+            _draw_markers(drawing, x_axis, y_axis, xs[i], ys[i], _color(i))
+
+    if len(traces) > 1:
+        _draw_legend(drawing, names, right + 15, top)
+
+
+def _bar_slot(xs, bars):
+    """The smallest gap between bar positions, which bounds the bar width."""
+    gaps = []
+    for i in bars:
+        values = np.unique(xs[i][np.isfinite(xs[i])])
+        if len(values) > 1:
+            gaps.append(np.diff(values).min())
+    return float(min(gaps)) if gaps else 1.0
+
+
+def _draw_bars(drawing, x_axis, y_axis, x, y, width, color):
+    keep = np.isfinite(x) & np.isfinite(y)
+    x, y = x[keep], y[keep]
+    lefts = x_axis.position(x - width / 2)
+    rights = x_axis.position(x + width / 2)
+    zero = float(y_axis.position(0))
+    tops = y_axis.position(y)
+    for x0, x1, y1 in zip(lefts.tolist(), rights.tolist(), tops.tolist()):
+        drawing.add(Rect(x0, min(zero, y1), max(x1 - x0, 0.1), abs(y1 - zero), fillColor=color, strokeColor=None))
+
+
+def _segments(x, y):
+    """Runs of consecutive finite points; gaps (NaN) break the line, as in Plotly."""
+    finite = np.isfinite(x) & np.isfinite(y)
+    edges = np.flatnonzero(np.diff(np.concatenate(([0], finite.view(np.int8), [0]))))
+    return [(x[start:end], y[start:end]) for start, end in zip(edges[::2], edges[1::2])]
+
+
+def _thin_line(px, py, width):
+    """
+    At most two points per horizontal point of a sorted line: the lowest and
+    highest y in each, in x order, which keeps the line's visible envelope.
+    """
+    if len(px) <= 2 * width or np.any(np.diff(px) < 0):
+        return px, py
+    columns = np.floor(px - px[0]).astype(np.int64)
+    starts = np.flatnonzero(np.concatenate(([True], np.diff(columns) > 0)))
+    low = np.minimum.reduceat(py, starts)
+    high = np.maximum.reduceat(py, starts)
+    x = np.repeat(px[starts], 2)
+    y = np.column_stack([low, high]).ravel()
+    return x, y
+
+
+def _draw_lines(drawing, x_axis, y_axis, x, y, color):
+    for sx, sy in _segments(x, y):
+        px, py = _thin_line(x_axis.position(sx), y_axis.position(sy), x_axis.end - x_axis.start)
+        if len(px) == 1:
+            continue
+        drawing.add(PolyLine(np.column_stack([px, py]).ravel().tolist(), strokeColor=color, strokeWidth=1))
+
+
+def _draw_area(drawing, x_axis, y_axis, x, y, color):
+    zero = float(y_axis.position(0))
+    fill = colors.Color(color.red, color.green, color.blue, alpha=0.35)
+    for sx, sy in _segments(x, y):
+        px, py = _thin_line(x_axis.position(sx), y_axis.position(sy), x_axis.end - x_axis.start)
+        points = [float(px[0]), zero] + np.column_stack([px, py]).ravel().tolist() + [float(px[-1]), zero]
+        drawing.add(Polygon(points, fillColor=fill, strokeColor=None))
+
+
+def _draw_markers(drawing, x_axis, y_axis, x, y, color):
+    keep = np.isfinite(x) & np.isfinite(y)
+    x, y = x[keep], y[keep]
+    step = max(1, math.ceil(len(x) / MAX_MARKERS))
+    drawing.add(_dots(x_axis.position(x[::step]), y_axis.position(y[::step]), 4.0 if len(x) <= 1000 else 2.5, color))
+
+
+def _dots(px, py, diameter, color):
+    """
+    Round markers as one path of zero-length segments with round caps: a few
+    bytes per point in the PDF, against a four-curve path per Circle.
+    """
+    points = np.repeat(np.column_stack([px, py]), 2, axis=0).ravel().tolist()
+    return Path(points, [0, 1] * len(px), strokeColor=color, strokeWidth=diameter, strokeLineCap=1, fillColor=None)
+
+
+# Pie, box and heatmap charts
+
+
+def _draw_pie(drawing, traces, layout, box):
+    left, bottom, right, top = box
+    trace = traces[0]
+    values = _floats(trace.get('values'))
+    labels = [_label(label) for label in (trace.get('labels') if trace.get('labels') is not None else range(len(values)))]
+    keep = np.isfinite(values) & (values > 0)
+    values = values[keep]
+    labels = [label for label, kept in zip(labels, keep) if kept]
+    if not len(values):
+        return False
+
+    # Plotly sorts slices by size and labels those big enough to read.
+    order = np.argsort(-values, kind='stable')
+    values = values[order]
+    labels = [labels[i] for i in order]
+    shares = values / values.sum()
+
+    size = min(right - left - 160, top - bottom - 20)
+    pie = Pie()
+    pie.x = left + 20
+    pie.y = bottom + (top - bottom - size) / 2
+    pie.width = pie.height = size
+    pie.data = values.tolist()
+    pie.labels = [f"{share:.1%}" if share >= 0.04 else '' for share in shares]
+    pie.simpleLabels = 1
+    pie.slices.strokeColor = colors.white
+    pie.slices.strokeWidth = 0.5
+    pie.slices.fontName = FONT
+    pie.slices.fontSize = FONT_SIZE
+    pie.slices.labelRadius = 0.7
+    pie.slices.fontColor = colors.white
+    pie.startAngle = 90
+    pie.direction = 'clockwise'
+    for i in range(len(values)):
+        pie.slices[i].fillColor = _color(i)
+    drawing.add(pie)
+
+    legend_x = pie.x + size + 20
+    shown = max(1, int((top - bottom) // (FONT_SIZE + 3)))
+    for i, label in enumerate(labels[:shown]):
+        y = top - 8 - i * (FONT_SIZE + 3)
+        drawing.add(Rect(legend_x, y, 6, 6, fillColor=_color(i), strokeColor=None))
+        drawing.add(String(legend_x + 9, y, label, fontName=FONT, fontSize=FONT_SIZE))
+
+
+def _box_stats(values):
+    values = values[np.isfinite(values)]
+    if not values.size:
+        return None
+    q1, median, q3 = np.percentile(values, [25, 50, 75])
+    iqr = q3 - q1
+    inside = values[(values >= q1 - 1.5 * iqr) & (values <= q3 + 1.5 * iqr)]
+    return {
+        "q1": q1, "median": median, "q3": q3,
+        "low": inside.min(), "high": inside.max(),
+        "outliers": values[(values < q1 - 1.5 * iqr) | (values > q3 + 1.5 * iqr)],
+    }
+
+
+def _draw_boxes(drawing, traces, layout, box):
+    left, bottom, right, top = _plot_area(box, layout)
+    names = [trace.get('name') or f"trace {i}" for i, trace in enumerate(traces)]
+    stats = [_box_stats(_floats(trace.get('y'))) for trace in traces]
+    present = [s for s in stats if s is not None]
+    y_low, y_high = _padded(*_finite_range(
+        [np.array([s["low"], s["high"]]) for s in present] + [s["outliers"] for s in present]
+    ))
+    x_axis = Axis('category', -0.5, len(traces) - 0.5, left, right, names)
+    y_axis = Axis('number', y_low, y_high, bottom, top)
+    _draw_axes(drawing, x_axis, y_axis, layout)
+
+    half = min(0.3 * (right - left) / len(traces), 40)
+    for i, s in enumerate(stats):
+        if s is None:
+            continue
+        color = _color(i)
+        fill = colors.Color(color.red, color.green, color.blue, alpha=0.3)
+        x = float(x_axis.position(i))
+        q1, median, q3, low, high = (float(y_axis.position(s[key])) for key in ('q1', 'median', 'q3', 'low', 'high'))
+        drawing.add(Line(x, low, x, q1, strokeColor=color))
+        drawing.add(Line(x, q3, x, high, strokeColor=color))
+        drawing.add(Line(x - half / 2, low, x + half / 2, low, strokeColor=color))
+        drawing.add(Line(x - half / 2, high, x + half / 2, high, strokeColor=color))
+        drawing.add(Rect(x - half, q1, 2 * half, max(q3 - q1, 0.1), fillColor=fill, strokeColor=color))
+        drawing.add(Line(x - half, median, x + half, median, strokeColor=color, strokeWidth=1.5))
+        outliers = s["outliers"]
+        step = max(1, math.ceil(len(outliers) / MAX_OUTLIERS))
+        if len(outliers):
+            py = y_axis.position(outliers[::step])
+            drawing.add(_dots(np.full(len(py), x), py, 3.0, color))
+
+
+def _scale_colors(name, count):
+    stops = [colors.HexColor(color) for color in COLORSCALES.get(name if isinstance(name, str) else '', COLORSCALES['Viridis'])]
+    positions = np.linspace(0, len(stops) - 1, count)
+    result = []
+    for position in positions:
+        i = min(int(position), len(stops) - 2)
+        t = position - i
+        a, b = stops[i], stops[i + 1]
+        result.append(colors.Color(a.red + (b.red - a.red) * t, a.green + (b.green - a.green) * t, a.blue + (b.blue - a.blue) * t))
+    return result
+
+
+def _draw_heatmap(drawing, traces, layout, box):
+    trace = traces[0]
+    z = _floats(trace.get('z'))
+    # Single-column heatmaps arrive wrapped in an extra list.
+    while z.ndim > 2 and z.shape[0] == 1:
+        z = z[0]
+    if z.ndim != 2 or not z.size or z.size > MAX_HEATMAP_CELLS:
+        return False
+    rows, columns = z.shape
+    x_labels = list(trace.get('x')) if trace.get('x') is not None else list(range(columns))
+    y_labels = list(trace.get('y')) if trace.get('y') is not None else list(range(rows))
+    if len(x_labels) != columns or len(y_labels) != rows:
+        return False
+
+    left, bottom, right, top = _plot_area(box, layout)
+    right -= 40  # colour bar
+    finite = z[np.isfinite(z)]
+    z_low = float(trace['zmin']) if trace.get('zmin') is not None else (float(finite.min()) if finite.size else 0.0)
+    z_high = float(trace['zmax']) if trace.get('zmax') is not None else (float(finite.max()) if finite.size else 1.0)
+    if z_high == z_low:
+        z_high = z_low + 1
+
+    x_axis = Axis('category', -0.5, columns - 0.5, left, right, x_labels)
+    # Plotly draws the first row at the bottom unless the axis is reversed.
+    reversed_y = (layout.get('yaxis') or {}).get('autorange') == 'reversed'
+    y_axis = Axis('category', -0.5, rows - 0.5, top if reversed_y else bottom, bottom if reversed_y else top, y_labels)
+    levels = 64
+    palette = _scale_colors(trace.get('colorscale'), levels)
+    index = np.clip(((z - z_low) / (z_high - z_low) * (levels - 1)).round(), 0, levels - 1)
+
+    cell_width = (right - left) / columns
+    cell_height = (top - bottom) / rows
+    for row in range(rows):
+        y = float(y_axis.position(row)) - cell_height / 2
+        for column in range(columns):
+            if not np.isfinite(z[row, column]):
+                continue
+            x = left + column * cell_width
+            drawing.add(Rect(x, y, cell_width, cell_height, fillColor=palette[int(index[row, column])], strokeColor=None))
+    _draw_axes(drawing, x_axis, y_axis, layout, grid=False)
+
+    if trace.get('showscale', True):
+        bar_left = right + 15
+        step = (top - bottom) / levels
+        for level, color in enumerate(palette):
+            drawing.add(Rect(bar_left, bottom + level * step, 10, step + 0.2, fillColor=color, strokeColor=None))
+        for value in (z_low, (z_low + z_high) / 2, z_high):
+            y = bottom + (value - z_low) / (z_high - z_low) * (top - bottom)
+            drawing.add(String(bar_left + 13, y - FONT_SIZE / 3, _number(value), fontName=FONT, fontSize=FONT_SIZE))
@@ -0,0 +1,319 @@
+import logging
+
+import numpy as np
+import pandas as pd
+
+from .column_profile import column_entries, column_names, is_fully_counted
+from .resample import auto_bucket, resample
+
+logger = logging.getLogger(__name__)
+
+AXIS_PLOT_TYPES = ['scatter', 'bar', 'line', 'area', 'heatmap', 'box']
+XY_PLOT_TYPES = ['scatter', 'bar', 'line', 'area']
+TIME_BUCKET_PLOT_TYPES = ['line', 'area', 'bar']
+
+# Points aimed for when the bucket is chosen automatically.
+DEFAULT_BUCKET_POINTS = 500
+
+# Equal-width bins of a numeric histogram.
+HISTOGRAM_BINS = 50
+
+
+class PlotError(Exception):
+    """A plot request that cannot be drawn from the selected columns."""
+
+
+def validate_plot_request(profile, plot_type, x_axis, y_axes):
+    """Check the requested columns against the upload's profile, without reading the file."""
+    columns = column_names(profile)
+
+    if plot_type in AXIS_PLOT_TYPES:
+        if not x_axis or not y_axes:
+            raise PlotError("x_axis and y_axes are required for this plot type.")
+        if x_axis not in columns or any(y not in columns for y in y_axes):
+            raise PlotError("Invalid columns selected for x_axis or y_axes.")
+
+    if plot_type in ('pie', 'histogram'):
+        if not x_axis:
+            raise PlotError(f"x_axis is required for {plot_type} charts.")
+        if x_axis not in columns:
+            raise PlotError("Invalid column selected for x_axis.")
+    if plot_type == 'pie' and y_axes and len(y_axes) > 1:
+        raise PlotError("Pie chart supports only one Y-axis variable.")
+
+    if any(column not in columns for column in plot_columns(plot_type, x_axis, y_axes)):
+        raise PlotError("Invalid columns selected for x_axis or y_axes.")
+
+
+def plot_columns(plot_type, x_axis, y_axes):
+    """The columns a plot actually reads, in a stable order without duplicates."""
+    if plot_type in ('pie', 'histogram'):
+        columns = [x_axis]
+    elif plot_type == 'box':
+        columns = list(y_axes or [])
+    else:
+        columns = [x_axis] + list(y_axes or [])
+    return list(dict.fromkeys(column for column in columns if column))
+
+
+def plot_from_profile(profile, plot_type, x_axis, y_axes):
+    """
+    Build the plot from the profile alone when possible.
+
+    Pie charts of columns whose distinct values all fit in the top-values sample
+    need no data at all. Returns None when the data has to be loaded.
+    """
+    if plot_type != 'pie':
+        return None
+    entry = column_entries(profile)[x_axis]
+    if not is_fully_counted(entry):
+        return None
+    return pie_plot(
+        np.array([item["count"] for item in entry["top_values"]]),
+        np.array([item["value"] for item in entry["top_values"]], dtype=object),
+        x_axis,
+    )
+
+
+def pie_plot(values, labels, x_axis):
+    return {
+        "data": [{
+            "values": values,
+            "labels": labels,
+            "type": "pie",
+        }],
+        "layout": {"title": f"Pie Chart of {x_axis}"},
+    }
+
+
+def build_plot(df, plot_type, x_axis, y_axes):
+    """Plotly ``data`` and ``layout`` for a frame holding (at least) the plot's columns."""
+    data = []
+    layout = {}
+
+    if plot_type == 'pie':
+        # Calculate value counts for pie chart
+        value_counts = df[x_axis].value_counts()
+        return pie_plot(value_counts.to_numpy(), value_counts.index.to_numpy(), x_axis)
+
+    elif plot_type == 'histogram':
+        return histogram_plot(df[x_axis], x_axis)
+
+    elif plot_type == 'heatmap':
+        # Handle null values by filling with 0
+        df_filled = df.fillna(0)
+
+        # Convert data to numeric if possible
+        for col in [x_axis] + y_axes:
+            try:
+                df_filled[col] = pd.to_numeric(df_filled[col])
+            except (ValueError, TypeError):
+                pass
+
+        # Create pivot table for heatmap
+        try:
+            if len(y_axes) == 1:
+                # Single y-axis: use x_axis as rows and y_axis as values
+                pivot_data = df_filled.pivot_table(
+                    values=y_axes[0],
+                    index=x_axis,
+                    aggfunc='mean'
+                )
+                data = [{
+                    "z": [pivot_data.to_numpy()],
+                    "x": [y_axes[0]],
+                    "y": pivot_data.index.to_numpy(),
+                    "type": "heatmap",
+                    "colorscale": "Viridis",
+                    "showscale": True
+                }]
+                layout = {
+                    "title": f"Heatmap of {y_axes[0]} by {x_axis}",
+                    "xaxis": {"title": y_axes[0]},
+                    "yaxis": {"title": x_axis},
+                    "height": 500,
+                    "width": 800
+                }
+            else:
+                # Two y-axes: use first y_axis as values, second y_axis as columns
+                pivot_data = df_filled.pivot_table(
+                    values=y_axes[0],  # First y_axis as values
+                    index=x_axis,      # x_axis as rows
+                    columns=y_axes[1], # Second y_axis as columns
+                    aggfunc='mean'
+                )
+
+                # Fill NaN values with 0
+                pivot_data = pivot_data.fillna(0)
+
+                data = [{
+                    "z": pivot_data.to_numpy(),
+                    "x": pivot_data.columns.to_numpy(),
+                    "y": pivot_data.index.to_numpy(),
+                    "type": "heatmap",
+                    "colorscale": "Viridis",
+                    "showscale": True
+                }]
+                layout = {
+                    "title": f"Heatmap of {y_axes[0]} by {x_axis} and {y_axes[1]}",
+                    "xaxis": {"title": y_axes[1]},
+                    "yaxis": {"title": x_axis},
+                    "height": 500,
+                    "width": 800
+                }
+
+        except Exception as e:
+            logger.error(f"Error creating heatmap: {str(e)}")
+            raise PlotError("Could not create heatmap with the selected columns. Please ensure the data is suitable for a heatmap.")
+
+    elif plot_type == 'box':
+        for y_axis in y_axes:
+            data.append({
+                "y": df[y_axis].to_numpy(),
+                "type": "box",
+                "name": y_axis,
+            })
+        layout = {
+            "title": f"Box Plot of {', '.join(y_axes)}",
+            "xaxis": {"title": "Variables"},
+            "yaxis": {"title": "Values"}
+        }
+
+    else:
+        if plot_type in XY_PLOT_TYPES:
+            for y_axis in y_axes:
+                data.append(xy_trace(plot_type, df[x_axis].to_numpy(), df[y_axis].to_numpy(), y_axis))
+
+        layout = {
+            "title": f"{', '.join(y_axes)} vs {x_axis}",
+            "xaxis": {"title": x_axis},
+            "yaxis": {"title": "Values"}
+        }
+
+    return {"data": data, "layout": layout}
+
+
+def histogram_plot(series, x_axis, bins=HISTOGRAM_BINS):
+    """
+    Binned here rather than in the browser, so the response holds ``bins``
+    counts instead of every value: equal-width bins over the finite values of
+    a numeric column, one bar per value otherwise.
+    """
+    if pd.api.types.is_datetime64_any_dtype(series):
+        raise PlotError("Histograms of datetime columns are not supported; use a bucketed bar plot.")
+    if pd.api.types.is_numeric_dtype(series):
+        values = series.to_numpy(dtype='float64', na_value=np.nan)
+        values = values[np.isfinite(values)]
+        if len(values):
+            counts, edges = np.histogram(values, bins=bins)
+            x = (edges[:-1] + edges[1:]) / 2
+        else:
+            counts, x = np.array([], dtype='int64'), values
+    else:
+        value_counts = series.value_counts()
+        counts, x = value_counts.to_numpy(), value_counts.index.to_numpy()
+    return {
+        "data": [{"x": x, "y": counts, "type": "bar", "name": x_axis}],
+        "layout": {
+            "title": f"Histogram of {x_axis}",
+            "xaxis": {"title": x_axis},
+            "yaxis": {"title": "Count"},
+            "bargap": 0,
+        },
+    }
+
+
+def xy_trace(plot_type, x, y, name):
+    trace = {"x": x, "y": y, "type": "scatter", "name": name}
+    if plot_type == 'scatter':
+        trace["mode"] = "markers"
+    elif plot_type == 'bar':
+        trace["type"] = "bar"
+    elif plot_type == 'line':
+        trace["mode"] = "lines"
+    elif plot_type == 'area':
+        trace["fill"] = "tozeroy"
+        trace["mode"] = "lines"
+    return trace
+
+
+def resolve_bucket(profile, plot_type, x_axis, bucket):
+    """
+    The time bucket to resample with, or None to plot one point per row.
+    Line, area and bar plots over a datetime x-axis are bucketed automatically
+    unless ``bucket`` is 'none'.
+    """
+    is_datetime = bool(x_axis) and column_entries(profile)[x_axis]["kind"] == 'datetime'
+    if not bucket:
+        return 'auto' if is_datetime and plot_type in TIME_BUCKET_PLOT_TYPES else None
+    if bucket == 'none':
+        return None
+    if plot_type not in TIME_BUCKET_PLOT_TYPES:
+        raise PlotError("bucket is only supported for line, area and bar plots.")
+    if not is_datetime:
+        raise PlotError("bucket requires a datetime x_axis.")
+    return bucket
+
+
+def build_time_series(df, plot_type, x_axis, y_axes, bucket, agg='mean', points=DEFAULT_BUCKET_POINTS):
+    """Like build_plot, with every y-axis aggregated per time bucket of ``x_axis``."""
+    x = df[x_axis].to_numpy()
+    if bucket == 'auto':
+        bucket = auto_bucket(x, points)
+    if agg != 'count':
+        for y_axis in y_axes:
+            if not pd.api.types.is_numeric_dtype(df[y_axis]):
+                raise PlotError(f"Cannot compute the {agg} of non-numeric column {y_axis}; use agg 'count'.")
+
+    starts, results = resample(x, [df[y_axis].to_numpy() for y_axis in y_axes], bucket, agg)
+    data = [xy_trace(plot_type, starts, values, y_axis) for y_axis, values in zip(y_axes, results)]
+    layout = {
+        "title": f"{', '.join(y_axes)} vs {x_axis}",
+        "xaxis": {"title": f"{x_axis} (per {bucket})"},
+        "yaxis": {"title": f"{agg.capitalize()} of values"}
+    }
+    return {"data": data, "layout": layout}
+
+
+def correlation_heatmap(columns, matrix, method):
+    columns = np.array(columns, dtype=object)
+    return {
+        "data": [{
+            "z": matrix,
+            "x": columns,
+            "y": columns,
+            "type": "heatmap",
+            "colorscale": "RdBu",
+            "zmin": -1,
+            "zmax": 1,
+            "showscale": True
+        }],
+        "layout": {
+            "title": f"{method.capitalize()} correlation",
+            "yaxis": {"autorange": "reversed"},
+            "height": 500,
+            "width": 800
+        },
+    }
+
+
+def group_counts_from_profile(profile, column):
+    """
+    Row counts per distinct value of ``column``, sorted by value, taken from the
+    profile. Returns None unless every distinct value is in the top-values sample.
+    """
+    entry = column_entries(profile)[column]
+    if not is_fully_counted(entry):
+        return None
+    try:
+        pairs = sorted(((item["value"], item["count"]) for item in entry["top_values"]), key=lambda pair: pair[0])
+    except TypeError:
+        # Mixed-type values; let pandas decide how to group them.
+        return None
+    values = np.array([value for value, _ in pairs], dtype=object)
+    counts = np.array([count for _, count in pairs], dtype='int64')
+    return pd.Series(counts, index=pd.Index(values, name=column))
+
+
+def group_counts(df, column):
+    return df.groupby(column).size()
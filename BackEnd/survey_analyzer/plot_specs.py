@@ -0,0 +1,108 @@
+"""
+Plot specs: what an analysis stores instead of plot data.
+
+A spec is the validated body of a plot-data request (upload, plot type, axes,
+filter and bucketing options). Plot data is built from it on demand through the
+plot engine and cached per upload content and spec, so saved analyses stay
+small and the same chart is computed once.
+"""
+import hashlib
+import json
+import logging
+
+from django.conf import settings
+from django.core.cache import cache
+from monitoring.timing import phase
+
+from . import compute
+from .column_profile import column_names, get_profile
+from .datasets import content_key, load_frame
+from .filters import FilterError, parse_request_filter
+from .models import CSVUpload
+from .plot_engine import (
+    PlotError, validate_plot_request, plot_columns, plot_from_profile, build_plot,
+    resolve_bucket, build_time_series,
+)
+
+logger = logging.getLogger(__name__)
+
+SPEC_FIELDS = ['csv_upload_id', 'plot_type', 'x_axis', 'y_axes', 'filter', 'bucket', 'agg', 'points']
+
+
+def normalize_spec(spec):
+    """The spec's known fields, in a stable form for storing and cache keys."""
+    return {field: spec[field] for field in SPEC_FIELDS if spec.get(field) not in (None, '')}
+
+
+def build_spec_plot(csv_upload, spec):
+    """Plotly ``data`` and ``layout`` for ``spec``; raises PlotError or FilterError."""
+    plot_type = spec.get('plot_type')
+    x_axis = spec.get('x_axis')
+    y_axes = spec.get('y_axes', [])
+
+    profile = get_profile(csv_upload)
+    validate_plot_request(profile, plot_type, x_axis, y_axes)
+    row_filter = parse_request_filter(spec.get('filter'), column_names(profile))
+
+    bucket = resolve_bucket(profile, plot_type, x_axis, spec.get('bucket'))
+
+    # The profile describes every row, so it can't answer filtered requests.
+    plot = plot_from_profile(profile, plot_type, x_axis, y_axes) if row_filter is None else None
+    if plot is None:
+        df = load_frame(csv_upload, plot_columns(plot_type, x_axis, y_axes), row_filter)
+        with phase('compute'):
+            if bucket is not None:
+                plot = build_time_series(df, plot_type, x_axis, y_axes, bucket, spec.get('agg'), spec.get('points'))
+            else:
+                plot = build_plot(df, plot_type, x_axis, y_axes)
+    return plot
+
+
+def spec_plot(csv_upload, spec, user_id=None):
+    """
+    Like build_spec_plot, cached by upload content and spec. With ``user_id``
+    a cache miss is built in the analysis pool (survey_analyzer.compute) under
+    that user's limits.
+    """
+    spec = normalize_spec(spec)
+    spec_hash = hashlib.sha1(json.dumps(spec, sort_keys=True).encode()).hexdigest()
+    cache_key = f"plot:{content_key(csv_upload)}:{spec_hash}"
+    with phase('cache'):
+        plot = cache.get(cache_key)
+    if plot is None:
+        if user_id is None:
+            plot = build_spec_plot(csv_upload, spec)
+        else:
+            plot = compute.run(user_id, build_spec_plot, csv_upload, spec)
+        with phase('cache'):
+            cache.set(cache_key, plot, settings.PLOT_CACHE_TIMEOUT)
+    return plot
+
+
+def materialize_plots(entries, user):
+    """
+    Analysis plot entries with their ``data`` filled in. Entries that already
+    carry data (saved before specs) are returned unchanged; a spec that can no
+    longer be drawn gets ``data: None`` and an ``error``.
+    """
+    upload_ids = {entry["spec"]["csv_upload_id"] for entry in entries if entry.get("spec")}
+    uploads = CSVUpload.objects.select_related('blob').filter(id__in=upload_ids, user=user).in_bulk()
+
+    materialized = []
+    for entry in entries:
+        spec = entry.get("spec")
+        if not spec:
+            materialized.append(entry)
+            continue
+        entry = dict(entry)
+        csv_upload = uploads.get(spec["csv_upload_id"])
+        try:
+            if csv_upload is None:
+                raise PlotError("CSV file not found.")
+            entry["data"] = spec_plot(csv_upload, spec)
+        except (PlotError, FilterError) as e:
+            logger.info(f"Plot spec can't be drawn: {str(e)}")
+            entry["data"] = None
+            entry["error"] = str(e)
+        materialized.append(entry)
+    return materialized
@@ -0,0 +1,92 @@
+"""
+Compressed storage of analysis plots as Plot rows.
+
+Each Plot row holds one entry of an analysis: its title and description as
+columns, and its content ({"spec": ...}, or {"data": ...} for plots saved
+before specs) as compressed JSON in ``payload``. ``codec`` records how the
+payload was compressed, so rows written with zstd and zlib can coexist.
+"""
+import zlib
+
+import orjson
+
+from .models import Plot
+from .renderers import _default
+
+try:
+    import zstandard
+except ImportError:  # pragma: no cover - zstandard is optional
+    zstandard = None
+
+ZSTD_LEVEL = 3
+ZLIB_LEVEL = 6
+
+
+def encode_payload(content):
+    """Return ``(codec, payload)`` for a JSON-serialisable plot content dict."""
+    raw = orjson.dumps(content, default=_default, option=orjson.OPT_SERIALIZE_NUMPY | orjson.OPT_NON_STR_KEYS)
+    if zstandard is not None:
+        return 'zstd', zstandard.ZstdCompressor(level=ZSTD_LEVEL).compress(raw)
+    return 'zlib', zlib.compress(raw, ZLIB_LEVEL)
+
+
+def decode_payload(codec, payload):
+    payload = bytes(payload)
+    if codec == 'zstd':
+        if zstandard is None:
+            raise RuntimeError("This plot was stored with zstd, which is not installed.")
+        raw = zstandard.ZstdDecompressor().decompress(payload)
+    elif codec == 'zlib':
+        raw = zlib.decompress(payload)
+    else:
+        raw = payload
+    return orjson.loads(raw)
+
+
+def plot_type(entry):
+    if entry.get('spec'):
+        return entry['spec'].get('plot_type', '')
+    traces = (entry.get('data') or {}).get('data') or []
+    return traces[0].get('type', '') if traces and isinstance(traces[0], dict) else ''
+
+
+def build_plot_row(analysis, position, entry):
+    """An unsaved Plot for a validated entry (title, description and spec or data)."""
+    content = {key: entry[key] for key in ('spec', 'data') if entry.get(key) is not None}
+    codec, payload = encode_payload(content)
+    return Plot(
+        analysis=analysis,
+        position=position,
+        title=entry.get('title') or 'Untitled Plot',
+        description=entry.get('description') or '',
+        type=plot_type(entry),
+        codec=codec,
+        payload=payload,
+    )
+
+
+def update_plot_row(plot, entry):
+    """Apply a validated entry to an existing Plot, rewriting only that row."""
+    updated = build_plot_row(plot.analysis, plot.position, entry)
+    for field in ('title', 'description', 'type', 'codec', 'payload'):
+        setattr(plot, field, getattr(updated, field))
+    plot.save(update_fields=['title', 'description', 'type', 'codec', 'payload'])
+    return plot
+
+
+def replace_plots(analysis, entries):
+    """Replace all of an analysis' plots with ``entries``."""
+    analysis.related_plots.all().delete()
+    Plot.objects.bulk_create(build_plot_row(analysis, position, entry) for position, entry in enumerate(entries))
+
+
+def plot_entry(plot):
+    """The API representation of a Plot row: its entry plus id and position."""
+    entry = {
+        "id": plot.id,
+        "position": plot.position,
+        "title": plot.title,
+        "description": plot.description,
+    }
+    entry.update(decode_payload(plot.codec, plot.payload))
+    return entry
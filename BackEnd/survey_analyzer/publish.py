@@ -0,0 +1,135 @@
+"""
+PDF reports of saved analyses.
+
+``write_analysis_pdf`` runs in the analysis pool (survey_analyzer.compute): it
+receives ids rather than model instances and writes into a file the request
+already holds, so nothing is left behind if the request gives up on it. The
+report itself is laid out by ``build_analysis_pdf``, which needs no database.
+
+ReportLab (and pdf_charts, which draws with it) is imported on the first PDF
+rather than with the URLconf; the chart options PublishSerializer validates
+live here for that reason.
+"""
+import logging
+
+from monitoring.timing import phase
+
+from .models import Analysis
+from .plot_specs import materialize_plots
+from .plot_storage import plot_entry
+
+logger = logging.getLogger(__name__)
+
+PUBLISH_MODES = ['vector', 'raster']
+# PDFs embed JPEG as is; other codecs (WebP, ...) would be stored as raw pixels.
+IMAGE_FORMATS = ['png', 'jpeg']
+DEFAULT_DPI = 200
+DEFAULT_QUALITY = 85
+
+
+def write_analysis_pdf(path, analysis_id, user_id, options):
+    """
+    Write the PDF of ``user_id``'s analysis to the existing file ``path``.
+    ``options`` are PublishSerializer's validated chart options.
+    """
+    analysis = Analysis.objects.get(id=analysis_id, user_id=user_id)
+    logger.info(f"Found analysis: {analysis.title}")
+
+    with phase('plots'):
+        plots = materialize_plots([plot_entry(plot) for plot in analysis.related_plots.all()], user_id)
+
+    # Opened without creating: if the request has already given up and removed
+    # the file, there is nothing to write.
+    with open(path, 'r+b') as output:
+        build_analysis_pdf(output, analysis, plots, options)
+
+
+def build_analysis_pdf(output, analysis, plots, options):
+    """
+    Write the report of ``analysis`` (anything with its title, author_name,
+    date and description) to the file object ``output``. ``plots`` are
+    materialized plot entries; nothing here touches the database.
+    """
+    from reportlab.lib.pagesizes import letter
+    from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
+    from reportlab.lib.units import inch
+    from reportlab.platypus import SimpleDocTemplate, Paragraph, Spacer
+
+    from .pdf_charts import chart_flowable
+
+    doc = SimpleDocTemplate(
+        output,
+        pagesize=letter,
+        rightMargin=72,
+        leftMargin=72,
+        topMargin=72,
+        bottomMargin=72
+    )
+
+    # Create styles
+    styles = getSampleStyleSheet()
+    title_style = ParagraphStyle(
+        'CustomTitle',
+        parent=styles['Heading1'],
+        fontSize=24,
+        spaceAfter=30
+    )
+    heading_style = ParagraphStyle(
+        'CustomHeading',
+        parent=styles['Heading2'],
+        fontSize=18,
+        spaceAfter=20
+    )
+    normal_style = styles['Normal']
+
+    # Create story (content) for the PDF
+    story = []
+
+    # Add title
+    story.append(Paragraph(analysis.title, title_style))
+    story.append(Spacer(1, 12))
+
+    # Add author and date
+    story.append(Paragraph(f"<b>Author:</b> {analysis.author_name}", normal_style))
+    story.append(Paragraph(f"<b>Date:</b> {analysis.date}", normal_style))
+    story.append(Spacer(1, 12))
+
+    # Add description
+    if analysis.description:
+        story.append(Paragraph(analysis.description, normal_style))
+        story.append(Spacer(1, 24))
+
+    # Add plots
+    story.append(Paragraph("Plots", heading_style))
+    story.append(Spacer(1, 12))
+
+    logger.info(f"Processing {len(plots)} plots")
+    for i, plot in enumerate(plots):
+        try:
+            logger.info(f"Processing plot {i+1}")
+            if plot.get('data'):
+                # Drawn as vector graphics where possible, else as a kaleido PNG.
+                chart = chart_flowable(
+                    plot['data'], 6*inch, 4*inch,
+                    mode=options['mode'],
+                    dpi=options['dpi'],
+                    image_format=options['image_format'],
+                    quality=options['quality'],
+                )
+
+                # Add plot title and description
+                story.append(Paragraph(plot.get('title', 'Untitled Plot'), styles['Heading3']))
+                if plot.get('description'):
+                    story.append(Paragraph(plot.get('description'), normal_style))
+
+                logger.info("Adding chart to PDF")
+                story.append(chart)
+                story.append(Spacer(1, 24))
+        except Exception as e:
+            logger.error(f"Error processing plot {i+1}: {str(e)}")
+            raise
+
+    # Build the PDF
+    logger.info("Building PDF")
+    with phase('pdf_build'):
+        doc.build(story)
@@ -0,0 +1,180 @@
+import base64
+import datetime
+import decimal
+import sys
+import uuid
+
+import orjson
+from django.utils.functional import Promise
+from rest_framework.renderers import JSONRenderer
+
+from monitoring.timing import phase
+
+
+# This is the project's default renderer, so DRF imports it in every worker.
+# NumPy and pandas are not imported here: a value can only be one of their types
+# once something else has imported them, so the checks look them up in
+# sys.modules and survey-only workers never load either.
+
+def _datetime_strings(values, np):
+    """ISO 8601 strings of a datetime64 array, with None for NaT."""
+    strings = np.datetime_as_string(values).astype(object)
+    strings[np.isnat(values)] = None
+    return strings.tolist()
+
+
+def _pandas_default(obj, pd):
+    if isinstance(obj, (pd.Series, pd.Index)):
+        return obj.to_numpy()
+    if isinstance(obj, pd.DataFrame):
+        return {str(column): obj[column].to_numpy() for column in obj.columns}
+    if obj is pd.NaT or obj is pd.NA:
+        return None
+    if isinstance(obj, pd.Timestamp):
+        return obj.isoformat()
+    if isinstance(obj, pd.Timedelta):
+        return obj.total_seconds()
+    return obj
+
+
+def _default(obj):
+    """Fallback for values orjson cannot serialize on its own."""
+    pd = sys.modules.get('pandas')
+    if pd is not None:
+        converted = _pandas_default(obj, pd)
+        if converted is not obj:
+            return converted
+    np = sys.modules.get('numpy')
+    if np is not None:
+        if isinstance(obj, np.ndarray):
+            if obj.dtype.kind == 'M':
+                return _datetime_strings(obj, np)
+            # Object, string and non-contiguous arrays are not handled natively.
+            return obj.tolist()
+        if isinstance(obj, np.generic):
+            return obj.item()
+    if isinstance(obj, datetime.timedelta):
+        return obj.total_seconds()
+    if isinstance(obj, decimal.Decimal):
+        return float(obj)
+    if isinstance(obj, Promise):
+        return str(obj)
+    if isinstance(obj, (set, frozenset, tuple)):
+        return list(obj)
+    if isinstance(obj, uuid.UUID):
+        return str(obj)
+    if hasattr(obj, 'tolist'):
+        return obj.tolist()
+    raise TypeError(f"Object of type {type(obj).__name__} is not JSON serializable")
+
+
+class NumpyJSONRenderer(JSONRenderer):
+    """
+    JSONRenderer backed by orjson.
+
+    NumPy arrays, scalars, pandas Series/Index and datetimes are written straight
+    from their buffers, so views can return columns without calling ``tolist()``.
+    NaN and infinity are emitted as ``null``.
+    """
+    options = orjson.OPT_SERIALIZE_NUMPY | orjson.OPT_NON_STR_KEYS
+    default = staticmethod(_default)
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b''
+
+        options = self.options
+        renderer_context = renderer_context or {}
+        if self.get_indent(accepted_media_type, renderer_context):
+            options |= orjson.OPT_INDENT_2
+
+        with phase('serialize'):
+            try:
+                return orjson.dumps(data, default=self.default, option=options)
+            except orjson.JSONEncodeError:
+                # orjson refuses datetime64 arrays holding NaT; without
+                # OPT_SERIALIZE_NUMPY every array goes through default instead.
+                if not options & orjson.OPT_SERIALIZE_NUMPY:
+                    raise
+                return orjson.dumps(data, default=self.default, option=options & ~orjson.OPT_SERIALIZE_NUMPY)
+
+
+# Plotly.js (>= 2.28) decodes {"dtype", "bdata", "shape"} objects into typed arrays.
+# It has no 64-bit integer arrays, so those are narrowed to 32 bits when the values
+# fit and sent as float64 otherwise.
+TYPED_ARRAY_DTYPES = {
+    'i1': 'i1', 'u1': 'u1', 'i2': 'i2', 'u2': 'u2', 'i4': 'i4', 'u4': 'u4',
+    'f4': 'f4', 'f8': 'f8', 'b1': 'u1', 'f2': 'f4',
+}
+
+
+def _typed_array_dtype(values):
+    import numpy as np
+
+    code = f"{values.dtype.kind}{values.dtype.itemsize}"
+    if code in TYPED_ARRAY_DTYPES:
+        return TYPED_ARRAY_DTYPES[code]
+    if values.dtype.kind in 'iu' and values.size:
+        info = np.iinfo('i4' if values.dtype.kind == 'i' else 'u4')
+        if info.min <= values.min() and values.max() <= info.max:
+            return 'i4' if values.dtype.kind == 'i' else 'u4'
+    elif values.dtype.kind in 'iu':
+        return 'i4'
+    return 'f8'
+
+
+def encode_typed_array(values):
+    """Encode a numeric array as a Plotly typed-array spec (little-endian, base64)."""
+    import numpy as np
+
+    dtype = _typed_array_dtype(values)
+    buffer = np.ascontiguousarray(values, dtype=np.dtype(dtype).newbyteorder('<'))
+    spec = {"dtype": dtype, "bdata": base64.b64encode(buffer.data).decode('ascii')}
+    if buffer.ndim > 1:
+        spec["shape"] = ','.join(str(n) for n in buffer.shape)
+    return spec
+
+
+def decode_typed_arrays(obj):
+    """Inverse of the typed-array encoding, for consumers such as plotly.py and kaleido."""
+    if isinstance(obj, dict):
+        if 'bdata' in obj and 'dtype' in obj:
+            import numpy as np
+
+            values = np.frombuffer(base64.b64decode(obj['bdata']), dtype=np.dtype(obj['dtype']).newbyteorder('<'))
+            if obj.get('shape'):
+                values = values.reshape([int(n) for n in str(obj['shape']).split(',')])
+            return values.tolist()
+        return {key: decode_typed_arrays(value) for key, value in obj.items()}
+    if isinstance(obj, list):
+        return [decode_typed_arrays(value) for value in obj]
+    return obj
+
+
+def _typed_default(obj):
+    pd = sys.modules.get('pandas')
+    if pd is not None and isinstance(obj, (pd.Series, pd.Index)):
+        obj = obj.to_numpy()
+    np = sys.modules.get('numpy')
+    if np is not None and isinstance(obj, np.ndarray):
+        if obj.dtype.kind in 'biuf':
+            return encode_typed_array(obj)
+        if obj.dtype.kind == 'M':
+            return _datetime_strings(obj, np)
+        return obj.tolist()
+    return _default(obj)
+
+
+class TypedArrayJSONRenderer(NumpyJSONRenderer):
+    """
+    Opt-in variant of NumpyJSONRenderer that ships numeric arrays as base64
+    little-endian buffers instead of JSON number lists.
+
+    Selected with ``Accept: application/vnd.jigyasa.typed+json``, ``?format=typed``
+    or, on PlotDataView, ``"encoding": "typed"`` in the request body.
+    """
+    media_type = 'application/vnd.jigyasa.typed+json'
+    format = 'typed'
+    # Without OPT_SERIALIZE_NUMPY every array reaches _typed_default.
+    options = orjson.OPT_NON_STR_KEYS
+    default = staticmethod(_typed_default)
@@ -0,0 +1,109 @@
+"""
+Time bucketing for plots with a datetime x-axis.
+
+Timestamps are floored to a bucket with NumPy datetime64 arithmetic and every
+y-axis is aggregated with ``np.bincount`` over the bucket numbers, so a column
+of any length is reduced in a single vectorised pass per y-axis.
+"""
+import numpy as np
+import pandas as pd
+
+BUCKETS = ['minute', 'hour', 'day', 'week', 'month']
+AGGREGATIONS = ['count', 'sum', 'mean']
+
+# Approximate bucket widths, used only to pick a bucket automatically.
+BUCKET_SECONDS = {
+    'minute': 60,
+    'hour': 3600,
+    'day': 86400,
+    'week': 7 * 86400,
+    'month': 30.436875 * 86400,
+}
+
+# Above this many buckets between the first and last timestamp, bucket numbers
+# are compacted with np.unique instead of counted densely.
+DENSE_BUCKET_LIMIT = 1_000_000
+
+# 1970-01-01 was a Thursday; weeks start on Monday.
+_WEEK_OFFSET_DAYS = 3
+
+
+def auto_bucket(values, points):
+    """The finest bucket that keeps the span of ``values`` within ``points`` buckets."""
+    valid = values[~np.isnat(values)]
+    if not len(valid):
+        return 'day'
+    span = (valid.max() - valid.min()) / np.timedelta64(1, 's')
+    for bucket in BUCKETS:
+        if span / BUCKET_SECONDS[bucket] <= points:
+            return bucket
+    return 'month'
+
+
+def bucket_numbers(values, bucket):
+    """Integer bucket number per timestamp, and a function mapping numbers back to bucket starts."""
+    if bucket == 'minute':
+        unit = 'm'
+    elif bucket == 'hour':
+        unit = 'h'
+    elif bucket in ('day', 'week'):
+        unit = 'D'
+    else:
+        unit = 'M'
+    numbers = values.astype(f'datetime64[{unit}]').view('int64')
+    if bucket == 'week':
+        numbers = (numbers + _WEEK_OFFSET_DAYS) // 7
+
+        def starts(n):
+            return (n * 7 - _WEEK_OFFSET_DAYS).astype('datetime64[D]').astype('datetime64[ns]')
+    else:
+        def starts(n):
+            return n.astype(f'datetime64[{unit}]').astype('datetime64[ns]')
+    return numbers, starts
+
+
+def resample(x, ys, bucket, agg):
+    """
+    Aggregate each array in ``ys`` per ``bucket`` of the timestamps ``x``.
+
+    Returns ``(starts, results)``: the start of every non-empty bucket in
+    ascending order and one aggregated array per y-axis. ``count`` counts
+    non-missing values.
+    """
+    x = np.asarray(x, dtype='datetime64[ns]')
+    present = ~np.isnat(x)
+    numbers, starts = bucket_numbers(x[present], bucket)
+    if not len(numbers):
+        return np.array([], dtype='datetime64[ns]'), [np.array([], dtype='float64') for _ in ys]
+
+    low = numbers.min()
+    span = int(numbers.max() - low) + 1
+    if span <= DENSE_BUCKET_LIMIT:
+        index = numbers - low
+        keys = None
+    else:
+        keys, index = np.unique(numbers, return_inverse=True)
+        span = len(keys)
+
+    rows = np.bincount(index, minlength=span)
+    occupied = rows > 0
+    bucket_keys = np.flatnonzero(occupied) + low if keys is None else keys
+
+    results = []
+    for y in ys:
+        y = np.asarray(y)[present]
+        if agg == 'count':
+            valid = ~pd.isna(y)
+            counts = np.bincount(index[valid], minlength=span)
+            results.append(counts[occupied])
+            continue
+        y = y.astype('float64')
+        valid = ~np.isnan(y)
+        sums = np.bincount(index[valid], weights=y[valid], minlength=span)
+        if agg == 'sum':
+            results.append(sums[occupied])
+        else:
+            counts = np.bincount(index[valid], minlength=span)
+            with np.errstate(invalid='ignore', divide='ignore'):
+                results.append((sums / counts)[occupied])
+    return starts(bucket_keys), results
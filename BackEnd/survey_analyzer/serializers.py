@@ -1,23 +1,155 @@
+from django.db import transaction
 from rest_framework import serializers
-from .models import CSVUpload, Analysis
+from .models import CSVUpload, Analysis, Plot, UploadSession
+from .plot_engine import DEFAULT_BUCKET_POINTS
+from .plot_specs import normalize_spec
+from .plot_storage import build_plot_row, plot_entry, replace_plots
+from .publish import DEFAULT_DPI, DEFAULT_QUALITY, IMAGE_FORMATS, PUBLISH_MODES
+from .resample import AGGREGATIONS, BUCKETS
+from .stats import CORRELATION_METHODS
 
 
 class CSVUploadSerializer(serializers.ModelSerializer):
     class Meta:
         model = CSVUpload
-        fields = ['id', 'user', 'file', 'uploaded_at']
-        read_only_fields = ['id', 'user', 'uploaded_at']
+        fields = ['id', 'user', 'file', 'original_filename', 'uploaded_at', 'profile']
+        read_only_fields = ['id', 'user', 'original_filename', 'uploaded_at', 'profile']
+
+    def get_fields(self):
+        fields = super().get_fields()
+        if self.instance is not None:
+            # The content is set once at upload (and may be shared through its
+            # blob); new content is a new upload.
+            fields['file'].read_only = True
+        return fields
+
+
+class UploadSessionSerializer(serializers.ModelSerializer):
+    complete = serializers.BooleanField(source='is_complete', read_only=True)
+
+    class Meta:
+        model = UploadSession
+        fields = ['id', 'filename', 'total_size', 'offset', 'sha256', 'complete', 'csv_upload', 'created_at']
+        read_only_fields = ['id', 'offset', 'complete', 'csv_upload', 'created_at']
+
+    def validate_total_size(self, value):
+        if value <= 0:
+            raise serializers.ValidationError("total_size must be positive.")
+        return value
+
+    def validate_sha256(self, value):
+        value = value.lower()
+        if value and (len(value) != 64 or any(c not in '0123456789abcdef' for c in value)):
+            raise serializers.ValidationError("sha256 must be a hex digest.")
+        return value
+
+
+class PlotSpecSerializer(serializers.Serializer):
+    plot_type = serializers.ChoiceField(choices=['scatter', 'bar', 'line', 'pie', 'histogram', 'heatmap', 'box', 'area'])
+    x_axis = serializers.CharField(required=False, allow_blank=True)
+    y_axes = serializers.ListField(child=serializers.CharField(), required=False)
+    csv_upload_id = serializers.IntegerField()
+    filter = serializers.CharField(required=False, allow_blank=True, max_length=2000)
+    bucket = serializers.ChoiceField(choices=['none', 'auto'] + BUCKETS, required=False)
+    agg = serializers.ChoiceField(choices=AGGREGATIONS, required=False, default='mean')
+    points = serializers.IntegerField(required=False, min_value=1, max_value=10000, default=DEFAULT_BUCKET_POINTS)
+
+
+class PlotDataSerializer(PlotSpecSerializer):
+    encoding = serializers.ChoiceField(choices=['json', 'typed'], required=False, default='json')
+
+
+class PlotSerializer(serializers.Serializer):
+    id = serializers.IntegerField(read_only=True)
+    position = serializers.IntegerField(read_only=True)
+    title = serializers.CharField(required=False, allow_blank=True, max_length=255)
+    description = serializers.CharField(required=False, allow_blank=True, allow_null=True)
+    spec = PlotSpecSerializer(required=False, allow_null=True)
+    # Analyses saved before plot specs carry their data inline.
+    data = serializers.JSONField(required=False, allow_null=True)
+
+    def validate(self, attrs):
+        entry = {
+            "title": attrs.get('title') or 'Untitled Plot',
+            "description": attrs.get('description') or '',
+        }
+        if attrs.get('spec'):
+            entry["spec"] = normalize_spec(attrs['spec'])
+        elif attrs.get('data') is not None:
+            entry["data"] = attrs['data']
+        return entry
+
+    def to_representation(self, plot):
+        return plot_entry(plot)
 
 
 class AnalysisSerializer(serializers.ModelSerializer):
+    plots = PlotSerializer(many=True, required=False, source='related_plots')
+
     class Meta:
         model = Analysis
         fields = ['id', 'user', 'title', 'author_name', 'date', 'description', 'plots']
         read_only_fields = ['id', 'user', 'date']
 
+    @transaction.atomic
+    def create(self, validated_data):
+        plots = validated_data.pop('related_plots', [])
+        analysis = super().create(validated_data)
+        Plot.objects.bulk_create(build_plot_row(analysis, position, entry) for position, entry in enumerate(plots))
+        return analysis
 
-class PlotDataSerializer(serializers.Serializer):
-    plot_type = serializers.ChoiceField(choices=['scatter', 'bar', 'line', 'pie', 'histogram', 'heatmap', 'box', 'area'])
-    x_axis = serializers.CharField(required=False, allow_blank=True)
-    y_axes = serializers.ListField(child=serializers.CharField(), required=False)
-    csv_upload_id = serializers.IntegerField()
\ No newline at end of file
+    @transaction.atomic
+    def update(self, instance, validated_data):
+        plots = validated_data.pop('related_plots', None)
+        analysis = super().update(instance, validated_data)
+        if plots is not None:
+            replace_plots(analysis, plots)
+        return analysis
+
+
+class AnalysisSummarySerializer(serializers.ModelSerializer):
+    plot_count = serializers.IntegerField(read_only=True)
+
+    class Meta:
+        model = Analysis
+        fields = ['id', 'user', 'title', 'author_name', 'date', 'description', 'plot_count']
+        read_only_fields = fields
+
+
+class CorrelationSerializer(serializers.Serializer):
+    csv_upload_id = serializers.IntegerField()
+    columns = serializers.ListField(child=serializers.CharField(), min_length=2, max_length=200)
+    method = serializers.ChoiceField(choices=CORRELATION_METHODS, required=False, default='pearson')
+    filter = serializers.CharField(required=False, allow_blank=True, max_length=2000)
+
+
+class AssociationSerializer(serializers.Serializer):
+    survey_id = serializers.IntegerField(required=False)
+    csv_upload_id = serializers.IntegerField(required=False)
+    columns = serializers.ListField(child=serializers.CharField(), required=False, max_length=200)
+    filter = serializers.CharField(required=False, allow_blank=True, max_length=2000)
+    limit = serializers.IntegerField(required=False, min_value=1)
+
+    def validate(self, data):
+        if ('survey_id' in data) == ('csv_upload_id' in data):
+            raise serializers.ValidationError("Provide either survey_id or csv_upload_id.")
+        return data
+
+
+class DrilldownSerializer(serializers.Serializer):
+    survey_id = serializers.IntegerField()
+    # Groups of choice ids: a response matches when it picked at least one
+    # choice of every group.
+    filters = serializers.ListField(
+        child=serializers.ListField(child=serializers.IntegerField(), min_length=1, max_length=200),
+        required=False, default=list, max_length=50,
+    )
+    questions = serializers.ListField(child=serializers.IntegerField(), required=False, max_length=200)
+
+
+class PublishSerializer(serializers.Serializer):
+    analysis_id = serializers.IntegerField()
+    mode = serializers.ChoiceField(choices=PUBLISH_MODES, required=False, default='vector')
+    image_format = serializers.ChoiceField(choices=IMAGE_FORMATS, required=False, default='png')
+    dpi = serializers.IntegerField(required=False, min_value=72, max_value=600, default=DEFAULT_DPI)
+    quality = serializers.IntegerField(required=False, min_value=1, max_value=100, default=DEFAULT_QUALITY)
@@ -0,0 +1,20 @@
+"""
+Delete stored CSV content once the last upload pointing at it is deleted
+(see storage.release_blob); manage.py collect_blobs sweeps any left over.
+"""
+from functools import partial
+
+from django.db import transaction
+from django.db.models.signals import post_delete
+from django.dispatch import receiver
+
+from .models import CSVUpload
+from .storage import release_blob
+
+
+@receiver(post_delete, sender=CSVUpload)
+def upload_deleted(sender, instance, **kwargs):
+    # After commit: until then the delete may still roll back, and files are
+    # not transactional.
+    if instance.blob_id is not None:
+        transaction.on_commit(partial(release_blob, instance.blob_id))
@@ -0,0 +1,84 @@
+"""
+Pairwise statistics over upload columns.
+
+Correlations for all column pairs come from a handful of matrix products over
+the whole data block (BLAS ``gemm``), with missing values handled pairwise by a
+0/1 mask matrix: every pair uses exactly the rows where both columns are present.
+"""
+import numpy as np
+import pandas as pd
+
+from monitoring.timing import phase
+
+from .datasets import load_frame
+
+CORRELATION_METHODS = ['pearson', 'spearman']
+
+
+def pairwise_pearson(X):
+    """
+    Pearson correlation of every pair of columns of the 2-D float array ``X``.
+
+    Returns ``(r, n)``: the k x k correlation matrix (NaN where a pair has fewer
+    than two shared rows or no variance) and the shared-row count per pair.
+    """
+    X = np.asarray(X, dtype='float64')
+    present = ~np.isnan(X)
+    mask = present.astype('float64')
+    # Centering on each column's mean keeps the sums of squares well conditioned.
+    means = np.nansum(X, axis=0) / np.maximum(present.sum(axis=0), 1)
+    centred = np.where(present, X - means, 0.0)
+
+    n = mask.T @ mask                    # rows where both i and j are present
+    sums = centred.T @ mask              # sum of column i over rows where j is present
+    squares = (centred * centred).T @ mask
+    products = centred.T @ centred
+
+    with np.errstate(invalid='ignore', divide='ignore'):
+        covariance = products - sums * sums.T / n
+        variance_i = squares - sums * sums / n
+        variance_j = variance_i.T
+        r = covariance / np.sqrt(variance_i * variance_j)
+    r[(n < 2) | ~np.isfinite(r)] = np.nan
+    np.clip(r, -1.0, 1.0, out=r)
+    return r, n.astype('int64')
+
+
+def correlation_matrix(frame, method='pearson'):
+    """
+    Correlation matrix, shared-row counts and two-sided p-values for the
+    columns of ``frame``.
+
+    Spearman ranks each column once over its present values and correlates the
+    ranks; with missing values this differs slightly from re-ranking every pair
+    on its shared rows, in exchange for a single matrix product.
+    """
+    if method == 'spearman':
+        values = frame.rank(method='average').to_numpy(dtype='float64')
+    else:
+        values = frame.to_numpy(dtype='float64')
+    r, n = pairwise_pearson(values)
+    # Imported here: SciPy is the largest import in the analysis stack and only
+    # the p-values need it.
+    from scipy import stats as scipy_stats
+
+    degrees = (n - 2).astype('float64')
+    with np.errstate(invalid='ignore', divide='ignore'):
+        t = r * np.sqrt(degrees / ((1.0 - r) * (1.0 + r)))
+        p = 2 * scipy_stats.t.sf(np.abs(t), degrees)
+    p[np.isnan(r) | (degrees <= 0)] = np.nan
+    # Perfect correlation gives an infinite t statistic.
+    p[np.isfinite(r) & (np.abs(r) == 1.0) & (degrees > 0)] = 0.0
+    return r, n, p
+
+
+def numeric_frame(df, columns):
+    """The selected columns as floats; booleans become 0/1."""
+    return pd.DataFrame({column: df[column].astype('float64') for column in columns})
+
+
+def upload_correlation(csv_upload, columns, row_filter, method):
+    """correlation_matrix of an upload's ``columns`` over the rows matching ``row_filter``; run in the analysis pool."""
+    df = load_frame(csv_upload, columns, row_filter)
+    with phase('compute'):
+        return correlation_matrix(numeric_frame(df, columns), method)
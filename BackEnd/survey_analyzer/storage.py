@@ -0,0 +1,116 @@
+import hashlib
+import logging
+import os
+
+from django.core.files import File
+from django.core.files.storage import default_storage
+from django.db import IntegrityError, transaction
+from django.db.models import ProtectedError
+
+from .models import CSVBlob, blob_upload_to
+
+logger = logging.getLogger(__name__)
+
+HASH_BLOCK_SIZE = 1024 * 1024
+
+
+def hash_chunks(chunks):
+    """SHA-256 of an iterable of byte chunks, without holding more than one chunk."""
+    digest = hashlib.sha256()
+    size = 0
+    for chunk in chunks:
+        digest.update(chunk)
+        size += len(chunk)
+    return digest.hexdigest(), size
+
+
+def read_blocks(fileobj, block_size=HASH_BLOCK_SIZE):
+    while True:
+        block = fileobj.read(block_size)
+        if not block:
+            return
+        yield block
+
+
+def hash_path(path):
+    with open(path, 'rb') as fileobj:
+        return hash_chunks(read_blocks(fileobj))
+
+
+def find_blob(sha256):
+    return CSVBlob.objects.filter(sha256=sha256).first()
+
+
+def store_blob(sha256, size, fileobj):
+    """
+    Return the blob for ``sha256``, storing ``fileobj`` only if the content is new.
+
+    Identical content uploaded again (by anyone) shares the stored file, profile
+    and parse sidecar of the first copy.
+    """
+    blob = find_blob(sha256)
+    if blob is not None:
+        logger.info(f"Reusing stored content {sha256}")
+        return blob, False
+
+    blob = CSVBlob(sha256=sha256, size=size)
+    blob.file.save(f"{sha256}.csv", File(fileobj), save=False)
+    try:
+        with transaction.atomic():
+            blob.save()
+    except IntegrityError:
+        # Another request stored the same content first; keep theirs.
+        default_storage.delete(blob.file.name)
+        return CSVBlob.objects.get(sha256=sha256), False
+    return blob, True
+
+
+def store_blob_from_path(sha256, size, path):
+    """
+    Like store_blob, for a finished temporary file on the same storage. New
+    content is moved into place rather than copied; the temporary file is gone
+    afterwards either way.
+    """
+    blob = find_blob(sha256)
+    if blob is not None:
+        os.remove(path)
+        logger.info(f"Reusing stored content {sha256}")
+        return blob, False
+
+    blob = CSVBlob(sha256=sha256, size=size)
+    name = default_storage.get_available_name(blob_upload_to(blob, f"{sha256}.csv"))
+    target = default_storage.path(name)
+    os.makedirs(os.path.dirname(target), exist_ok=True)
+    os.replace(path, target)
+    blob.file.name = name
+    try:
+        with transaction.atomic():
+            blob.save()
+    except IntegrityError:
+        default_storage.delete(name)
+        return CSVBlob.objects.get(sha256=sha256), False
+    return blob, True
+
+
+def release_blob(blob_id):
+    """
+    Delete a blob no upload points at any more, with its file and its column
+    store dataset; False if it is still in use (or already gone).
+    """
+    # Imported here: signals imports this module at startup, and the column
+    # store brings in NumPy and pandas, which survey-only workers never load.
+    from . import column_store
+
+    blob = CSVBlob.objects.filter(id=blob_id, uploads__isnull=True).first()
+    if blob is None:
+        return False
+    try:
+        with transaction.atomic():
+            blob.delete()
+    except (ProtectedError, IntegrityError):
+        # An upload of the same content came in meanwhile; PROTECT keeps the blob.
+        return False
+    default_storage.delete(blob.file.name)
+    column_store.remove(blob.sha256)
+    logger.info(f"Deleted unused content {blob.sha256}")
+    return True
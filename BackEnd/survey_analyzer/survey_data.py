@@ -0,0 +1,90 @@
+"""
+Survey answers as integer-coded columns, for the statistics in this app.
+
+Choice answers are read with one query on the Answer <-> Choice through table,
+plus one over the packed answer documents (jigyasa.answer_storage), and
+scattered into code arrays with NumPy. Single-choice questions become one
+column coded by choice; multiple-choice questions become one selected /
+not-selected column per choice.
+"""
+import numpy as np
+
+from jigyasa.answer_storage import packed_selections
+from jigyasa.models import Answer, Question
+
+CHOICE_QUESTION_TYPES = ['single_choice', 'multiple_choice']
+SELECTION_LABELS = ['Not selected', 'Selected']
+
+
+def survey_choice_columns(survey):
+    """
+    Return ``(names, labels, codes)``: a name and category labels per column,
+    and a k x n int32 matrix of codes (-1 where the respondent did not answer),
+    one row per column and one column per response with a choice answer.
+    """
+    questions = list(
+        Question.objects.filter(survey=survey, question_type__in=CHOICE_QUESTION_TYPES)
+        .prefetch_related('choice_set')
+        .order_by('id')
+    )
+    selections = np.array(
+        Answer.selected_choices.through.objects.filter(
+            answer__response__survey=survey,
+            answer__question__question_type__in=CHOICE_QUESTION_TYPES,
+        ).values_list('answer__response_id', 'choice_id'),
+        dtype=np.int64,
+    ).reshape(-1, 2)
+    packed = packed_selections(survey)
+    if packed:
+        selections = np.concatenate([selections, np.array(packed, dtype=np.int64)])
+
+    names = []
+    labels = []
+    # Per choice id: the column it lands in and the code it writes there, plus
+    # the multiple-choice question (if any) whose columns it marks as answered.
+    choice_ids = []
+    choice_columns = []
+    choice_codes = []
+    choice_spans = []
+    spans = []
+    for question in questions:
+        choices = list(question.choice_set.all())
+        if question.question_type == 'single_choice':
+            column = len(names)
+            names.append(question.text)
+            labels.append([choice.text for choice in choices])
+            for code, choice in enumerate(choices):
+                choice_ids.append(choice.id)
+                choice_columns.append(column)
+                choice_codes.append(code)
+                choice_spans.append(-1)
+        else:
+            first = len(names)
+            spans.append((first, len(choices)))
+            for offset, choice in enumerate(choices):
+                names.append(f"{question.text}: {choice.text}")
+                labels.append(SELECTION_LABELS)
+                choice_ids.append(choice.id)
+                choice_columns.append(first + offset)
+                choice_codes.append(1)
+                choice_spans.append(len(spans) - 1)
+
+    responses, rows = np.unique(selections[:, 0], return_inverse=True)
+    codes = np.full((len(names), len(responses)), -1, dtype=np.int32)
+    if not len(selections) or not choice_ids:
+        return names, labels, codes
+
+    order = np.argsort(choice_ids)
+    sorted_ids = np.asarray(choice_ids, dtype=np.int64)[order]
+    position = np.minimum(np.searchsorted(sorted_ids, selections[:, 1]), len(sorted_ids) - 1)
+    known = sorted_ids[position] == selections[:, 1]
+    index = order[position[known]]
+    rows = rows[known]
+
+    # A respondent who picked any choice of a multiple-choice question answered
+    # it, so all of its columns start at "not selected" for them.
+    selection_spans = np.asarray(choice_spans)[index]
+    for span, (first, count) in enumerate(spans):
+        codes[first:first + count, np.unique(rows[selection_spans == span])] = 0
+    codes[np.asarray(choice_columns)[index], rows] = np.asarray(choice_codes, dtype=np.int32)[index]
+    return names, labels, codes
@@ -1,3 +1,963 @@
-from django.test import TestCase
+"""
+Query and wall-time budgets for every route in survey_analyzer/urls.py, on
+data from seed_benchmark: a 20,000-row, 24-column CSV upload and a survey with
+2,000 responses. Then behaviour tests of uploads, the column store, drill-down
+indexes, compute admission and the kernels behind those routes, on data of
+their own.
 
-# Create your tests here.
+Analysis work runs on the request thread here (ANALYSIS_COMPUTE WORKERS 0),
+so its time is part of the request's. Time budgets are several times what a
+laptop takes; see monitoring.testing for scaling them on slower runners.
+"""
+import fcntl
+import hashlib
+import importlib.util
+import itertools
+import json
+import os
+import tempfile
+import time
+from io import BytesIO, StringIO
+from unittest import mock, skipUnless
+
+import numpy as np
+import pandas as pd
+from django.conf import settings
+from django.core.cache import cache
+from django.core.files.storage import default_storage
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.test import SimpleTestCase, TestCase, override_settings
+from reportlab.graphics.shapes import Drawing
+from reportlab.platypus import Spacer
+from rest_framework.test import APITestCase
+from rest_framework_simplejwt.tokens import AccessToken
+from scipy import stats as scipy_stats
+
+from jigyasa.answer_storage import convert_survey
+from jigyasa.async_views import save_response
+from jigyasa.models import Answer, Choice, Survey, User
+from monitoring.testing import PerformanceAssertionsMixin
+
+from . import column_store, compute, pdf_charts, plot_storage
+from . import resample as resample_module
+from .choice_index import ChoiceIndex, clear_indexes, current_index, popcount
+from .datasets import filtered_rows, load_frame, open_blob_dataset
+from .filters import MAX_DEPTH, FilterError, chunk_candidates, frame_mask, parse_filter
+from .models import Analysis, CSVBlob, CSVUpload, Plot
+from .plot_engine import build_plot
+from .pdf_charts import MAX_BARS, chart_drawing, chart_flowable
+from .plot_storage import build_plot_row, plot_entry
+from .publish import build_analysis_pdf
+from .renderers import NumpyJSONRenderer, TypedArrayJSONRenderer, decode_typed_arrays, encode_typed_array
+from .resample import resample
+from .stats import correlation_matrix
+
+CSV_ROWS = 20_000
+SMALL_CSV = b"team,score,passed\nred,1.5,yes\nblue,2.5,no\nred,3.0,yes\n"
+
+
+class AnalysisAPIBudgetTests(PerformanceAssertionsMixin, APITestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        directory = cls.enterClassContext(tempfile.TemporaryDirectory())
+        cls.enterClassContext(override_settings(
+            MEDIA_ROOT=directory,
+            COLUMN_STORE={'DIR': f'{directory}/column_store'},
+            ANALYSIS_COMPUTE={'DIR': f'{directory}/compute_slots', 'WORKERS': 0},
+        ))
+        super().setUpClass()
+
+    @classmethod
+    def setUpTestData(cls):
+        call_command(
+            'seed_benchmark', users=5, surveys=1, questions=8, choices=4, responses=2000,
+            csv_uploads=1, csv_rows=CSV_ROWS, csv_columns=24, batch_size=1000, stdout=StringIO(),
+        )
+        # seed_benchmark gives the CSV uploads to its first user.
+        cls.user = User.objects.get(username='bench-user-0')
+        cls.upload = CSVUpload.objects.get(user=cls.user)
+        cls.survey = Survey.objects.get()
+        cls.survey.creator = cls.user
+        cls.survey.save()
+        cls.analysis = Analysis.objects.create(user=cls.user, title='Budget analysis', author_name='Bench')
+        cls.add_plots(cls.analysis, 3)
+
+    @classmethod
+    def add_plots(cls, analysis, count):
+        start = analysis.related_plots.count()
+        Plot.objects.bulk_create([
+            build_plot_row(analysis, start + i, {'title': f'Plot {start + i}', 'spec': cls.spec(
+                plot_type='bar', x_axis='segment_2', csv_upload_id=cls.upload.id,
+            )})
+            for i in range(count)
+        ])
+
+    @staticmethod
+    def spec(**fields):
+        return {'bucket': 'none', 'agg': 'mean', 'points': 500, **fields}
+
+    def setUp(self):
+        clear_indexes()
+        self.client.credentials(HTTP_AUTHORIZATION=f"Bearer {AccessToken.for_user(self.user)}")
+
+    def post(self, url, data):
+        return lambda: self.client.post(url, data, format='json')
+
+    # CSV uploads
+
+    def test_csv_upload_list(self):
+        self.assertQueryBudget(
+            2, lambda: self.client.get('/survey-analyzer/csv-uploads/'),
+            grow=lambda: CSVUpload.objects.bulk_create(
+                CSVUpload(user=self.user, file=self.upload.file.name, blob=self.upload.blob, profile=self.upload.profile)
+                for _ in range(5)
+            ),
+            status_code=200,
+        )
+
+    def test_csv_upload_retrieve(self):
+        self.assertQueryBudget(2, lambda: self.client.get(f'/survey-analyzer/csv-uploads/{self.upload.id}/'), status_code=200)
+
+    def test_csv_upload_create(self):
+        self.assertQueryBudget(8, lambda: self.client.post('/survey-analyzer/csv-uploads/', {
+            'file': SimpleUploadedFile('small.csv', SMALL_CSV),
+        }, format='multipart'), status_code=201)
+
+    def test_upload_session(self):
+        response = self.assertQueryBudget(2, self.post('/survey-analyzer/upload-sessions/', {
+            'filename': 'small.csv', 'total_size': len(SMALL_CSV),
+        }), status_code=201)
+        url = f"/survey-analyzer/upload-sessions/{response.data['id']}/"
+        self.assertQueryBudget(2, lambda: self.client.get(url), status_code=200)
+        # Two atomic blocks: the chunk append and storing the completed blob.
+        self.assertQueryBudget(13, lambda: self.client.generic(
+            'PATCH', url, SMALL_CSV, content_type='application/offset+octet-stream', HTTP_UPLOAD_OFFSET='0',
+        ), status_code=201)
+
+    def test_upload_session_known_content(self):
+        self.assertQueryBudget(6, self.post('/survey-analyzer/upload-sessions/', {
+            'filename': 'copy.csv', 'total_size': self.upload.blob.size, 'sha256': self.upload.blob.sha256,
+        }), status_code=201)
+
+    def test_upload_session_delete(self):
+        response = self.client.post('/survey-analyzer/upload-sessions/', {
+            'filename': 'small.csv', 'total_size': len(SMALL_CSV), 'sha256': hashlib.sha256(SMALL_CSV).hexdigest(),
+        }, format='json')
+        self.assertQueryBudget(
+            3, lambda: self.client.delete(f"/survey-analyzer/upload-sessions/{response.data['id']}/"), status_code=204,
+        )
+
+    # Analyses and their plots
+
+    def test_analysis_list(self):
+        def grow():
+            for i in range(3):
+                self.add_plots(Analysis.objects.create(user=self.user, title=f'Extra {i}'), 4)
+        self.assertQueryBudget(2, lambda: self.client.get('/survey-analyzer/analyses/'), grow=grow, status_code=200)
+
+    def test_analysis_retrieve(self):
+        self.assertQueryBudget(
+            3, lambda: self.client.get(f'/survey-analyzer/analyses/{self.analysis.id}/'),
+            grow=lambda: self.add_plots(self.analysis, 5), status_code=200,
+        )
+
+    def test_analysis_create(self):
+        # Budgets for writes include the savepoint pair of the serializer's atomic block.
+        plots = [{'title': f'Plot {i}', 'spec': self.spec(plot_type='histogram', x_axis='score_0', csv_upload_id=self.upload.id)} for i in range(3)]
+        self.assertQueryBudget(6, self.post('/survey-analyzer/analyses/', {
+            'title': 'New', 'author_name': 'Bench', 'plots': plots,
+        }), status_code=201)
+
+    def test_analysis_update(self):
+        self.assertQueryBudget(
+            6, lambda: self.client.patch(f'/survey-analyzer/analyses/{self.analysis.id}/', {'title': 'Renamed'}, format='json'),
+            grow=lambda: self.add_plots(self.analysis, 5), status_code=200,
+        )
+
+    def test_analysis_delete(self):
+        self.assertQueryBudget(4, lambda: self.client.delete(f'/survey-analyzer/analyses/{self.analysis.id}/'), status_code=204)
+
+    def test_analysis_plots(self):
+        self.assertQueryBudget(
+            4, lambda: self.client.get(f'/survey-analyzer/analyses/{self.analysis.id}/plots/'),
+            grow=lambda: self.add_plots(self.analysis, 5), status_code=200,
+        )
+
+    def test_analysis_plots_add(self):
+        self.assertQueryBudget(4, self.post(f'/survey-analyzer/analyses/{self.analysis.id}/plots/', {
+            'title': 'Added', 'spec': self.spec(plot_type='bar', x_axis='agrees_3', csv_upload_id=self.upload.id),
+        }), status_code=201)
+
+    def test_analysis_plot(self):
+        plot = self.analysis.related_plots.first()
+        url = f'/survey-analyzer/analyses/{self.analysis.id}/plots/{plot.id}/'
+        self.assertQueryBudget(4, lambda: self.client.get(url), status_code=200)
+        self.assertQueryBudget(5, lambda: self.client.patch(url, {'title': 'Renamed'}, format='json'), status_code=200)
+        self.assertQueryBudget(4, lambda: self.client.delete(url), status_code=204)
+
+    # Analysis endpoints: queries and time at CSV_ROWS rows
+
+    def test_plot_data(self):
+        for spec in [
+            self.spec(plot_type='scatter', x_axis='score_0', y_axes=['score_4']),
+            self.spec(plot_type='line', x_axis='submitted_at', y_axes=['score_0'], bucket='day'),
+            self.spec(plot_type='box', x_axis='segment_2', y_axes=['score_0'], filter='rating_1 >= 3'),
+            self.spec(plot_type='histogram', x_axis='score_0'),
+        ]:
+            request = self.post('/survey-analyzer/plot-data/', {**spec, 'csv_upload_id': self.upload.id})
+            with self.subTest(plot_type=spec['plot_type']):
+                self.assertQueryBudget(2, request, status_code=200)
+                self.assertTimeBudget(1.0, request)
+
+    def test_groupby(self):
+        request = self.post('/survey-analyzer/groupby/', {
+            'csv_upload_id': self.upload.id, 'columns': ['segment_2', 'score_0', 'rating_5'],
+        })
+        self.assertQueryBudget(2, request, status_code=200)
+        self.assertTimeBudget(1.0, request)
+
+    def test_correlation(self):
+        request = self.post('/survey-analyzer/correlation/', {
+            'csv_upload_id': self.upload.id, 'columns': ['score_0', 'score_4', 'score_8', 'rating_1', 'rating_5'],
+            'method': 'spearman',
+        })
+        self.assertQueryBudget(2, request, status_code=200)
+        self.assertTimeBudget(1.0, request)
+
+    def test_upload_associations(self):
+        request = self.post('/survey-analyzer/associations/', {'csv_upload_id': self.upload.id})
+        self.assertQueryBudget(2, request, status_code=200)
+        self.assertTimeBudget(2.0, request)
+
+    def test_survey_associations(self):
+        request = self.post('/survey-analyzer/associations/', {'survey_id': self.survey.id})
+        # Choice answers come from the Answer rows and from packed documents.
+        self.assertQueryBudget(6, request, status_code=200)
+        self.assertTimeBudget(2.0, request)
+
+    def test_survey_drilldown(self):
+        choices = list(
+            Choice.objects.filter(question__survey=self.survey, question__question_type__in=['single_choice', 'multiple_choice'])
+            .order_by('question_id', 'id').values_list('question_id', 'id')
+        )
+        first_question, picked = choices[0]
+        last_question = choices[-1][0]
+        request = self.post('/survey-analyzer/drilldown/', {
+            'survey_id': self.survey.id, 'filters': [[picked]], 'questions': [last_question],
+        })
+        # Building the index: the choices, the responses and their Answer rows.
+        response = self.assertQueryBudget(5, request, status_code=200)
+        # Built: only a check for new or deleted responses.
+        self.assertQueryBudget(3, request, status_code=200)
+
+        selected = Answer.selected_choices.through.objects.filter(answer__response__survey=self.survey)
+        matches = set(selected.filter(choice_id=picked).values_list('answer__response_id', flat=True))
+        expected = {choice_id: 0 for question_id, choice_id in choices if question_id == last_question}
+        for response_id, choice_id in selected.filter(choice__question_id=last_question).values_list('answer__response_id', 'choice_id'):
+            if response_id in matches:
+                expected[choice_id] += 1
+        self.assertEqual(response.data['responses'], 2000)
+        self.assertEqual(response.data['matched'], len(matches))
+        self.assertEqual({choice['id']: choice['count'] for choice in response.data['questions'][0]['choices']}, expected)
+
+        # New responses are appended to the built index.
+        save_response(self.survey.id, self.user, [(first_question, None, [picked])])
+        response = self.assertQueryBudget(5, request, status_code=200)
+        self.assertEqual((response.data['responses'], response.data['matched']), (2001, len(matches) + 1))
+
+        # Packed documents give the same counts as Answer rows.
+        convert_survey(self.survey, 'packed')
+        clear_indexes()
+        self.assertEqual(self.client.post('/survey-analyzer/drilldown/', {
+            'survey_id': self.survey.id, 'filters': [[picked]], 'questions': [last_question],
+        }, format='json').data, response.data)
+        self.assertTimeBudget(1.0, request)
+
+    def test_survey_drilldown_errors(self):
+        other = Choice.objects.exclude(question__survey=self.survey).values_list('id', flat=True).first() or 0
+        response = self.client.post('/survey-analyzer/drilldown/', {
+            'survey_id': self.survey.id, 'filters': [[other]],
+        }, format='json')
+        self.assertEqual(response.status_code, 400)
+        response = self.client.post('/survey-analyzer/drilldown/', {'survey_id': 0}, format='json')
+        self.assertEqual(response.status_code, 404)
+
+    def test_publish(self):
+        request = self.post('/survey-analyzer/publish-analysis/', {'analysis_id': self.analysis.id})
+        self.assertQueryBudget(5, request, status_code=200)
+        self.assertTimeBudget(5.0, request)
+
+    def test_publish_response(self):
+        url = '/survey-analyzer/publish-analysis/'
+        spooled = []
+        named_temporary_file = tempfile.NamedTemporaryFile
+
+        def spool(**kwargs):
+            spooled.append(named_temporary_file(**kwargs))
+            return spooled[-1]
+
+        with mock.patch('survey_analyzer.views.tempfile.NamedTemporaryFile', side_effect=spool):
+            response = self.client.post(url, {'analysis_id': self.analysis.id}, format='json')
+        self.assertTrue(response.streaming)
+        self.assertEqual(response['Content-Disposition'], 'attachment; filename="Budget analysis.pdf"')
+        path = spooled[0].name
+        self.assertTrue(b''.join(response.streaming_content).startswith(b'%PDF'))
+        response.close()
+        # The spooled file goes once the response is sent.
+        self.assertFalse(os.path.exists(path))
+
+        for options in ({'image_format': 'gif'}, {'dpi': 10}, {'quality': 101}, {'mode': 'bitmap'}):
+            with self.subTest(options=options):
+                response = self.client.post(url, {'analysis_id': self.analysis.id, **options}, format='json')
+                self.assertEqual(response.status_code, 400)
+
+
+class TemporaryStorageMixin:
+    """Uploads, the column store and compute slots in a directory of the test class' own."""
+
+    @classmethod
+    def setUpClass(cls):
+        directory = cls.enterClassContext(tempfile.TemporaryDirectory())
+        cls.enterClassContext(override_settings(
+            MEDIA_ROOT=directory,
+            COLUMN_STORE={'DIR': f'{directory}/column_store'},
+            ANALYSIS_COMPUTE={'DIR': f'{directory}/compute_slots', 'WORKERS': 0},
+        ))
+        super().setUpClass()
+
+
+class UploadTests(TemporaryStorageMixin, APITestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username='uploader', email='uploader@example.com', password='upload-password')
+        cls.other = User.objects.create_user(username='other-uploader', email='other@example.com', password='upload-password')
+
+    def setUp(self):
+        self.client.credentials(HTTP_AUTHORIZATION=f"Bearer {AccessToken.for_user(self.user)}")
+        self.upload = self.upload_csv(b"x,y\n1,2\n3,4\n")
+
+    def upload_csv(self, content):
+        response = self.client.post('/survey-analyzer/csv-uploads/', {
+            'file': SimpleUploadedFile('upload.csv', content),
+        }, format='multipart')
+        return CSVUpload.objects.select_related('blob').get(id=response.data['id'])
+
+    def start_session(self, content, **fields):
+        response = self.client.post('/survey-analyzer/upload-sessions/', {
+            'filename': 'chunked.csv', 'total_size': len(content), **fields,
+        }, format='json')
+        self.assertEqual(response.status_code, 201)
+        return f"/survey-analyzer/upload-sessions/{response.data['id']}/"
+
+    def send(self, url, offset, chunk):
+        return self.client.generic(
+            'PATCH', url, chunk, content_type='application/offset+octet-stream', HTTP_UPLOAD_OFFSET=str(offset),
+        )
+
+    def test_chunked_upload(self):
+        url = self.start_session(SMALL_CSV, sha256=hashlib.sha256(SMALL_CSV).hexdigest())
+        response = self.send(url, 0, SMALL_CSV[:20])
+        self.assertEqual((response.status_code, response.data['offset']), (200, 20))
+        # A chunk sent again (its response was lost) is refused with the offset to resume from.
+        response = self.send(url, 0, SMALL_CSV[:20])
+        self.assertEqual((response.status_code, response.data['offset']), (409, 20))
+        self.assertEqual(self.client.get(url).data['offset'], 20)
+
+        response = self.send(url, 20, SMALL_CSV[20:])
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(response.data['upload']['columns'], ['team', 'score', 'passed'])
+        upload = CSVUpload.objects.select_related('blob').get(id=response.data['csv_upload'])
+        with upload.blob.file.open('rb') as fh:
+            self.assertEqual(fh.read(), SMALL_CSV)
+        self.assertEqual(self.send(url, len(SMALL_CSV), b'x').status_code, 409)
+
+    def test_chunked_upload_errors(self):
+        url = self.start_session(SMALL_CSV)
+        self.assertEqual(self.send(url, 0, SMALL_CSV + b'extra\n').status_code, 400)
+        self.assertEqual(self.client.get(url).data['offset'], 0)
+        response = self.client.generic('PATCH', url, SMALL_CSV, content_type='application/offset+octet-stream')
+        self.assertEqual(response.status_code, 400)
+
+        # Content not matching the declared hash is discarded with its session.
+        url = self.start_session(SMALL_CSV, sha256='0' * 64)
+        self.assertEqual(self.send(url, 0, SMALL_CSV).status_code, 400)
+        self.assertEqual(self.client.get(url).status_code, 404)
+
+    def test_upload_session_content_of_other_user(self):
+        # Knowing the hash of someone else's upload does not give the content away.
+        self.client.credentials(HTTP_AUTHORIZATION=f"Bearer {AccessToken.for_user(self.other)}")
+        response = self.client.post('/survey-analyzer/upload-sessions/', {
+            'filename': 'copy.csv', 'total_size': self.upload.blob.size, 'sha256': self.upload.blob.sha256,
+        }, format='json')
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(response.data['offset'], 0)
+        self.assertNotIn('upload', response.data)
+        self.assertFalse(CSVUpload.objects.filter(user=self.other).exists())
+
+    def test_csv_upload_file_read_only(self):
+        url = f'/survey-analyzer/csv-uploads/{self.upload.id}/'
+        for method in (self.client.put, self.client.patch):
+            response = method(url, {'file': SimpleUploadedFile('other.csv', SMALL_CSV)}, format='multipart')
+            self.assertEqual(response.status_code, 200)
+        self.upload.refresh_from_db()
+        self.assertEqual(self.upload.file.name, self.upload.blob.file.name)
+
+    def test_unused_blobs_deleted(self):
+        first, second = self.upload_csv(SMALL_CSV), self.upload_csv(SMALL_CSV)
+        blob = first.blob
+        self.assertEqual(second.blob, blob)
+        self.assertTrue(column_store.exists(blob.sha256))
+
+        # Kept while another upload points at it.
+        with self.captureOnCommitCallbacks(execute=True):
+            self.assertEqual(self.client.delete(f'/survey-analyzer/csv-uploads/{first.id}/').status_code, 204)
+        self.assertTrue(CSVBlob.objects.filter(id=blob.id).exists())
+        with self.captureOnCommitCallbacks(execute=True):
+            self.assertEqual(self.client.delete(f'/survey-analyzer/csv-uploads/{second.id}/').status_code, 204)
+        self.assertFalse(CSVBlob.objects.filter(id=blob.id).exists())
+        self.assertFalse(default_storage.exists(blob.file.name))
+        self.assertFalse(column_store.exists(blob.sha256))
+        self.assertTrue(CSVBlob.objects.filter(id=self.upload.blob_id).exists())
+
+        # Blobs left over (here: the test transaction never commits) are swept.
+        leftover = self.upload_csv(SMALL_CSV)
+        leftover.delete()
+        out = StringIO()
+        call_command('collect_blobs', stdout=out)
+        self.assertIn('Deleted 1 unused blobs', out.getvalue())
+        self.assertFalse(default_storage.exists(leftover.blob.file.name))
+
+
+class DatasetEvictionTests(TemporaryStorageMixin, APITestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username='reader', email='reader@example.com', password='reader-password')
+
+    def setUp(self):
+        self.client.credentials(HTTP_AUTHORIZATION=f"Bearer {AccessToken.for_user(self.user)}")
+        rows = ''.join(f"{'abc'[i % 3]},{i - 100}\n" for i in range(300))
+        response = self.client.post('/survey-analyzer/csv-uploads/', {
+            'file': SimpleUploadedFile('segments.csv', f"segment,score\n{rows}".encode()),
+        }, format='multipart')
+        self.upload = CSVUpload.objects.select_related('blob').get(id=response.data['id'])
+
+    def test_dataset_evicted_while_open(self):
+        empty_store = override_settings(COLUMN_STORE={**settings.COLUMN_STORE, 'MAX_BYTES': 0})
+        with empty_store:
+            column_store.evict()
+        # Rebuilt, so a handle with no columns mapped yet.
+        dataset = open_blob_dataset(self.upload.blob)
+        mapped = dataset.column('segment')
+        with empty_store:
+            self.assertEqual(column_store.evict(), [self.upload.blob.sha256])
+        # Columns already mapped keep their pages; the others are gone.
+        self.assertEqual(dataset.column('segment').tolist(), mapped.tolist())
+        with self.assertRaises(column_store.DatasetEvicted):
+            dataset.column('score')
+
+        # An upload read racing the eviction reopens (rebuilding) the dataset.
+        opened = iter([dataset])
+        with mock.patch(
+            'survey_analyzer.datasets.open_blob_dataset', side_effect=lambda blob: next(opened, None) or open_blob_dataset(blob),
+        ) as reopen:
+            df = load_frame(self.upload, ['segment', 'score'], parse_filter('score > 0'))
+        self.assertEqual(reopen.call_count, 2)
+        self.assertTrue(column_store.exists(self.upload.blob.sha256))
+        self.assertEqual(len(df), (load_frame(self.upload, ['score'])['score'] > 0).sum())
+
+
+class DrilldownIndexTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        call_command(
+            'seed_benchmark', organizations=1, users=2, surveys=1, questions=4, choices=3, responses=200,
+            csv_uploads=0, stdout=StringIO(),
+        )
+        cls.user = User.objects.get(username='bench-user-0')
+        cls.survey = Survey.objects.get()
+
+    def setUp(self):
+        clear_indexes()
+
+    def test_drilldown_response_added_while_indexing(self):
+        question_id, picked = Choice.objects.filter(
+            question__survey=self.survey, question__question_type='single_choice',
+        ).values_list('question_id', 'id').first()
+        selected = Answer.selected_choices.through.objects
+        matches = selected.filter(answer__response__survey=self.survey, choice_id=picked).count()
+        select = selected.filter
+
+        def submit_then_select(*args, **kwargs):
+            # Lands between the index's responses query and its Answer rows query.
+            if not submitted:
+                submitted.append(save_response(self.survey.id, self.user, [(question_id, None, [picked])]))
+            return select(*args, **kwargs)
+
+        submitted = []
+        with mock.patch.object(selected, 'filter', side_effect=submit_then_select):
+            index = ChoiceIndex(self.survey.id, self.survey.revision)
+        self.assertEqual(len(submitted), 1)
+        self.assertEqual((index.size, int(popcount(index.match([[picked]])))), (200, matches))
+
+        # Appended on the next read.
+        index = current_index(self.survey)
+        self.assertEqual((index.size, int(popcount(index.match([[picked]])))), (201, matches + 1))
+
+
+class ComputeAdmissionTests(APITestCase):
+    """Slots held from here stand in for analyses running in other server processes."""
+
+    @classmethod
+    def setUpClass(cls):
+        directory = cls.enterClassContext(tempfile.TemporaryDirectory())
+        cls.slots = f'{directory}/compute_slots'
+        cls.enterClassContext(override_settings(
+            MEDIA_ROOT=directory,
+            COLUMN_STORE={'DIR': f'{directory}/column_store'},
+            ANALYSIS_COMPUTE={
+                'DIR': cls.slots, 'WORKERS': 0, 'SLOTS': 1, 'QUEUE': 1, 'PER_USER': 1,
+                'QUEUE_TIMEOUT': 0.2, 'RETRY_AFTER': 7,
+            },
+        ))
+        super().setUpClass()
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username='analyst', email='analyst@example.com', password='analyst-password')
+
+    def setUp(self):
+        cache.clear()
+        self.client.credentials(HTTP_AUTHORIZATION=f"Bearer {AccessToken.for_user(self.user)}")
+        response = self.client.post('/survey-analyzer/csv-uploads/', {
+            'file': SimpleUploadedFile('numbers.csv', b"x,y\n1,2\n2,4.5\n3,5\n4,9\n"),
+        }, format='multipart')
+        self.request = {'csv_upload_id': response.data['id'], 'columns': ['x', 'y']}
+
+    def hold(self, name):
+        os.makedirs(self.slots, exist_ok=True)
+        handle = open(os.path.join(self.slots, name), 'a+b')
+        fcntl.flock(handle, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        self.addCleanup(handle.close)
+
+    def correlation(self):
+        return self.client.post('/survey-analyzer/correlation/', self.request, format='json')
+
+    def assertRefused(self, status_code):
+        response = self.correlation()
+        self.assertEqual(response.status_code, status_code)
+        self.assertEqual(response['Retry-After'], '7')
+        return response
+
+    def test_admitted(self):
+        self.assertEqual(self.correlation().status_code, 200)
+        # Released slots leave no files behind.
+        self.assertEqual(os.listdir(self.slots), [])
+
+    def test_per_user_limit(self):
+        self.hold(f'user-{self.user.id}-0')
+        self.assertRefused(429)
+        # Other users are not limited by it.
+        other = User.objects.create_user(username='other-analyst', email='other@example.com', password='analyst-password')
+        self.client.credentials(HTTP_AUTHORIZATION=f"Bearer {AccessToken.for_user(other)}")
+        upload = CSVUpload.objects.get(id=self.request['csv_upload_id'])
+        upload.pk, upload.user = None, other
+        upload.save()
+        self.request['csv_upload_id'] = upload.id
+        self.assertEqual(self.correlation().status_code, 200)
+
+    def test_queue_full(self):
+        self.hold('run-0')
+        self.hold('queue-0')
+        self.assertRefused(503)
+        self.assertEqual(sorted(os.listdir(self.slots)), ['queue-0', 'run-0'])
+
+    def test_queue_timeout(self):
+        self.hold('run-0')
+        start = time.monotonic()
+        self.assertRefused(504)
+        self.assertGreaterEqual(time.monotonic() - start, 0.2)
+        # The queue and user slots were given back.
+        self.assertEqual(os.listdir(self.slots), ['run-0'])
+
+    def test_slots_released_when_the_work_fails(self):
+        with mock.patch('survey_analyzer.views.upload_correlation', side_effect=RuntimeError('boom')):
+            self.assertEqual(self.correlation().status_code, 500)
+        self.assertEqual(os.listdir(self.slots), [])
+        self.assertEqual(self.correlation().status_code, 200)
+
+    def test_released_slot_file_is_not_shared(self):
+        # A process that opened a slot file just before its holder deleted it
+        # must not end up holding the slot alongside the next taker.
+        config = compute.compute_settings()
+        first = compute.admit(self.user.id, config)
+        stale = open(first[0].name, 'a+b')
+        self.addCleanup(stale.close)
+        compute._release(first)
+        second = compute.admit(self.user.id, config)
+        self.addCleanup(compute._release, second)
+        self.assertIsNone(compute._try_lock(first[0].name))
+        fcntl.flock(stale, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        self.assertNotEqual(os.fstat(stale.fileno()).st_ino, os.stat(second[0].name).st_ino)
+
+
+class FilterTests(SimpleTestCase):
+    frame = pd.DataFrame({
+        'count': np.array([1, 2, 3, 4, 5], dtype=np.int64),
+        'score': [1.5, np.nan, 3.0, 4.5, np.nan],
+        'team': ['red', 'blue', None, 'red', 'green'],
+        'created': pd.to_datetime(['2023-12-31 23:00', '2024-01-01 00:00', None, '2024-06-30 00:00', '2025-02-01 00:00']),
+        'passed': [True, False, True, False, True],
+    })
+
+    def rows(self, text, df=None):
+        return np.flatnonzero(frame_mask(parse_filter(text), self.frame if df is None else df)).tolist()
+
+    def test_parse(self):
+        self.assertEqual(
+            parse_filter("a = 1 and not (`b c` in ('x', \"y\") or c is not null)"),
+            ('and', [('eq', 'a', 1), ('not', ('or', [('in', 'b c', ['x', 'y']), ('notnull', 'c')]))]),
+        )
+        self.assertEqual(parse_filter("x != -2.5e1 OR y = TRUE"), ('or', [('ne', 'x', -25.0), ('eq', 'y', True)]))
+
+    def test_parse_errors(self):
+        for text in [
+            '', '   ', 'x >', 'x = 1 y', 'x not 3', 'x in ()', '(x = 1', 'x = 1)', 'x = #', 'x is 3',
+            '= 1', "x = 'open", 'x' * 2001,
+            '(' * (MAX_DEPTH + 1) + 'x = 1' + ')' * (MAX_DEPTH + 1),
+            '(' * 400 + 'x = 1' + ')' * 400,
+            'not ' * 400 + 'x = 1',
+        ]:
+            with self.subTest(text=text[:40]):
+                with self.assertRaises(FilterError):
+                    parse_filter(text)
+        self.assertEqual(parse_filter('(' * MAX_DEPTH + 'x = 1' + ')' * MAX_DEPTH), ('eq', 'x', 1))
+
+    def test_evaluate_column_types(self):
+        for text, expected in [
+            ('count >= 3', [2, 3, 4]),
+            ('count in (1, 5, 9)', [0, 4]),
+            ("count = '2'", [1]),
+            ('score > 2', [2, 3]),
+            ('score != 3', [0, 3]),
+            ('score is null', [1, 4]),
+            ("team = 'red'", [0, 3]),
+            ("team != 'red'", [1, 4]),
+            ("team not in ('red', 'blue')", [4]),
+            ('team is null', [2]),
+            ("team < 'c'", [1]),
+            ("created >= '2024'", [1, 3, 4]),
+            ("created < '2024-06-30'", [0, 1]),
+            ('created is not null and passed = true', [0, 4]),
+            ("passed = false or team = 'green'", [1, 3, 4]),
+        ]:
+            with self.subTest(text=text):
+                self.assertEqual(self.rows(text), expected)
+
+    def test_evaluate_errors(self):
+        for text in ['created >= 2024', 'created = true', "created > 'not a date'", "count > 'many'", "team > 3"]:
+            with self.subTest(text=text):
+                with self.assertRaises(FilterError):
+                    self.rows(text)
+
+    def test_not_skips_missing_values(self):
+        self.assertEqual(self.rows('not score > 2'), self.rows('score <= 2'))
+        self.assertEqual(self.rows('not score > 2'), [0])
+        self.assertEqual(self.rows("not team = 'red'"), [1, 4])
+        self.assertEqual(self.rows("not (score > 2 or team = 'blue')"), [0])
+        # Unknown and false is false; unknown or true is true.
+        self.assertEqual(self.rows("not (score > 2 and team = 'red')"), [0, 1, 4])
+        self.assertEqual(self.rows("not not score > 2"), [2, 3])
+        self.assertEqual(self.rows('not score is null'), [0, 2, 3])
+
+    def test_chunk_pruning_matches_full_scan(self):
+        rows = 3 * column_store.CHUNK_ROWS + 1000
+        rng = np.random.default_rng(0)
+        df = pd.DataFrame({
+            'n': np.arange(rows),
+            'score': np.where(rng.random(rows) < 0.1, np.nan, rng.normal(50, 10, rows)),
+            'created': pd.Timestamp('2023-01-01') + pd.to_timedelta(np.arange(rows) * 600, unit='s'),
+            # Each chunk holds its own pair of regions.
+            'region': np.array(['north', 'south', 'east', 'west', 'up', 'down', 'in', 'out'])[
+                (np.arange(rows) // column_store.CHUNK_ROWS) * 2 + np.arange(rows) % 2
+            ],
+        })
+        with tempfile.TemporaryDirectory() as directory, override_settings(COLUMN_STORE={'DIR': directory}):
+            column_store.build('pruning', df)
+            dataset = column_store.open_dataset('pruning')
+            for text, scanned in [
+                ('n < 1000', 1),
+                ('n >= 197000', 1),
+                ('n > 500000', 0),
+                ("region = 'east'", 1),
+                ("region in ('north', 'out') and n > 10", 2),
+                ("created >= '2024-06-01'", 3),
+                ('score > 75 or n = 5', 4),
+                ('not n < 1000', 4),
+                ("region != 'up' and score is null", 4),
+                ('n in (5, 70000, 999999)', 2),
+            ]:
+                node = parse_filter(text)
+                with self.subTest(text=text):
+                    self.assertEqual(chunk_candidates(node, dataset.chunk_stats, dataset.chunk_count).sum(), scanned)
+                    self.assertEqual(filtered_rows(dataset, node).tolist(), np.flatnonzero(frame_mask(node, df)).tolist())
+            with self.assertRaises(FilterError):
+                filtered_rows(dataset, parse_filter('created >= 2024'))
+
+
+class PlotEngineTests(SimpleTestCase):
+
+    def test_heatmap_numeric_text(self):
+        df = pd.DataFrame({'team': ['a', 'a', 'b'], 'score': np.array(['1', '3', '5'], dtype=object)})
+        trace = build_plot(df, 'heatmap', 'team', ['score'])['data'][0]
+        self.assertEqual(np.asarray(trace['z'][0]).ravel().tolist(), [2.0, 5.0])
+        self.assertEqual(trace['y'].tolist(), ['a', 'b'])
+
+
+class RendererTests(SimpleTestCase):
+
+    def test_numpy_json(self):
+        data = {
+            'floats': np.array([1.5, np.nan, np.inf]),
+            'ints': np.array([2 ** 53 + 1, -1], dtype=np.int64),
+            'strided': np.arange(6).reshape(2, 3)[:, ::2],
+            'objects': np.array(['a', None], dtype=object),
+            'scalar': np.float32(0.5),
+            'series': pd.Series([1, None], dtype='Int64'),
+            'frame': pd.DataFrame({'a': [1, 2]}),
+            'dates': pd.Series(pd.to_datetime(['2024-01-01 10:00', None])),
+            'raw_dates': np.array(['2024-01-02', 'NaT'], dtype='datetime64[ns]'),
+            'timestamp': pd.Timestamp('2024-01-01 10:00'),
+            'missing': pd.NaT,
+        }
+        self.assertEqual(json.loads(NumpyJSONRenderer().render(data)), {
+            'floats': [1.5, None, None],
+            'ints': [2 ** 53 + 1, -1],
+            'strided': [[0, 2], [3, 5]],
+            'objects': ['a', None],
+            'scalar': 0.5,
+            'series': [1, None],
+            'frame': {'a': [1, 2]},
+            'dates': ['2024-01-01T10:00:00.000000000', None],
+            'raw_dates': ['2024-01-02T00:00:00.000000000', None],
+            'timestamp': '2024-01-01T10:00:00',
+            'missing': None,
+        })
+        # Without NaT, datetime arrays are written natively.
+        self.assertEqual(
+            json.loads(NumpyJSONRenderer().render({'dates': pd.Series(pd.to_datetime(['2024-01-01 10:00']))})),
+            {'dates': ['2024-01-01T10:00:00']},
+        )
+
+    def test_typed_array_round_trip(self):
+        arrays = {
+            'floats': (np.array([1.5, np.nan, -np.inf]), 'f8'),
+            'big_endian': (np.array([1.25, 2.5], dtype='>f8'), 'f8'),
+            'half': (np.array([0.5, 1], dtype=np.float16), 'f4'),
+            'small_ints': (np.array([5, -1, 2 ** 31 - 1], dtype=np.int64), 'i4'),
+            'large_ints': (np.array([2 ** 40, -3], dtype=np.int64), 'f8'),
+            'unsigned': (np.array([2 ** 32 - 1], dtype=np.uint64), 'u4'),
+            'empty': (np.array([], dtype=np.int64), 'i4'),
+            'flags': (np.array([True, False]), 'u1'),
+            'grid': (np.arange(6, dtype=np.int16).reshape(2, 3), 'i2'),
+        }
+        rendered = json.loads(TypedArrayJSONRenderer().render({
+            **{name: values for name, (values, _) in arrays.items()},
+            'series': pd.Series([1.0, 2.0]),
+            'dates': np.array(['2024-01-02', 'NaT'], dtype='datetime64[ns]'),
+            'labels': np.array(['a', 'b'], dtype=object),
+        }))
+        for name, (values, dtype) in arrays.items():
+            with self.subTest(name=name):
+                self.assertEqual(rendered[name]['dtype'], dtype)
+                np.testing.assert_array_equal(decode_typed_arrays(rendered[name]), values)
+        self.assertEqual(rendered['grid']['shape'], '2,3')
+        self.assertEqual(decode_typed_arrays(rendered['series']), [1.0, 2.0])
+        self.assertEqual(rendered['dates'], ['2024-01-02T00:00:00.000000000', None])
+        self.assertEqual(rendered['labels'], ['a', 'b'])
+
+
+class ResampleTests(SimpleTestCase):
+
+    def test_bucket_edges(self):
+        x = np.array([
+            '1969-12-31T23:59:59', '1970-01-01T00:00:00',
+            '2023-12-31T23:59:59.999', '2024-01-01T00:00:00', '2024-01-07T23:00', '2024-01-08T00:00',
+            '2024-02-29T23:59', '2024-03-01T00:00',
+        ], dtype='datetime64[ns]')
+        ones = np.ones(len(x))
+        for bucket, starts, counts in [
+            ('day', ['1969-12-31', '1970-01-01', '2023-12-31', '2024-01-01', '2024-01-07', '2024-01-08',
+                     '2024-02-29', '2024-03-01'], [1] * 8),
+            # Weeks start on Monday; 2024-01-01 is one.
+            ('week', ['1969-12-29', '2023-12-25', '2024-01-01', '2024-01-08', '2024-02-26'], [2, 1, 2, 1, 2]),
+            ('month', ['1969-12-01', '1970-01-01', '2023-12-01', '2024-01-01', '2024-02-01', '2024-03-01'],
+             [1, 1, 1, 3, 1, 1]),
+        ]:
+            with self.subTest(bucket=bucket):
+                got, (values,) = resample(x, [ones], bucket, 'count')
+                self.assertEqual(got.tolist(), pd.to_datetime(starts).to_numpy().tolist())
+                self.assertEqual(values.tolist(), counts)
+
+    def test_empty_buckets(self):
+        x = pd.to_datetime(['2024-01-01 10:00', '2024-01-01 11:00', None, '2024-01-04 09:00']).to_numpy()
+        y = np.array([1.0, np.nan, 5.0, np.nan])
+        # Days without rows are left out; days whose values are all missing are kept.
+        starts, (mean,) = resample(x, [y], 'day', 'mean')
+        (_, (total,)), (_, (count,)) = resample(x, [y], 'day', 'sum'), resample(x, [y], 'day', 'count')
+        self.assertEqual(starts.tolist(), pd.to_datetime(['2024-01-01', '2024-01-04']).to_numpy().tolist())
+        np.testing.assert_array_equal(mean, [1.0, np.nan])
+        self.assertEqual(total.tolist(), [1.0, 0.0])
+        self.assertEqual(count.tolist(), [1, 0])
+
+        none = np.array(['NaT', 'NaT'], dtype='datetime64[ns]')
+        starts, (values,) = resample(none, [np.ones(2)], 'hour', 'mean')
+        self.assertEqual((len(starts), len(values)), (0, 0))
+
+    def test_matches_pandas(self):
+        rng = np.random.default_rng(0)
+        x = (pd.Timestamp('2023-01-01') + pd.to_timedelta(rng.integers(0, 400 * 86400, 5000), unit='s')).to_numpy()
+        y = np.where(rng.random(5000) < 0.1, np.nan, rng.normal(size=5000))
+        expected = pd.Series(y, index=x).resample('W-MON', label='left', closed='left').mean()
+        expected = expected[pd.Series(1, index=x).resample('W-MON', label='left', closed='left').count() > 0]
+        for limit in (resample_module.DENSE_BUCKET_LIMIT, 0):
+            with self.subTest(dense_limit=limit), mock.patch.object(resample_module, 'DENSE_BUCKET_LIMIT', limit):
+                starts, (mean,) = resample(x, [y], 'week', 'mean')
+                self.assertEqual(starts.tolist(), expected.index.to_numpy().tolist())
+                np.testing.assert_allclose(mean, expected.to_numpy())
+
+
+class CorrelationTests(SimpleTestCase):
+
+    def setUp(self):
+        rng = np.random.default_rng(0)
+        base = rng.normal(size=300)
+        self.frame = pd.DataFrame({
+            'a': base,
+            'b': base * 0.5 + rng.normal(size=300),
+            'c': rng.normal(size=300),
+            # Few distinct values, so Spearman has ties to average.
+            'd': np.round(base + rng.normal(size=300)),
+        })
+
+    def assertMatchesScipy(self, frame, method, test):
+        r, n, p = correlation_matrix(frame, method)
+        np.testing.assert_allclose(np.diag(r), 1.0)
+        np.testing.assert_array_equal(r, r.T)
+        for i, j in itertools.combinations(range(len(frame.columns)), 2):
+            first, second = frame.columns[i], frame.columns[j]
+            shared = frame[[first, second]].dropna()
+            expected = test(shared[first], shared[second])
+            with self.subTest(method=method, pair=(first, second)):
+                self.assertEqual(n[i, j], len(shared))
+                self.assertAlmostEqual(r[i, j], expected.statistic, places=10)
+                self.assertAlmostEqual(p[i, j], expected.pvalue, places=10)
+
+    def test_pearson_with_missing_values(self):
+        frame = self.frame.copy()
+        frame.loc[::7, 'a'] = np.nan
+        frame.loc[::5, 'c'] = np.nan
+        self.assertMatchesScipy(frame, 'pearson', scipy_stats.pearsonr)
+
+    def test_spearman(self):
+        # Ranked once per column, so only complete data matches spearmanr exactly.
+        self.assertMatchesScipy(self.frame, 'spearman', scipy_stats.spearmanr)
+
+    def test_degenerate_columns(self):
+        frame = pd.DataFrame({'x': [1.0, 2.0, 3.0, 4.0], 'y': [2.0, 4.0, 6.0, 8.0], 'flat': [5.0] * 4,
+                              'sparse': [1.0, np.nan, np.nan, np.nan]})
+        r, n, p = correlation_matrix(frame)
+        self.assertEqual((r[0, 1], p[0, 1]), (1.0, 0.0))
+        self.assertTrue(np.isnan(r[2]).all() and np.isnan(p[2]).all())
+        self.assertEqual(n[3].tolist(), [1, 1, 1, 1])
+        self.assertTrue(np.isnan(r[3]).all())
+
+
+class PlotStorageTests(SimpleTestCase):
+
+    def test_payload_round_trip(self):
+        spec_entry = {'title': 'Scores', 'description': '', 'spec': {'plot_type': 'line', 'x_axis': 'day', 'points': 500}}
+        legacy_entry = {'title': '', 'data': {'data': [{'type': 'bar', 'x': ['a', 'b'], 'y': [1, None]}], 'layout': {}}}
+        for codec, zstd in [('zstd', plot_storage.zstandard), ('zlib', None)]:
+            with self.subTest(codec=codec), mock.patch.object(plot_storage, 'zstandard', zstd):
+                for entry, plot_type in [(spec_entry, 'line'), (legacy_entry, 'bar')]:
+                    plot = build_plot_row(Analysis(title='A'), 3, entry)
+                    self.assertEqual((plot.codec, plot.type, plot.position), (codec, plot_type, 3))
+                    stored = plot_entry(plot)
+                    self.assertEqual(stored.pop('title'), entry['title'] or 'Untitled Plot')
+                    self.assertEqual(stored, {
+                        'id': None, 'position': 3, 'description': '',
+                        **{key: entry[key] for key in ('spec', 'data') if key in entry},
+                    })
+
+    def test_payload_is_compressed(self):
+        entry = {'data': {'data': [{'type': 'scatter', 'x': list(range(5000)), 'y': [1.5] * 5000}]}}
+        plot = build_plot_row(Analysis(), 0, entry)
+        self.assertLess(len(plot.payload), len(json.dumps(entry)) / 5)
+
+    def test_unknown_codec_is_raw_json(self):
+        # Any other codec is read as uncompressed JSON.
+        self.assertEqual(plot_storage.decode_payload('', b'{"spec": {"plot_type": "pie"}}'), {'spec': {'plot_type': 'pie'}})
+
+
+class PublishTests(SimpleTestCase):
+    options = {'mode': 'vector', 'dpi': 100, 'image_format': 'png', 'quality': 85}
+    figures = {
+        'bar': {'data': [{'type': 'bar', 'x': ['a', 'b', 'c'], 'y': [3, 1, 2]}], 'layout': {'title': 'Bars'}},
+        'line': {'data': [
+            {'type': 'scatter', 'mode': 'lines', 'x': list(range(20000)), 'y': encode_typed_array(np.sin(np.arange(20000.0)))},
+            {'type': 'scatter', 'mode': 'lines', 'x': list(range(3)), 'y': [1, None, 3], 'fill': 'tozeroy'},
+        ], 'layout': {}},
+        'markers': {'data': [{'type': 'scatter', 'mode': 'markers', 'x': [1.5, 2, 7], 'y': [0, -1, 4]}], 'layout': {}},
+        'dates': {'data': [
+            {'type': 'scatter', 'mode': 'lines', 'x': ['2024-01-01T00:00:00', None, '2024-03-01T00:00:00'], 'y': [1, 2, 3]},
+        ], 'layout': {}},
+        'pie': {'data': [{'type': 'pie', 'values': [3, 1], 'labels': ['yes', 'no']}], 'layout': {}},
+        'box': {'data': [{'type': 'box', 'y': [1, 2, 3, 4, 50], 'name': 'score'}], 'layout': {}},
+        'heatmap': {'data': [{'type': 'heatmap', 'z': [[1, 2], [3, None]], 'x': ['a', 'b'], 'y': ['c', 'd']}], 'layout': {}},
+    }
+
+    def pdf(self, figures, **options):
+        output = BytesIO()
+        plots = [{'title': name, 'data': figure} for name, figure in figures.items()]
+        build_analysis_pdf(output, Analysis(title='Report', author_name='Ana'), plots, {**self.options, **options})
+        return output.getvalue()
+
+    def test_vector_charts(self):
+        for name, figure in self.figures.items():
+            with self.subTest(name):
+                self.assertIsInstance(chart_drawing(figure, 432, 288), Drawing)
+        with mock.patch.object(pdf_charts, 'kaleido_image') as kaleido:
+            pdf = self.pdf(self.figures)
+        kaleido.assert_not_called()
+        self.assertTrue(pdf.startswith(b'%PDF'))
+        self.assertNotIn(b'/Subtype /Image', pdf)
+
+    def test_kaleido_fallback(self):
+        bars = MAX_BARS + 1
+        unsupported = {
+            'violin': {'data': [{'type': 'violin', 'y': [1, 2, 3]}], 'layout': {}},
+            'many_bars': {'data': [{'type': 'bar', 'x': list(range(bars)), 'y': [1] * bars}], 'layout': {}},
+            'mixed': {'data': [self.figures['pie']['data'][0], self.figures['bar']['data'][0]], 'layout': {}},
+        }
+        for name, figure in unsupported.items():
+            with self.subTest(name):
+                self.assertIsNone(chart_drawing(figure, 432, 288))
+        raster = Spacer(1, 1)
+        with mock.patch.object(pdf_charts, 'kaleido_image', return_value=raster) as kaleido:
+            self.assertIs(chart_flowable(unsupported['violin'], 432, 288, dpi=150), raster)
+            kaleido.assert_called_once_with(unsupported['violin'], 432, 288, dpi=150)
+            # Raster mode sends supported figures to kaleido too.
+            self.assertIs(chart_flowable(self.figures['bar'], 432, 288, mode='raster'), raster)
+
+    @skipUnless(importlib.util.find_spec('kaleido'), 'kaleido is not installed')
+    def test_raster_formats(self):
+        figures = {'bar': self.figures['bar']}
+        self.assertIn(b'/Subtype /Image', self.pdf(figures, mode='raster'))
+        jpeg = self.pdf(figures, mode='raster', image_format='jpeg', quality=40)
+        self.assertIn(b'/DCTDecode', jpeg)
+        self.assertLess(len(jpeg), len(self.pdf(figures, mode='raster', image_format='jpeg', quality=95)))
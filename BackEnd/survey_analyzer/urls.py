@@ -1,14 +1,18 @@
 from django.urls import path, include
 from rest_framework.routers import DefaultRouter
-from .views import CSVUploadViewSet, AnalysisViewSet, PlotDataView, GroupByView, PublishAnalysisView
+from .views import CSVUploadViewSet, UploadSessionViewSet, AnalysisViewSet, PlotDataView, GroupByView, CorrelationView, AssociationView, DrilldownView, PublishAnalysisView
 
 router = DefaultRouter()
 router.register(r'csv-uploads', CSVUploadViewSet, basename='csv-upload')
+router.register(r'upload-sessions', UploadSessionViewSet, basename='upload-session')
 router.register(r'analyses', AnalysisViewSet, basename='analysis')
 
 urlpatterns = [
     path('plot-data/', PlotDataView.as_view(), name='plot-data'),
     path('groupby/', GroupByView.as_view(), name='groupby'),
+    path('correlation/', CorrelationView.as_view(), name='correlation'),
+    path('associations/', AssociationView.as_view(), name='associations'),
+    path('drilldown/', DrilldownView.as_view(), name='drilldown'),
     path('', include(router.urls)),
     path('publish-analysis/', PublishAnalysisView.as_view(), name='publish-analysis'),
 ]
\ No newline at end of file
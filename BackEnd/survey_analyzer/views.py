@@ -1,14 +1,53 @@
 from django.shortcuts import render
 from rest_framework import viewsets, status
+from rest_framework.decorators import action
+from rest_framework.pagination import LimitOffsetPagination
 from rest_framework.response import Response
 from rest_framework.permissions import IsAuthenticated
-from .models import CSVUpload, Analysis
-from .serializers import CSVUploadSerializer, AnalysisSerializer, PlotDataSerializer
-import pandas as pd
+from rest_framework.generics import get_object_or_404
+from django.core.files.storage import default_storage
+from django.db import transaction
+from django.db.models import Count, Max
+from .models import CSVUpload, Analysis, UploadSession, partial_upload_path
+from .serializers import (
+    CSVUploadSerializer, AnalysisSerializer, AnalysisSummarySerializer, PlotSerializer, PlotDataSerializer,
+    UploadSessionSerializer, CorrelationSerializer, AssociationSerializer, DrilldownSerializer, PublishSerializer,
+)
+from .renderers import TypedArrayJSONRenderer
+from .choice_index import drilldown
+from .column_profile import get_profile, column_names, column_entries
+from .compute import Overloaded
+from .datasets import content_key, group_columns, ingest_blob, load_frame
+from .filters import FilterError, parse_request_filter
+from .storage import hash_chunks, hash_path, read_blocks, store_blob, store_blob_from_path
+from .plot_engine import PlotError, group_counts_from_profile, correlation_heatmap
+from .plot_specs import materialize_plots, spec_plot
+from .plot_storage import build_plot_row, plot_entry, update_plot_row
+from .stats import upload_correlation
+from .contingency import MAX_CATEGORIES, associations, encode
+from .survey_data import survey_choice_columns
+from . import compute
+from monitoring.timing import phase
+from jigyasa.models import Survey
+import numpy as np
+from django.conf import settings
+from django.core.cache import cache
+import hashlib
+import json
 import logging
+import os
 
 logger = logging.getLogger(__name__)
 
+# Suggested chunk size for UploadSessionViewSet clients.
+UPLOAD_CHUNK_SIZE = 8 * 1024 * 1024
+
+
+def overloaded_response(exc):
+    """The 429/503/504 for analysis work refused or abandoned by survey_analyzer.compute."""
+    headers = {'Retry-After': str(exc.retry_after)} if exc.retry_after else None
+    return Response({"error": str(exc)}, status=exc.status_code, headers=headers)
+
 # Create your views here.
 
 class CSVUploadViewSet(viewsets.ModelViewSet):
@@ -16,23 +55,144 @@ class CSVUploadViewSet(viewsets.ModelViewSet):
     serializer_class = CSVUploadSerializer
     permission_classes = [IsAuthenticated]
 
+    def get_queryset(self):
+        # Profiles include value samples, so uploads are only visible to their owner.
+        return self.queryset.filter(user=self.request.user)
+
     def perform_create(self, serializer):
         serializer.save(user=self.request.user)
 
     def create(self, request, *args, **kwargs):
         serializer = self.get_serializer(data=request.data)
         serializer.is_valid(raise_exception=True)
-        self.perform_create(serializer)
+        uploaded = serializer.validated_data['file']
+
+        # Hash while streaming the upload; identical content is stored and parsed once.
+        with phase('store'):
+            sha256, size = hash_chunks(uploaded.chunks())
+            uploaded.seek(0)
+            blob, created = store_blob(sha256, size, uploaded)
+        serializer.save(user=request.user, file=blob.file.name, blob=blob, original_filename=uploaded.name)
         csv_upload = serializer.instance
-        file_path = csv_upload.file.path
 
-        logger.info(f"Uploaded file path: {file_path}")
+        logger.info(f"Uploaded file path: {csv_upload.file.path} (new content: {created})")
 
         try:
-            df = pd.read_csv(file_path)
-            columns = df.columns.tolist()
-            logger.info(f"Extracted columns: {columns}")
-            return Response({"id": serializer.instance.id, "columns": columns}, status=status.HTTP_201_CREATED)
+            return Response(ingest_upload(csv_upload), status=status.HTTP_201_CREATED)
+        except Exception as e:
+            logger.error(f"Error processing file: {e}")
+            return Response({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
+
+
+def ingest_upload(csv_upload):
+    """Attach the blob's profile to a new upload, parsing the content if nobody has yet."""
+    # Profile once at ingest so later requests can be validated without reading the file.
+    csv_upload.profile = ingest_blob(csv_upload.blob)
+    csv_upload.save(update_fields=['profile'])
+    columns = column_names(csv_upload.profile)
+    logger.info(f"Extracted columns: {columns}")
+    return {"id": csv_upload.id, "columns": columns, "profile": csv_upload.profile}
+
+
+class UploadSessionViewSet(viewsets.ViewSet):
+    """
+    Chunked, resumable CSV upload.
+
+    POST   upload-sessions/       {"filename", "total_size", "sha256" (optional)}
+    GET    upload-sessions/<id>/  current offset, for resuming
+    PATCH  upload-sessions/<id>/  raw bytes with an "Upload-Offset" header
+    DELETE upload-sessions/<id>/  abandon the upload
+
+    The chunk that reaches total_size completes the session and returns the same
+    payload as a regular CSV upload. When the declared sha256 is the content of
+    one of the user's own uploads, the session completes immediately without
+    any bytes being sent. Content stored only for other users has to be sent:
+    a hash alone does not prove the client has the file.
+    """
+    permission_classes = [IsAuthenticated]
+
+    def get_session(self, request, pk):
+        return get_object_or_404(UploadSession, pk=pk, user=request.user)
+
+    def create(self, request, *args, **kwargs):
+        serializer = UploadSessionSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        session = serializer.save(user=request.user)
+
+        if session.sha256:
+            owned = CSVUpload.objects.filter(user=request.user, blob__sha256=session.sha256).select_related('blob').first()
+            if owned is not None:
+                logger.info(f"Upload session {session.id} matched stored content {owned.blob.sha256}")
+                return self.complete(session, owned.blob)
+
+        data = UploadSessionSerializer(session).data
+        data["chunk_size"] = UPLOAD_CHUNK_SIZE
+        return Response(data, status=status.HTTP_201_CREATED)
+
+    def retrieve(self, request, pk=None):
+        session = self.get_session(request, pk)
+        return Response(UploadSessionSerializer(session).data)
+
+    def partial_update(self, request, pk=None):
+        try:
+            offset = int(request.headers['Upload-Offset'])
+        except (KeyError, ValueError):
+            return Response({"error": "Upload-Offset header is required."}, status=status.HTTP_400_BAD_REQUEST)
+        if request.stream is None:
+            return Response({"error": "Empty chunk."}, status=status.HTTP_400_BAD_REQUEST)
+
+        with transaction.atomic():
+            session = get_object_or_404(UploadSession.objects.select_for_update(), pk=pk, user=request.user)
+            if session.is_complete:
+                return Response({"error": "Upload is already complete."}, status=status.HTTP_409_CONFLICT)
+            if offset != session.offset:
+                # The client resumes from the offset we actually have.
+                return Response({"error": "Offset mismatch.", "offset": session.offset}, status=status.HTTP_409_CONFLICT)
+
+            path = default_storage.path(partial_upload_path(session.id))
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            written = 0
+            with open(path, 'ab') as part:
+                part.truncate(session.offset)
+                for block in read_blocks(request.stream):
+                    written += len(block)
+                    if session.offset + written > session.total_size:
+                        part.truncate(session.offset)
+                        return Response({"error": "Chunk exceeds total_size."}, status=status.HTTP_400_BAD_REQUEST)
+                    part.write(block)
+
+            session.offset += written
+            session.save(update_fields=['offset', 'updated_at'])
+
+        if session.offset < session.total_size:
+            return Response(UploadSessionSerializer(session).data)
+
+        sha256, size = hash_path(path)
+        if session.sha256 and session.sha256 != sha256:
+            os.remove(path)
+            session.delete()
+            return Response({"error": "Checksum mismatch; upload discarded."}, status=status.HTTP_400_BAD_REQUEST)
+        blob, _ = store_blob_from_path(sha256, size, path)
+        return self.complete(session, blob)
+
+    def destroy(self, request, pk=None):
+        session = self.get_session(request, pk)
+        default_storage.delete(partial_upload_path(session.id))
+        session.delete()
+        return Response(status=status.HTTP_204_NO_CONTENT)
+
+    def complete(self, session, blob):
+        csv_upload = CSVUpload.objects.create(
+            user_id=session.user_id, file=blob.file.name, blob=blob, original_filename=session.filename,
+        )
+        session.offset = session.total_size
+        session.csv_upload = csv_upload
+        session.save(update_fields=['offset', 'csv_upload', 'updated_at'])
+
+        try:
+            data = UploadSessionSerializer(session).data
+            data["upload"] = ingest_upload(csv_upload)
+            return Response(data, status=status.HTTP_201_CREATED)
         except Exception as e:
             logger.error(f"Error processing file: {e}")
             return Response({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
@@ -44,17 +204,72 @@ class AnalysisViewSet(viewsets.ModelViewSet):
     permission_classes = [IsAuthenticated]
 
     def get_queryset(self):
-        return self.queryset.filter(user=self.request.user)
+        queryset = self.queryset.filter(user=self.request.user)
+        if self.action == 'list':
+            # Listings never read plots, only count them.
+            queryset = queryset.annotate(plot_count=Count('related_plots'))
+        return queryset
+
+    def get_serializer_class(self):
+        if self.action == 'list':
+            return AnalysisSummarySerializer
+        return super().get_serializer_class()
 
     def perform_create(self, serializer):
         serializer.save(user=self.request.user)
 
+    @action(detail=True, methods=['get', 'post'])
+    def plots(self, request, pk=None):
+        """
+        GET: the analysis' plots with their data built from the saved specs,
+        paged with ?limit=&offset= when given. POST: append one plot.
+        """
+        analysis = self.get_object()
+
+        if request.method == 'POST':
+            serializer = PlotSerializer(data=request.data)
+            if not serializer.is_valid():
+                return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+            last = analysis.related_plots.aggregate(last=Max('position'))['last']
+            plot = build_plot_row(analysis, 0 if last is None else last + 1, serializer.validated_data)
+            plot.save()
+            return Response(plot_entry(plot), status=status.HTTP_201_CREATED)
+
+        plots = analysis.related_plots.all()
+        paginator = LimitOffsetPagination()
+        page = paginator.paginate_queryset(plots, request, view=self)
+        entries = materialize_plots([plot_entry(plot) for plot in (plots if page is None else page)], request.user)
+        if page is None:
+            return Response(entries, status=status.HTTP_200_OK)
+        return paginator.get_paginated_response(entries)
+
+    @action(detail=True, methods=['get', 'patch', 'delete'], url_path=r'plots/(?P<plot_id>[0-9]+)')
+    def plot(self, request, pk=None, plot_id=None):
+        """One plot: read it with its data, update it, or remove it."""
+        analysis = self.get_object()
+        plot = get_object_or_404(analysis.related_plots.all(), id=plot_id)
+
+        if request.method == 'DELETE':
+            plot.delete()
+            return Response(status=status.HTTP_204_NO_CONTENT)
+
+        if request.method == 'PATCH':
+            entry = plot_entry(plot)
+            entry.update(request.data)
+            if 'spec' in request.data:
+                entry.pop('data', None)
+            serializer = PlotSerializer(data=entry)
+            if not serializer.is_valid():
+                return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+            update_plot_row(plot, serializer.validated_data)
+
+        return Response(materialize_plots([plot_entry(plot)], request.user)[0], status=status.HTTP_200_OK)
+
 
 from rest_framework.views import APIView
 from rest_framework.permissions import IsAuthenticated
 from rest_framework.response import Response
 from rest_framework import status
-import pandas as pd
 import os
 
 class PlotDataView(APIView):
@@ -68,166 +283,21 @@ class PlotDataView(APIView):
             return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
         validated_data = serializer.validated_data
-        plot_type = validated_data.get('plot_type')
-        x_axis = validated_data.get('x_axis')
-        y_axes = validated_data.get('y_axes', [])
         csv_upload_id = validated_data.get('csv_upload_id')
 
-        try:
-            csv_upload = CSVUpload.objects.get(id=csv_upload_id, user=request.user)
-            file_path = csv_upload.file.path
-
-            df = pd.read_csv(file_path)
-
-            # Basic validation for all plot types
-            if plot_type in ['scatter', 'bar', 'line', 'area', 'heatmap', 'box']:
-                if not x_axis or not y_axes:
-                    return Response({"error": "x_axis and y_axes are required for this plot type."}, status=status.HTTP_400_BAD_REQUEST)
-                if x_axis not in df.columns or any(y not in df.columns for y in y_axes):
-                    return Response({"error": "Invalid columns selected for x_axis or y_axes."}, status=status.HTTP_400_BAD_REQUEST)
-
-            data = []
-            layout = {}
-
-            if plot_type == 'pie':
-                if not x_axis:
-                    return Response({"error": "x_axis is required for pie charts."}, status=status.HTTP_400_BAD_REQUEST)
-                if x_axis not in df.columns:
-                    return Response({"error": "Invalid column selected for x_axis."}, status=status.HTTP_400_BAD_REQUEST)
-                if y_axes and len(y_axes) > 1:
-                    return Response({"error": "Pie chart supports only one Y-axis variable."}, status=status.HTTP_400_BAD_REQUEST)
-
-                # Calculate value counts for pie chart
-                value_counts = df[x_axis].value_counts()
-                data = [{
-                    "values": value_counts.values.tolist(),
-                    "labels": value_counts.index.tolist(),
-                    "type": "pie",
-                }]
-                layout = {"title": f"Pie Chart of {x_axis}"}
-
-            elif plot_type == 'heatmap':
-                # Handle null values by filling with 0
-                df_filled = df.fillna(0)
-                
-                # Convert data to numeric if possible
-                for col in [x_axis] + y_axes:
-                    try:
-                        df_filled[col] = pd.to_numeric(df_filled[col])
-                    except:
-                        pass
-                
-                # Create pivot table for heatmap
-                try:
-                    if len(y_axes) == 1:
-                        # Single y-axis: use x_axis as rows and y_axis as values
-                        pivot_data = df_filled.pivot_table(
-                            values=y_axes[0],
-                            index=x_axis,
-                            aggfunc='mean'
-                        )
-                        data = [{
-                            "z": [pivot_data.values.tolist()],
-                            "x": [y_axes[0]],
-                            "y": pivot_data.index.tolist(),
-                            "type": "heatmap",
-                            "colorscale": "Viridis",
-                            "showscale": True
-                        }]
-                        layout = {
-                            "title": f"Heatmap of {y_axes[0]} by {x_axis}",
-                            "xaxis": {"title": y_axes[0]},
-                            "yaxis": {"title": x_axis},
-                            "height": 500,
-                            "width": 800
-                        }
-                    else:
-                        # Two y-axes: use first y_axis as values, second y_axis as columns
-                        pivot_data = df_filled.pivot_table(
-                            values=y_axes[0],  # First y_axis as values
-                            index=x_axis,      # x_axis as rows
-                            columns=y_axes[1], # Second y_axis as columns
-                            aggfunc='mean'
-                        )
-                        
-                        # Fill NaN values with 0
-                        pivot_data = pivot_data.fillna(0)
-                        
-                        data = [{
-                            "z": pivot_data.values.tolist(),
-                            "x": pivot_data.columns.tolist(),
-                            "y": pivot_data.index.tolist(),
-                            "type": "heatmap",
-                            "colorscale": "Viridis",
-                            "showscale": True
-                        }]
-                        layout = {
-                            "title": f"Heatmap of {y_axes[0]} by {x_axis} and {y_axes[1]}",
-                            "xaxis": {"title": y_axes[1]},
-                            "yaxis": {"title": x_axis},
-                            "height": 500,
-                            "width": 800
-                        }
-                    
-                except Exception as e:
-                    logger.error(f"Error creating heatmap: {str(e)}")
-                    return Response({"error": "Could not create heatmap with the selected columns. Please ensure the data is suitable for a heatmap."}, status=status.HTTP_400_BAD_REQUEST)
-
-            elif plot_type == 'box':
-                for y_axis in y_axes:
-                    data.append({
-                        "y": df[y_axis].tolist(),
-                        "type": "box",
-                        "name": y_axis,
-                    })
-                layout = {
-                    "title": f"Box Plot of {', '.join(y_axes)}",
-                    "xaxis": {"title": "Variables"},
-                    "yaxis": {"title": "Values"}
-                }
+        if validated_data.get('encoding') == 'typed':
+            # Body flag equivalent of "Accept: application/vnd.jigyasa.typed+json".
+            request.accepted_renderer = TypedArrayJSONRenderer()
+            request.accepted_media_type = TypedArrayJSONRenderer.media_type
 
-            else:
-                for y_axis in y_axes:
-                    if plot_type == 'scatter':
-                        data.append({
-                            "x": df[x_axis].tolist(),
-                            "y": df[y_axis].tolist(),
-                            "type": "scatter",
-                            "mode": "markers",
-                            "name": y_axis,
-                        })
-                    elif plot_type == 'bar':
-                        data.append({
-                            "x": df[x_axis].tolist(),
-                            "y": df[y_axis].tolist(),
-                            "type": "bar",
-                            "name": y_axis,
-                        })
-                    elif plot_type == 'line':
-                        data.append({
-                            "x": df[x_axis].tolist(),
-                            "y": df[y_axis].tolist(),
-                            "type": "scatter",
-                            "mode": "lines",
-                            "name": y_axis,
-                        })
-                    elif plot_type == 'area':
-                        data.append({
-                            "x": df[x_axis].tolist(),
-                            "y": df[y_axis].tolist(),
-                            "type": "scatter",
-                            "fill": "tozeroy",
-                            "mode": "lines",
-                            "name": y_axis,
-                        })
-
-                layout = {
-                    "title": f"{', '.join(y_axes)} vs {x_axis}",
-                    "xaxis": {"title": x_axis},
-                    "yaxis": {"title": "Values"}
-                }
-
-            return Response({"data": data, "layout": layout}, status=status.HTTP_200_OK)
+        try:
+            csv_upload = CSVUpload.objects.select_related('blob').get(id=csv_upload_id, user=request.user)
+            plot = spec_plot(csv_upload, validated_data, user_id=request.user.id)
+            return Response(plot, status=status.HTTP_200_OK)
+        except Overloaded as e:
+            return overloaded_response(e)
+        except (PlotError, FilterError) as e:
+            return Response({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
         except CSVUpload.DoesNotExist:
             return Response({"error": "CSV file not found."}, status=status.HTTP_404_NOT_FOUND)
         except Exception as e:
@@ -241,30 +311,211 @@ class GroupByView(APIView):
     def post(self, request, *args, **kwargs):
         columns = request.data.get('columns', [])
         csv_upload_id = request.data.get('csv_upload_id')
+        orient = request.data.get('orient', 'records')
 
         if not columns or not csv_upload_id:
             return Response({"error": "Missing required parameters."}, status=status.HTTP_400_BAD_REQUEST)
+        if orient not in ('records', 'columns'):
+            return Response({"error": "orient must be 'records' or 'columns'."}, status=status.HTTP_400_BAD_REQUEST)
 
         try:
-            csv_upload = CSVUpload.objects.get(id=csv_upload_id, user=request.user)
-            file_path = csv_upload.file.path
+            csv_upload = CSVUpload.objects.select_related('blob').get(id=csv_upload_id, user=request.user)
+            profile = get_profile(csv_upload)
+
+            available = column_names(profile)
+            for column in columns:
+                if (column not in available):
+                    return Response({"error": f"Invalid column selected: {column}"}, status=status.HTTP_400_BAD_REQUEST)
 
-            df = pd.read_csv(file_path)
+            row_filter = parse_request_filter(request.data.get('filter'), available)
+
+            # Low-cardinality columns are counted from the profile; only the rest are read.
+            if row_filter is None:
+                grouped = {column: group_counts_from_profile(profile, column) for column in columns}
+            else:
+                grouped = dict.fromkeys(columns)
+            pending = [column for column, counts in grouped.items() if counts is None]
+            if pending:
+                grouped.update(compute.run(request.user.id, group_columns, csv_upload, pending, row_filter))
 
             results = {}
+            with phase('convert'):
+                for column in columns:
+                    grouped_data = grouped[column]
+                    if orient == 'columns':
+                        # Columnar arrays go to the renderer as-is, without boxing every row.
+                        results[column] = {column: grouped_data.index.to_numpy(), "count": grouped_data.to_numpy()}
+                    else:
+                        results[column] = grouped_data.reset_index(name='count').to_dict(orient='records')
+
+            return Response(results, status=status.HTTP_200_OK)
+        except Overloaded as e:
+            return overloaded_response(e)
+        except FilterError as e:
+            return Response({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
+        except CSVUpload.DoesNotExist:
+            return Response({"error": "CSV file not found."}, status=status.HTTP_404_NOT_FOUND)
+        except Exception as e:
+            return Response({"error": str(e)}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+
+
+class CorrelationView(APIView):
+    permission_classes = [IsAuthenticated]
+
+    def post(self, request, *args, **kwargs):
+        serializer = CorrelationSerializer(data=request.data)
+        if not serializer.is_valid():
+            return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+
+        validated_data = serializer.validated_data
+        columns = list(dict.fromkeys(validated_data['columns']))
+        method = validated_data['method']
+
+        try:
+            csv_upload = CSVUpload.objects.select_related('blob').get(id=validated_data['csv_upload_id'], user=request.user)
+            profile = get_profile(csv_upload)
+
+            entries = column_entries(profile)
             for column in columns:
-                if (column not in df.columns):
+                if column not in entries:
                     return Response({"error": f"Invalid column selected: {column}"}, status=status.HTTP_400_BAD_REQUEST)
+                if entries[column]["kind"] not in ('numeric', 'boolean'):
+                    return Response({"error": f"Column is not numeric: {column}"}, status=status.HTTP_400_BAD_REQUEST)
+            if len(columns) < 2:
+                return Response({"error": "Select at least two columns."}, status=status.HTTP_400_BAD_REQUEST)
+
+            filter_text = validated_data.get('filter') or ''
+            row_filter = parse_request_filter(filter_text, list(entries))
+
+            # Upload content never changes, so results are keyed on content and request.
+            request_hash = hashlib.sha1(json.dumps([method, columns, filter_text.strip()]).encode()).hexdigest()
+            cache_key = f"correlation:{content_key(csv_upload)}:{request_hash}"
+            with phase('cache'):
+                result = cache.get(cache_key)
+            if result is None:
+                r, n, p = compute.run(request.user.id, upload_correlation, csv_upload, columns, row_filter, method)
+                result = {
+                    "method": method,
+                    "columns": columns,
+                    "matrix": r,
+                    "n": n,
+                    "p_values": p,
+                    "plot": correlation_heatmap(columns, r, method),
+                }
+                with phase('cache'):
+                    cache.set(cache_key, result, settings.STATS_CACHE_TIMEOUT)
+                logger.info(f"Computed {method} correlation of {len(columns)} columns for upload {csv_upload.id}")
+
+            return Response(result, status=status.HTTP_200_OK)
+        except Overloaded as e:
+            return overloaded_response(e)
+        except FilterError as e:
+            return Response({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
+        except CSVUpload.DoesNotExist:
+            return Response({"error": "CSV file not found."}, status=status.HTTP_404_NOT_FOUND)
+        except Exception as e:
+            logger.error(f"Error computing correlation: {str(e)}")
+            return Response({"error": str(e)}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
 
-                grouped_data = df.groupby(column).size().reset_index(name='count')
-                results[column] = grouped_data.to_dict(orient='records')
 
-            return Response(results, status=status.HTTP_200_OK)
+def association_pairs(user_id, names, codes, cards):
+    pairs = compute.run(user_id, associations, codes, cards)
+    return [{"a": names[i], "b": names[j], **result} for i, j, result in pairs]
+
+
+class AssociationView(APIView):
+    permission_classes = [IsAuthenticated]
+
+    def post(self, request, *args, **kwargs):
+        serializer = AssociationSerializer(data=request.data)
+        if not serializer.is_valid():
+            return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+
+        validated_data = serializer.validated_data
+        limit = validated_data.get('limit')
+
+        try:
+            if 'survey_id' in validated_data:
+                survey = Survey.objects.get(id=validated_data['survey_id'], creator=request.user)
+                with phase('load'):
+                    names, labels, codes = survey_choice_columns(survey)
+                cards = [len(column_labels) for column_labels in labels]
+                with phase('compute'):
+                    pairs = association_pairs(request.user.id, names, codes, cards)
+                result = {
+                    "source": "survey",
+                    "rows": codes.shape[1],
+                    "columns": names,
+                    "pairs": pairs,
+                }
+                logger.info(f"Tested {len(result['pairs'])} question pairs for survey {survey.id}")
+            else:
+                result = self.upload_associations(request, validated_data)
+                if isinstance(result, Response):
+                    return result
+
+            if limit:
+                result = {**result, "pairs": result["pairs"][:limit]}
+            return Response(result, status=status.HTTP_200_OK)
+        except Overloaded as e:
+            return overloaded_response(e)
+        except FilterError as e:
+            return Response({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
+        except Survey.DoesNotExist:
+            return Response({"error": "Survey not found."}, status=status.HTTP_404_NOT_FOUND)
         except CSVUpload.DoesNotExist:
             return Response({"error": "CSV file not found."}, status=status.HTTP_404_NOT_FOUND)
         except Exception as e:
+            logger.error(f"Error computing associations: {str(e)}")
             return Response({"error": str(e)}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
 
+    def upload_associations(self, request, validated_data):
+        csv_upload = CSVUpload.objects.select_related('blob').get(id=validated_data['csv_upload_id'], user=request.user)
+        profile = get_profile(csv_upload)
+        entries = column_entries(profile)
+
+        columns = validated_data.get('columns')
+        if columns:
+            columns = list(dict.fromkeys(columns))
+            for column in columns:
+                if column not in entries:
+                    return Response({"error": f"Invalid column selected: {column}"}, status=status.HTTP_400_BAD_REQUEST)
+                if entries[column]["cardinality"] > MAX_CATEGORIES:
+                    return Response({"error": f"Column has more than {MAX_CATEGORIES} distinct values: {column}"}, status=status.HTTP_400_BAD_REQUEST)
+        else:
+            # Every column that looks categorical.
+            columns = [
+                name for name, entry in entries.items()
+                if entry["kind"] != 'datetime' and 2 <= entry["cardinality"] <= MAX_CATEGORIES
+            ]
+        if len(columns) < 2:
+            return Response({"error": "At least two categorical columns are needed."}, status=status.HTTP_400_BAD_REQUEST)
+
+        filter_text = validated_data.get('filter') or ''
+        row_filter = parse_request_filter(filter_text, list(entries))
+
+        request_hash = hashlib.sha1(json.dumps([columns, filter_text.strip()]).encode()).hexdigest()
+        cache_key = f"associations:{content_key(csv_upload)}:{request_hash}"
+        with phase('cache'):
+            result = cache.get(cache_key)
+        if result is None:
+            df = load_frame(csv_upload, columns, row_filter)
+            with phase('compute'):
+                encoded = [encode(df[column]) for column in columns]
+                codes = np.vstack([column_codes for column_codes, _ in encoded])
+                cards = [len(uniques) for _, uniques in encoded]
+                pairs = association_pairs(request.user.id, columns, codes, cards)
+            result = {
+                "source": "upload",
+                "rows": len(df),
+                "columns": columns,
+                "pairs": pairs,
+            }
+            with phase('cache'):
+                cache.set(cache_key, result, settings.STATS_CACHE_TIMEOUT)
+            logger.info(f"Tested {len(result['pairs'])} column pairs for upload {csv_upload.id}")
+        return result
+
 
 from rest_framework.views import APIView
 from rest_framework.permissions import IsAuthenticated
@@ -272,20 +523,9 @@ from rest_framework.response import Response
 from rest_framework import status
 from .models import Analysis
 from .serializers import AnalysisSerializer
-from django.http import JsonResponse, HttpResponse
-from django.core.files.base import ContentFile
-from reportlab.lib import colors
-from reportlab.lib.pagesizes import letter
-from reportlab.platypus import SimpleDocTemplate, Paragraph, Spacer, Image
-from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
-from reportlab.lib.units import inch
-import plotly.io as pio
-import base64
-from io import BytesIO
-import plotly.graph_objects as go
-
-# Configure plotly to use kaleido
-pio.kaleido.scope.mathjax = None
+from django.http import FileResponse
+from .publish import write_analysis_pdf
+import tempfile
 
 class AnalysisView(APIView):
     permission_classes = [IsAuthenticated]
@@ -302,6 +542,37 @@ class AnalysisView(APIView):
             return Response(serializer.data, status=status.HTTP_201_CREATED)
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
+
+class DrilldownView(APIView):
+    permission_classes = [IsAuthenticated]
+
+    def post(self, request, *args, **kwargs):
+        serializer = DrilldownSerializer(data=request.data)
+        if not serializer.is_valid():
+            return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+
+        validated_data = serializer.validated_data
+        try:
+            survey = Survey.objects.only('id', 'revision').get(id=validated_data['survey_id'], creator=request.user)
+            with phase('compute'):
+                responses, matched, questions = drilldown(
+                    survey, validated_data['filters'], validated_data.get('questions'),
+                )
+            return Response({
+                "survey_id": survey.id,
+                "responses": responses,
+                "matched": matched,
+                "questions": questions,
+            }, status=status.HTTP_200_OK)
+        except FilterError as e:
+            return Response({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
+        except Survey.DoesNotExist:
+            return Response({"error": "Survey not found."}, status=status.HTTP_404_NOT_FOUND)
+        except Exception as e:
+            logger.error(f"Error computing drill-down: {str(e)}")
+            return Response({"error": str(e)}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+
+
 class PublishAnalysisView(APIView):
     permission_classes = [IsAuthenticated]
 
@@ -309,115 +580,29 @@ class PublishAnalysisView(APIView):
         analysis_id = request.data.get('analysis_id')
         if not analysis_id:
             return Response({"error": "Analysis ID is required."}, status=status.HTTP_400_BAD_REQUEST)
+        options = PublishSerializer(data=request.data)
+        if not options.is_valid():
+            return Response(options.errors, status=status.HTTP_400_BAD_REQUEST)
+        options = options.validated_data
 
         try:
             logger.info(f"Attempting to publish analysis with ID: {analysis_id}")
             analysis = Analysis.objects.get(id=analysis_id, user=request.user)
-            logger.info(f"Found analysis: {analysis.title}")
-            
-            # Create a BytesIO buffer to store the PDF
-            buffer = BytesIO()
-            
-            # Create the PDF document
-            doc = SimpleDocTemplate(
-                buffer,
-                pagesize=letter,
-                rightMargin=72,
-                leftMargin=72,
-                topMargin=72,
-                bottomMargin=72
-            )
-            
-            # Create styles
-            styles = getSampleStyleSheet()
-            title_style = ParagraphStyle(
-                'CustomTitle',
-                parent=styles['Heading1'],
-                fontSize=24,
-                spaceAfter=30
-            )
-            heading_style = ParagraphStyle(
-                'CustomHeading',
-                parent=styles['Heading2'],
-                fontSize=18,
-                spaceAfter=20
-            )
-            normal_style = styles['Normal']
-            
-            # Create story (content) for the PDF
-            story = []
-            
-            # Add title
-            story.append(Paragraph(analysis.title, title_style))
-            story.append(Spacer(1, 12))
-            
-            # Add author and date
-            story.append(Paragraph(f"<b>Author:</b> {analysis.author_name}", normal_style))
-            story.append(Paragraph(f"<b>Date:</b> {analysis.date}", normal_style))
-            story.append(Spacer(1, 12))
-            
-            # Add description
-            if analysis.description:
-                story.append(Paragraph(analysis.description, normal_style))
-                story.append(Spacer(1, 24))
-            
-            # Add plots
-            story.append(Paragraph("Plots", heading_style))
-            story.append(Spacer(1, 12))
-            
-            logger.info(f"Processing {len(analysis.plots)} plots")
-            for i, plot in enumerate(analysis.plots):
-                try:
-                    logger.info(f"Processing plot {i+1}")
-                    if plot.get('data'):
-                        # Create plotly figure
-                        fig = go.Figure(
-                            data=plot['data']['data'],
-                            layout=plot['data']['layout']
-                        )
-                        
-                        # Update layout for better PDF export
-                        fig.update_layout(
-                            paper_bgcolor='white',
-                            plot_bgcolor='white',
-                            width=800,
-                            height=500,
-                            margin=dict(l=50, r=50, t=50, b=50)
-                        )
-                        
-                        logger.info("Converting plot to image using kaleido")
-                        img_bytes = pio.to_image(fig, format='png', engine='kaleido', scale=2.0)  # Higher DPI for better quality
-                        
-                        # Create BytesIO object for the image
-                        img_buffer = BytesIO(img_bytes)
-                        
-                        # Add plot title and description
-                        story.append(Paragraph(plot.get('title', 'Untitled Plot'), styles['Heading3']))
-                        if plot.get('description'):
-                            story.append(Paragraph(plot.get('description'), normal_style))
-                        
-                        # Add plot image with automatic scaling
-                        logger.info("Adding image to PDF")
-                        story.append(Image(img_buffer, width=6*inch, height=4*inch))
-                        story.append(Spacer(1, 24))
-                except Exception as e:
-                    logger.error(f"Error processing plot {i+1}: {str(e)}")
-                    raise
-            
-            # Build the PDF
-            logger.info("Building PDF")
-            doc.build(story)
-            
-            # Get the PDF content
-            pdf_content = buffer.getvalue()
-            buffer.close()
-            
-            # Create response
-            response = HttpResponse(pdf_content, content_type='application/pdf')
-            response['Content-Disposition'] = f'attachment; filename="{analysis.title}.pdf"'
+
+            # The pool writes into a file this request owns: it is deleted when
+            # FileResponse closes it after sending, or right away on failure.
+            pdf = tempfile.NamedTemporaryFile(suffix='.pdf')
+            try:
+                compute.run(request.user.id, write_analysis_pdf, pdf.name, analysis.id, request.user.id, dict(options))
+            except BaseException:
+                pdf.close()
+                raise
+            response = FileResponse(pdf, as_attachment=True, filename=f"{analysis.title}.pdf", content_type='application/pdf')
             logger.info("PDF generation successful")
             return response
-            
+
+        except Overloaded as e:
+            return overloaded_response(e)
         except Analysis.DoesNotExist:
             logger.error(f"Analysis not found with ID: {analysis_id}")
             return Response({"error": "Analysis not found."}, status=status.HTTP_404_NOT_FOUND)
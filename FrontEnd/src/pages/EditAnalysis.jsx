@@ -14,13 +14,15 @@ const EditAnalysis = () => {
   useEffect(() => {
     const fetchAnalysis = async () => {
       try {
-        const response = await axios.get(`${import.meta.env.VITE_BASE_URL}/survey-analyzer/analyses/${id}/`, {
-          headers: {
-            'Authorization': `Bearer ${localStorage.getItem('access_token')}`,
-          },
-        });
+        const headers = {
+          'Authorization': `Bearer ${localStorage.getItem('access_token')}`,
+        };
+        const [response, plotsResponse] = await Promise.all([
+          axios.get(`${import.meta.env.VITE_BASE_URL}/survey-analyzer/analyses/${id}/`, { headers }),
+          axios.get(`${import.meta.env.VITE_BASE_URL}/survey-analyzer/analyses/${id}/plots/`, { headers }),
+        ]);
         console.log('Fetched analysis:', response.data);
-        setAnalysis(response.data);
+        setAnalysis({ ...response.data, plots: plotsResponse.data });
       } catch (err) {
         console.error('Error fetching analysis:', err);
         setError('Failed to fetch analysis. Please try again.');
@@ -51,10 +53,11 @@ const EditAnalysis = () => {
       // Create a copy of the analysis with plots that can be properly serialized
       const analysisToSubmit = {
         ...analysis,
+        // Plots are saved as specs; only plots saved before specs carry their data.
         plots: analysis.plots.map(plot => ({
           title: plot.title,
           description: plot.description,
-          data: plot.data
+          ...(plot.spec ? { spec: plot.spec } : { data: plot.data })
         }))
       };
 
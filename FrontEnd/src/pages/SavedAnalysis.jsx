@@ -9,6 +9,7 @@ const SavedAnalysis = () => {
   const [loading, setLoading] = useState(true);
   const [error, setError] = useState(null);
   const [expandedPlots, setExpandedPlots] = useState({});
+  const [plotsById, setPlotsById] = useState({});
 
   useEffect(() => {
     fetchSavedAnalyses();
@@ -47,11 +48,31 @@ const SavedAnalysis = () => {
     }
   };
 
-  const toggleAnalysisPlots = (analysisId) => {
+  // The list only has summaries; plot data is built on the server per analysis.
+  const fetchPlots = async (analysisId) => {
+    const response = await axios.get(`${import.meta.env.VITE_BASE_URL}/survey-analyzer/analyses/${analysisId}/plots/`, {
+      headers: {
+        'Authorization': `Bearer ${localStorage.getItem('access_token')}`,
+        'Content-Type': 'application/json'
+      }
+    });
+    setPlotsById(prev => ({ ...prev, [analysisId]: response.data }));
+    return response.data;
+  };
+
+  const toggleAnalysisPlots = async (analysisId) => {
     setExpandedPlots(prev => ({
       ...prev,
       [analysisId]: !prev[analysisId]
     }));
+    if (!expandedPlots[analysisId] && !plotsById[analysisId]) {
+      try {
+        await fetchPlots(analysisId);
+      } catch (err) {
+        console.error('Error fetching plots:', err);
+        setError('Failed to load plots. Please try again.');
+      }
+    }
   };
 
   const handleDelete = async (id) => {
@@ -106,6 +127,8 @@ const SavedAnalysis = () => {
 
   const handleHtmlDownload = async (analysis) => {
     try {
+      const plots = plotsById[analysis.id] || await fetchPlots(analysis.id);
+
       // Generate HTML content
       let htmlContent = `
         <!DOCTYPE html>
@@ -157,8 +180,8 @@ const SavedAnalysis = () => {
       `;
 
       // Add each plot to HTML
-      if (analysis.plots && analysis.plots.length > 0) {
-        analysis.plots.forEach((plot, index) => {
+      if (plots.length > 0) {
+        plots.forEach((plot, index) => {
           if (plot.data) {
             const plotId = `plot-${index}`;
             const plotData = JSON.stringify(plot.data.data);
@@ -211,14 +234,15 @@ const SavedAnalysis = () => {
   };
 
   const renderPlots = (analysis) => {
-    if (!expandedPlots[analysis.id] || !analysis.plots || analysis.plots.length === 0) {
+    const plots = plotsById[analysis.id];
+    if (!expandedPlots[analysis.id] || !plots || plots.length === 0) {
       return null;
     }
 
     return (
       <div className="mt-4 space-y-6 px-4 py-4 bg-gray-50 rounded-md">
         <h4 className="font-medium text-gray-700">Plots</h4>
-        {analysis.plots.map((plot, plotIndex) => {
+        {plots.map((plot, plotIndex) => {
           if (!plot.data) {
             return (
               <div key={plotIndex} className="p-4 bg-white border border-gray-200 rounded-md">
@@ -312,7 +336,7 @@ const SavedAnalysis = () => {
                     )}
                     <div className="mt-2">
                       <span className="text-sm text-gray-500">
-                        {analysis.plots?.length || 0} {analysis.plots?.length === 1 ? 'plot' : 'plots'}
+                        {analysis.plot_count || 0} {analysis.plot_count === 1 ? 'plot' : 'plots'}
                       </span>
                     </div>
                   </div>
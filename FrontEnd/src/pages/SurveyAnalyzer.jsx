@@ -161,6 +161,18 @@ const SurveyAnalyzer = () => {
     }
   };
 
+  // Analyses store what to plot; the server rebuilds (and caches) the data.
+  const plotForSaving = (plot) => ({
+    title: plot.title || 'Untitled Plot',
+    description: plot.description || '',
+    spec: {
+      csv_upload_id: csvUploadId,
+      plot_type: plot.type,
+      x_axis: plot.xAxis,
+      y_axes: plot.yAxes,
+    },
+  });
+
   const saveAnalysis = async () => {
     if (!analysisTitle || !authorName) {
       setError('Please provide a title and author name for the analysis.');
@@ -172,11 +184,7 @@ const SurveyAnalyzer = () => {
 
     try {
       // Prepare plots data with titles and descriptions
-      const plotsWithData = plots.map(plot => ({
-        title: plot.title || 'Untitled Plot',
-        description: plot.description || '',
-        data: plot.data
-      }));
+      const plotsWithData = plots.map(plotForSaving);
 
       await axios.post(`${import.meta.env.VITE_BASE_URL}/survey-analyzer/analyses/`, {
         title: analysisTitle,
@@ -220,11 +228,7 @@ const SurveyAnalyzer = () => {
           title: analysisTitle,
           author_name: authorName,
           description,
-          plots: plots.map(plot => ({
-            title: plot.title || 'Untitled Plot',
-            description: plot.description || '',
-            data: plot.data
-          })),
+          plots: plots.map(plotForSaving),
         },
         {
           headers: {